@@ -0,0 +1,44 @@
+"""Add full-text search document to products
+
+Revision ID: 005_product_search
+Revises: 004_product_extensions_reviews
+Create Date: 2025-01-06
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_product_search'
+down_revision: Union[str, None] = '004_product_extensions_reviews'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Backfill existing products with the same weighting the service layer uses
+    op.execute(
+        """
+        UPDATE products SET search_vector =
+            setweight(to_tsvector('english', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(short_description, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        """
+    )
+
+    op.create_index(
+        'ix_products_search_vector',
+        'products',
+        ['search_vector'],
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,47 @@
+"""Denormalize primary image URL and stock status onto products
+
+Revision ID: 006_product_listing_columns
+Revises: 005_product_search
+Create Date: 2025-01-08
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_product_listing_columns'
+down_revision: Union[str, None] = '005_product_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('primary_image_url', sa.String(500), nullable=True))
+    op.add_column(
+        'products',
+        sa.Column('is_in_stock', sa.Boolean(), nullable=False, server_default=sa.true()),
+    )
+
+    # Backfill with the same rules the service layer maintains
+    op.execute(
+        """
+        UPDATE products SET
+            is_in_stock = (NOT track_inventory OR allow_backorder OR stock_quantity > 0),
+            primary_image_url = (
+                SELECT url FROM product_images
+                WHERE product_images.product_id = products.id
+                ORDER BY is_primary DESC, display_order, id
+                LIMIT 1
+            )
+        """
+    )
+
+    op.create_index('ix_products_is_in_stock', 'products', ['is_in_stock'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_is_in_stock', table_name='products')
+    op.drop_column('products', 'is_in_stock')
+    op.drop_column('products', 'primary_image_url')
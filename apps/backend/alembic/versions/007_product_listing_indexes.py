@@ -0,0 +1,42 @@
+"""Partial indexes matching storefront product listings
+
+Revision ID: 007_product_listing_indexes
+Revises: 006_product_listing_columns
+Create Date: 2025-01-09
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_product_listing_indexes'
+down_revision: Union[str, None] = '006_product_listing_columns'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Listings filter is_active and order by one of these (id breaks ties)
+LISTING_INDEXES = {
+    'ix_products_active_display_order': ['display_order', 'id'],
+    'ix_products_active_category_display_order': ['category_id', 'display_order', 'id'],
+    'ix_products_active_price': ['price', 'id'],
+    'ix_products_active_created_at': ['created_at', 'id'],
+}
+
+
+def upgrade() -> None:
+    for name, columns in LISTING_INDEXES.items():
+        op.create_index(name, 'products', columns, postgresql_where=sa.text('is_active'))
+
+    op.create_index(
+        'ix_product_images_product_primary',
+        'product_images',
+        ['product_id', 'is_primary'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_images_product_primary', table_name='product_images')
+    for name in LISTING_INDEXES:
+        op.drop_index(name, table_name='products')
@@ -0,0 +1,67 @@
+"""Unique cart line per product and special instructions
+
+Revision ID: 008_cart_item_upsert
+Revises: 007_product_listing_indexes
+Create Date: 2025-01-10
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_cart_item_upsert'
+down_revision: Union[str, None] = '007_product_listing_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'cart_items',
+        sa.Column(
+            'special_instructions_hash', sa.String(32), nullable=False, server_default=''
+        ),
+    )
+    op.execute(
+        """
+        UPDATE cart_items SET special_instructions_hash = md5(special_instructions)
+        WHERE special_instructions IS NOT NULL
+        """
+    )
+
+    # Fold duplicate lines into the oldest one before enforcing uniqueness
+    op.execute(
+        """
+        UPDATE cart_items SET quantity = totals.quantity
+        FROM (
+            SELECT min(id) AS id, sum(quantity) AS quantity
+            FROM cart_items
+            GROUP BY cart_id, product_id, special_instructions_hash
+            HAVING count(*) > 1
+        ) AS totals
+        WHERE cart_items.id = totals.id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM cart_items
+        WHERE id NOT IN (
+            SELECT min(id) FROM cart_items
+            GROUP BY cart_id, product_id, special_instructions_hash
+        )
+        """
+    )
+
+    op.create_index(
+        'uq_cart_items_cart_product_instructions',
+        'cart_items',
+        ['cart_id', 'product_id', 'special_instructions_hash'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_cart_items_cart_product_instructions', table_name='cart_items')
+    op.drop_column('cart_items', 'special_instructions_hash')
@@ -0,0 +1,24 @@
+"""Index guest cart expiry for the batched reaper
+
+Revision ID: 009_cart_expiry_index
+Revises: 008_cart_item_upsert
+Create Date: 2025-01-11
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_cart_expiry_index'
+down_revision: Union[str, None] = '008_cart_item_upsert'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_carts_expires_at', 'carts', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_carts_expires_at', table_name='carts')
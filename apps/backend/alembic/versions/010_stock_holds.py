@@ -0,0 +1,47 @@
+"""Stock holds for orders awaiting payment
+
+Revision ID: 010_stock_holds
+Revises: 009_cart_expiry_index
+Create Date: 2025-01-12
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_stock_holds'
+down_revision: Union[str, None] = '009_cart_expiry_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stock_holds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_holds_order_id', 'stock_holds', ['order_id'])
+    op.create_index('ix_stock_holds_expires_at', 'stock_holds', ['expires_at'])
+    op.create_index(
+        'ix_stock_holds_product_expires_at',
+        'stock_holds',
+        ['product_id', 'expires_at'],
+        postgresql_include=['quantity'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_holds_product_expires_at', table_name='stock_holds')
+    op.drop_index('ix_stock_holds_expires_at', table_name='stock_holds')
+    op.drop_index('ix_stock_holds_order_id', table_name='stock_holds')
+    op.drop_table('stock_holds')
@@ -0,0 +1,38 @@
+"""Sequence-backed order numbers
+
+Revision ID: 011_order_number_sequence
+Revises: 010_stock_holds
+Create Date: 2025-01-13
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011_order_number_sequence'
+down_revision: Union[str, None] = '010_stock_holds'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing BB-YYMMDD-XXXX numbers are shorter than the new format, so
+    # the sequence can start from 1 without colliding with them
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.CreateSequence(sa.Sequence('order_number_seq')))
+
+    # Fallback counter for databases without sequences
+    op.create_table(
+        'order_number_counters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_number_counters')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.DropSequence(sa.Sequence('order_number_seq')))
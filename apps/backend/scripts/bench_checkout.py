@@ -0,0 +1,134 @@
+"""Benchmark for checkout (create_order_from_cart) by cart size.
+
+Builds carts of 1, 10 and 50 lines and times turning each into an order,
+also counting the SQL statements checkout runs. The statement count
+should be the same for every cart size.
+
+Run with: python -m scripts.bench_checkout [--rounds 50]
+From the apps/backend directory. Uses an in-memory SQLite database.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import src.main  # noqa: F401 - Import to register every model
+from src.cart.models import Cart
+from src.cart.service import add_lines_to_cart, get_cart_by_id
+from src.database import Base
+from src.orders.schemas import AddressSnapshot, OrderCreate
+from src.orders.service import create_order_from_cart
+from src.products.models import Product
+
+CART_SIZES = (1, 10, 50)
+
+ORDER = OrderCreate(
+    shipping_address=AddressSnapshot(
+        first_name="Bench",
+        last_name="Customer",
+        phone=None,
+        address_line1="1 Main St",
+        address_line2=None,
+        city="Springfield",
+        state="IL",
+        postal_code="62701",
+        country="US",
+    ),
+    requested_date=date.today() + timedelta(days=2),
+    contact_email="bench@example.com",
+)
+
+
+async def seed(session: AsyncSession, count: int) -> list[Product]:
+    """Insert products with plenty of stock."""
+    products = [
+        Product(
+            sku=f"BENCH-{i:05d}",
+            name=f"Bench Treat {i}",
+            slug=f"bench-treat-{i}",
+            description="A benchmark protein treat.",
+            price=Decimal("4.50"),
+            stock_quantity=1_000_000,
+            display_order=i,
+        )
+        for i in range(count)
+    ]
+    session.add_all(products)
+    await session.commit()
+    return products
+
+
+async def fill_cart(session: AsyncSession, products: list[Product]) -> Cart:
+    """A fresh cart with one line per product."""
+    cart = Cart(session_id=f"bench-{time.perf_counter_ns()}")
+    session.add(cart)
+    await session.flush()
+    await add_lines_to_cart(
+        session,
+        cart.id,
+        [
+            {
+                "product_id": product.id,
+                "quantity": 1,
+                "unit_price": product.price,
+                "special_instructions": None,
+            }
+            for product in products
+        ],
+    )
+    await session.commit()
+    return await get_cart_by_id(session, cart.id)
+
+
+async def measure(sessionmaker, products: list[Product], rounds: int) -> tuple[float, int]:
+    """Average checkout milliseconds and statements per checkout."""
+    elapsed = 0.0
+    statements = 0
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+
+    for _ in range(rounds):
+        async with sessionmaker() as session:
+            cart = await fill_cart(session, products)
+            sync_engine = session.bind.sync_engine
+            event.listen(sync_engine, "before_cursor_execute", count)
+            start = time.perf_counter()
+            try:
+                await create_order_from_cart(session, cart, ORDER)
+            finally:
+                elapsed += time.perf_counter() - start
+                event.remove(sync_engine, "before_cursor_execute", count)
+    return elapsed * 1000 / rounds, statements // rounds
+
+
+async def main(rounds: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        products = await seed(session, max(CART_SIZES))
+
+    print(f"{rounds} checkouts per cart size")
+    print(f"{'lines':>5}  {'ms':>8}  {'statements':>10}")
+    for size in CART_SIZES:
+        # Warm up (statement caches, imports)
+        await measure(sessionmaker, products[:size], 3)
+        ms, statements = await measure(sessionmaker, products[:size], rounds)
+        print(f"{size:>5}  {ms:>8.2f}  {statements:>10}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds))
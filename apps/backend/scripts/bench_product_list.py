@@ -0,0 +1,154 @@
+"""Micro-benchmark for the product list serialization paths.
+
+Compares the ORM path (load products with images and categories, build a
+ProductListResponse per row) against the column-projected path that
+serializes rows straight to JSON bytes.
+
+Run with: python -m scripts.bench_product_list [--products 500] [--rounds 200]
+From the apps/backend directory. Uses an in-memory SQLite database.
+"""
+
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import src.main  # noqa: F401 - Import to register every model
+from src.database import Base
+from src.products import service
+from src.products.models import Category, Product, ProductImage
+from src.products.schemas import (
+    CategoryResponse,
+    PaginatedProducts,
+    ProductListResponse,
+)
+
+PAGE_SIZES = (20, 100)
+
+
+async def seed(session: AsyncSession, count: int) -> None:
+    """Insert products spread over a few categories, each with images."""
+    categories = [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(5)]
+    session.add_all(categories)
+    await session.flush()
+    for i in range(count):
+        session.add(
+            Product(
+                sku=f"BENCH-{i:05d}",
+                name=f"Bench Treat {i}",
+                slug=f"bench-treat-{i}",
+                description="A benchmark protein treat.",
+                short_description="Benchmark treat",
+                price=Decimal("4.50"),
+                compare_at_price=Decimal("5.00") if i % 3 == 0 else None,
+                stock_quantity=i % 7,
+                is_in_stock=i % 7 > 0,
+                display_order=i,
+                category_id=categories[i % len(categories)].id,
+                images=[
+                    ProductImage(url=f"/img/{i}-{n}.jpg", display_order=n, is_primary=n == 1)
+                    for n in range(3)
+                ],
+            )
+        )
+    await session.flush()
+    await service.refresh_primary_images(session)
+    await session.commit()
+
+
+async def orm_page(session: AsyncSession, page_size: int) -> bytes:
+    """The per-row model construction path."""
+    products, total, next_cursor = await service.get_products(session, page_size=page_size)
+    items = [
+        ProductListResponse(
+            id=p.id,
+            name=p.name,
+            slug=p.slug,
+            price=p.price,
+            compare_at_price=p.compare_at_price,
+            short_description=p.short_description,
+            gradient_from=p.gradient_from,
+            gradient_to=p.gradient_to,
+            is_featured=p.is_featured,
+            is_bestseller=p.is_bestseller,
+            protein_grams=p.protein_grams,
+            is_gluten_free=p.is_gluten_free,
+            is_dairy_free=p.is_dairy_free,
+            is_vegan=p.is_vegan,
+            is_keto_friendly=p.is_keto_friendly,
+            is_active=p.is_active,
+            is_on_sale=p.is_on_sale,
+            is_in_stock=p.is_in_stock,
+            primary_image_url=p.primary_image_url,
+            category=CategoryResponse.model_validate(p.category) if p.category else None,
+        )
+        for p in products
+    ]
+    return PaginatedProducts(
+        items=items,
+        total=total,
+        page=1,
+        page_size=page_size,
+        total_pages=(total + page_size - 1) // page_size,
+        has_more=next_cursor is not None,
+        next_cursor=next_cursor,
+    ).model_dump_json().encode()
+
+
+async def projected_page(session: AsyncSession, page_size: int) -> bytes:
+    """The column-projected path used by the list routes."""
+    items, total, next_cursor = await service.get_product_list(
+        session, page_size=page_size
+    )
+    return to_json(
+        {
+            "items": items,
+            "total": total,
+            "page": 1,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size,
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+async def measure(sessionmaker, render, page_size: int, rounds: int) -> float:
+    """Average milliseconds per request, one fresh session per request."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        async with sessionmaker() as session:
+            await render(session, page_size)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+async def main(products: int, rounds: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        await seed(session, products)
+
+    print(f"{products} products, {rounds} rounds per case")
+    print(f"{'page_size':>9}  {'orm ms':>8}  {'projected ms':>12}  {'speedup':>7}")
+    for page_size in PAGE_SIZES:
+        # Warm up both paths (statement caches, imports)
+        await measure(sessionmaker, orm_page, page_size, 5)
+        await measure(sessionmaker, projected_page, page_size, 5)
+        orm = await measure(sessionmaker, orm_page, page_size, rounds)
+        projected = await measure(sessionmaker, projected_page, page_size, rounds)
+        print(f"{page_size:>9}  {orm:>8.2f}  {projected:>12.2f}  {orm / projected:>6.1f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.rounds))
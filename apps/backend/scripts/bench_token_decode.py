@@ -0,0 +1,78 @@
+"""Micro-benchmark for access token verification.
+
+Compares the old per-call path (jose.jwt.decode with the raw secret)
+against the TokenVerifier: prepared key only (cache disabled), with its
+verification cache, and with the PyJWT backend when it is installed.
+Tokens are drawn from a working set of distinct users, as on a busy worker.
+
+Run with: python -m scripts.bench_token_decode [--tokens 200] [--rounds 20000]
+From the apps/backend directory.
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+
+from jose import jwt
+
+from src.auth.security import JWT_BACKENDS, JoseBackend, TokenVerifier
+from src.config import get_settings
+
+settings = get_settings()
+
+
+def baseline(token: str) -> dict:
+    """What decode_access_token used to do on every request."""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def measure(decode: Callable[[str], object], tokens: list[str], rounds: int) -> float:
+    """Decodes per second over a random walk through the working set."""
+    picks = [random.choice(tokens) for _ in range(rounds)]
+    start = time.perf_counter()
+    for token in picks:
+        decode(token)
+    return rounds / (time.perf_counter() - start)
+
+
+def main(count: int, rounds: int) -> None:
+    signer = JoseBackend(settings.SECRET_KEY, settings.ALGORITHM)
+    exp = time.time() + 3600
+    tokens = [
+        signer.encode({"sub": str(i), "role": "customer", "exp": exp})
+        for i in range(count)
+    ]
+
+    cases: dict[str, Callable[[str], object]] = {
+        "jose.jwt.decode": baseline,
+        "prepared key": TokenVerifier(signer, cache_size=0, cache_ttl=300).verify,
+        "prepared + cache": TokenVerifier(signer, cache_size=4096, cache_ttl=300).verify,
+    }
+    try:
+        pyjwt = JWT_BACKENDS["pyjwt"](settings.SECRET_KEY, settings.ALGORITHM)
+    except ImportError:
+        print("pyjwt not installed (pip install .[fastjwt]); skipping its cases")
+    else:
+        cases["pyjwt"] = TokenVerifier(pyjwt, cache_size=0, cache_ttl=300).verify
+        cases["pyjwt + cache"] = TokenVerifier(
+            pyjwt, cache_size=4096, cache_ttl=300
+        ).verify
+
+    print(f"{count} distinct tokens, {rounds} decodes per case")
+    print(f"{'path':>18}  {'decodes/s':>10}  {'speedup':>7}")
+    base = None
+    for name, decode in cases.items():
+        # Warm up (imports, first-touch allocations)
+        measure(decode, tokens, 200)
+        rate = measure(decode, tokens, rounds)
+        base = base or rate
+        print(f"{name:>18}  {rate:>10.0f}  {rate / base:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.tokens, args.rounds)
@@ -0,0 +1,116 @@
+"""Load test: latency of an unrelated endpoint during a login storm.
+
+Drives the app in-process (one event loop, like one uvicorn worker) with a
+steady stream of concurrent logins while probing GET /health, and reports
+the probe's p50/p99. Runs twice: once with bcrypt inline on the event loop
+(the old behaviour) and once on the password hashing pool.
+
+Run with: python -m scripts.load_login_storm [--logins 8] [--seconds 5]
+From the apps/backend directory. Uses an in-memory SQLite database.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import AsyncGenerator
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.auth import service as auth_service
+from src.auth.models import User
+from src.auth.security import PasswordHasher, get_password_hash, pwd_context
+from src.config import get_settings
+from src.database import Base, get_db
+from src.main import app
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password-123"
+
+
+class InlineHasher(PasswordHasher):
+    """Hashes on the calling thread, blocking the event loop."""
+
+    async def _run(self, func, *args):
+        return func(*args)
+
+
+async def login_storm(client: AsyncClient, stop: asyncio.Event) -> int:
+    """Log in back-to-back until stopped; return how many succeeded."""
+    done = 0
+    while not stop.is_set():
+        response = await client.post(
+            "/auth/login", data={"username": EMAIL, "password": PASSWORD}
+        )
+        done += response.status_code == 200
+    return done
+
+
+async def probe(client: AsyncClient, stop: asyncio.Event) -> list[float]:
+    """Hit /health every 10ms until stopped; return latencies in ms."""
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def run_case(client: AsyncClient, logins: int, seconds: float) -> tuple:
+    """Run one storm; return probe p50 and p99 (ms) and logins per second."""
+    stop = asyncio.Event()
+    storms = [asyncio.create_task(login_storm(client, stop)) for _ in range(logins)]
+    probe_task = asyncio.create_task(probe(client, stop))
+    await asyncio.sleep(seconds)
+    stop.set()
+    completed = sum(await asyncio.gather(*storms))
+    latencies = await probe_task
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    return statistics.median(latencies), p99, completed / seconds
+
+
+async def main(logins: int, seconds: float) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        session.add(User(email=EMAIL, hashed_password=get_password_hash(PASSWORD)))
+        await session.commit()
+
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with sessionmaker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    settings = get_settings()
+    pooled = auth_service.password_hasher
+    cases = {
+        "inline": InlineHasher(pwd_context, max_workers=1, max_pending=0),
+        "pool": pooled,
+    }
+
+    print(
+        f"{logins} concurrent logins for {seconds:g}s, bcrypt rounds "
+        f"{settings.BCRYPT_ROUNDS}, {pooled.max_workers} hash workers"
+    )
+    print(f"{'hashing':>8}  {'p50 ms':>8}  {'p99 ms':>8}  {'logins/s':>8}")
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        for name, hasher in cases.items():
+            auth_service.password_hasher = hasher
+            p50, p99, rate = await run_case(client, logins, seconds)
+            print(f"{name:>8}  {p50:>8.1f}  {p99:>8.1f}  {rate:>8.1f}")
+    auth_service.password_hasher = pooled
+    pooled.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.seconds))
@@ -0,0 +1,34 @@
+"""Delete expired guest carts in bounded batches.
+
+Run with: python -m scripts.reap_carts [--batch-size 1000] [--max-batches N]
+From the apps/backend directory. Safe to run alongside the app's own
+scheduled reaper; rows locked by another run are skipped.
+"""
+
+import argparse
+import asyncio
+
+import src.main  # noqa: F401 - Import to register every model
+from src.config import get_settings
+from src.database import engine
+from src.services.maintenance import CartReaper
+
+settings = get_settings()
+
+
+async def main(batch_size: int, max_batches: int | None) -> None:
+    reaper = CartReaper(batch_size=batch_size, max_batches=max_batches)
+    result = await reaper.run()
+    await engine.dispose()
+    print(
+        f"Deleted {result.deleted} expired carts in {result.batches} batches "
+        f"({result.seconds:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=settings.CART_REAPER_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.max_batches))
@@ -13,6 +13,7 @@ from sqlalchemy.orm import sessionmaker
 
 from src.config import get_settings
 from src.products.models import Category, Product, ProductImage
+from src.products.service import refresh_primary_images, refresh_search_vectors
 
 
 # Sample categories
@@ -323,10 +324,13 @@ async def seed_database():
                 **prod_data,
                 category_id=category_map.get(category_slug),
             )
+            product.refresh_stock_status()
             session.add(product)
             await session.flush()
             print(f"Created product: {prod_data['name']}")
 
+        await refresh_search_vectors(session)
+        await refresh_primary_images(session)
         await session.commit()
         print("\nSeeding complete!")
         print(f"Created {len(CATEGORIES)} categories and {len(PRODUCTS)} products.")
@@ -14,7 +14,7 @@ from src.addresses.service import (
     set_default_address,
     update_address,
 )
-from src.auth.dependencies import CurrentUser
+from src.auth.dependencies import CurrentIdentity, CurrentUser
 from src.database import get_db
 
 router = APIRouter(prefix="/addresses", tags=["addresses"])
@@ -26,12 +26,12 @@ router = APIRouter(prefix="/addresses", tags=["addresses"])
     operation_id="listAddresses",
 )
 async def list_addresses(
-    current_user: CurrentUser,
+    identity: CurrentIdentity,
     db: Annotated[AsyncSession, Depends(get_db)],
     address_type: Annotated[str | None, Query()] = None,
 ) -> list[AddressResponse]:
     """List all addresses for the current user."""
-    addresses = await get_addresses_by_user(db, current_user.id, address_type)
+    addresses = await get_addresses_by_user(db, identity.user_id, address_type)
     return addresses
 
 
@@ -58,11 +58,11 @@ async def create_new_address(
 )
 async def get_address(
     address_id: int,
-    current_user: CurrentUser,
+    identity: CurrentIdentity,
     db: Annotated[AsyncSession, Depends(get_db)],
 ) -> AddressResponse:
     """Get a specific address by ID."""
-    address = await get_address_by_id(db, address_id, current_user.id)
+    address = await get_address_by_id(db, address_id, identity.user_id)
     if not address:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
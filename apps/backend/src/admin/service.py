@@ -144,6 +144,7 @@ async def get_top_products(
             Product.id,
             Product.name,
             Product.sku,
+            Product.primary_image_url,
             func.sum(OrderItem.quantity).label("quantity_sold"),
             func.sum(OrderItem.subtotal).label("revenue"),
         )
@@ -151,24 +152,20 @@ async def get_top_products(
         .join(Order, Order.id == OrderItem.order_id)
         .where(func.date(Order.created_at) >= since_date)
         .where(Order.payment_status == "paid")
-        .group_by(Product.id, Product.name, Product.sku)
+        .group_by(Product.id, Product.name, Product.sku, Product.primary_image_url)
         .order_by(func.sum(OrderItem.subtotal).desc())
         .limit(limit)
     )
 
     products = []
     for row in result.all():
-        # Get primary image
-        product = await db.get(Product, row.id)
-        image_url = product.primary_image_url if product else None
-        
         products.append(TopProduct(
             product_id=row.id,
             name=row.name,
             sku=row.sku,
             quantity_sold=row.quantity_sold or 0,
             revenue=Decimal(str(row.revenue or 0)),
-            image_url=image_url,
+            image_url=row.primary_image_url,
         ))
 
     return products
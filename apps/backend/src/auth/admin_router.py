@@ -14,6 +14,7 @@ from src.auth.dependencies import CurrentAdmin
 from src.auth.models import User
 from src.database import get_db
 from src.orders.models import Order
+from src.pagination import finish_page, paginate_query
 
 
 router = APIRouter(prefix="/admin/customers", tags=["admin-customers"])
@@ -44,6 +45,7 @@ class PaginatedCustomers(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: str | None = None
 
 
 class CustomerDetail(BaseModel):
@@ -78,6 +80,7 @@ async def list_customers(
     page_size: Annotated[int, Query(ge=1, le=100)] = 20,
     search: Annotated[str | None, Query()] = None,
     has_orders: Annotated[bool | None, Query()] = None,
+    cursor: Annotated[str | None, Query()] = None,
 ) -> PaginatedCustomers:
     """List all customers with order stats (admin only)."""
     # Subquery for order stats
@@ -93,11 +96,12 @@ async def list_customers(
         .subquery()
     )
 
+    total_spent = func.coalesce(order_stats.c.total_spent, 0)
     query = (
         select(
             User,
             func.coalesce(order_stats.c.order_count, 0).label("order_count"),
-            func.coalesce(order_stats.c.total_spent, 0).label("total_spent"),
+            total_spent.label("total_spent"),
             order_stats.c.last_order.label("last_order"),
         )
         .outerjoin(order_stats, User.id == order_stats.c.user_id)
@@ -125,15 +129,20 @@ async def list_customers(
     count_subquery = query.subquery()
     count_total = (await db.execute(select(func.count()).select_from(count_subquery))).scalar() or 0
 
-    # Paginate
-    query = (
-        query.order_by(order_stats.c.total_spent.desc().nullslast())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-    )
+    # Paginate: biggest spenders first
+    sort_keys = [(total_spent, True), (User.id, True)]
+    try:
+        query = paginate_query(query, sort_keys, page, page_size, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     result = await db.execute(query)
-    rows = result.all()
+    rows, next_cursor = finish_page(
+        result.all(), page_size, lambda row: [row.total_spent, row[0].id]
+    )
 
     items = []
     for row in rows:
@@ -159,6 +168,7 @@ async def list_customers(
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        next_cursor=next_cursor,
     )
 
 
@@ -0,0 +1,44 @@
+"""User cache for authenticated requests.
+
+Keys are user ids; values are detached User copies holding column values
+only, which get_cached_user (src.auth.service) merges into the request's
+session without a query. Any ORM update or delete of a User drops its entry
+once the change commits (changing a role or deactivating an account takes
+effect immediately in this worker); the TTL bounds how long another worker
+can see the old row.
+"""
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached, object_session
+
+from src.auth.models import User
+from src.cache import TTLCache
+from src.config import get_settings
+from src.database import after_commit
+
+settings = get_settings()
+
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+def detached_copy(user: User) -> User:
+    """A session-less copy of a user's columns, safe to share between requests."""
+    values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    copy = User(**values)
+    make_transient_to_detached(copy)
+    return copy
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a cached user."""
+    user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _drop_cached_user(mapper, connection, target: User) -> None:
+    # Not before commit, or a concurrent request could re-cache the old row
+    after_commit(object_session(target), invalidate_user, target.id)
@@ -1,14 +1,18 @@
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.models import User
+from src.auth.schemas import TokenData
 from src.auth.security import decode_access_token
-from src.auth.service import get_user_by_id
+from src.auth.service import get_cached_user
+from src.config import get_settings
 from src.database import get_db
 
+settings = get_settings()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
@@ -27,13 +31,96 @@ async def get_current_user(
     if token_data is None or token_data.user_id is None:
         raise credentials_exception
 
-    user = await get_user_by_id(db, token_data.user_id)
+    user = await get_cached_user(db, token_data.user_id)
     if user is None:
         raise credentials_exception
 
     return user
 
 
+async def resolve_identity(
+    db: AsyncSession, token: str, trust_claims: bool = True
+) -> TokenData | None:
+    """Verified user id, role and status for a token; None if not valid.
+
+    With TRUST_TOKEN_CLAIMS (and trust_claims) the token's signed
+    role/is_active claims are used as they are. Otherwise they are read from
+    the (cached) user row, as routes that change data always do.
+    """
+    token_data = decode_access_token(token)
+    if token_data is None or token_data.user_id is None:
+        return None
+
+    trusted = (
+        trust_claims
+        and settings.TRUST_TOKEN_CLAIMS
+        and token_data.role is not None
+        and token_data.is_active is not None
+    )
+    if not trusted:
+        user = await get_cached_user(db, token_data.user_id)
+        if user is None:
+            return None
+        token_data = TokenData(user_id=user.id, role=user.role, is_active=user.is_active)
+    return token_data
+
+
+async def get_current_identity(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> TokenData:
+    """Current user's id and role, for read-only routes that need nothing else."""
+    identity = await resolve_identity(db, token)
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not identity.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user",
+        )
+    return identity
+
+
+async def _optional_identity(
+    db: AsyncSession, authorization: str | None, trust_claims: bool
+) -> TokenData | None:
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    identity = await resolve_identity(
+        db, authorization.removeprefix("Bearer "), trust_claims
+    )
+    if identity is None or not identity.is_active:
+        return None
+    return identity
+
+
+async def get_optional_identity(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    authorization: Annotated[str | None, Header(alias="Authorization")] = None,
+) -> TokenData | None:
+    """Current user's identity if a valid active-user token was sent, else None.
+
+    For read-only routes: may come from trusted token claims.
+    """
+    return await _optional_identity(db, authorization, trust_claims=True)
+
+
+async def get_optional_user_identity(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    authorization: Annotated[str | None, Header(alias="Authorization")] = None,
+) -> TokenData | None:
+    """Same as get_optional_identity, but always checked against the user row.
+
+    For routes that change data, so a deactivated account can't keep writing
+    until its token expires.
+    """
+    return await _optional_identity(db, authorization, trust_claims=False)
+
+
 async def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> User:
@@ -61,3 +148,8 @@ async def get_current_admin_user(
 # Type aliases for dependency injection
 CurrentUser = Annotated[User, Depends(get_current_active_user)]
 CurrentAdmin = Annotated[User, Depends(get_current_admin_user)]
+CurrentIdentity = Annotated[TokenData, Depends(get_current_identity)]
+OptionalIdentity = Annotated[TokenData | None, Depends(get_optional_identity)]
+OptionalUserIdentity = Annotated[
+    TokenData | None, Depends(get_optional_user_identity)
+]
@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import CurrentUser
 from src.auth.schemas import Token, UserCreate, UserResponse
-from src.auth.security import create_access_token
+from src.auth.security import PasswordHasherBusy, create_user_token
 from src.auth.service import authenticate_user, create_user, get_user_by_email
 from src.database import get_db
 
@@ -32,7 +32,14 @@ async def register(
             detail="Email already registered",
         )
 
-    user = await create_user(db, user_data)
+    try:
+        user = await create_user(db, user_data)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
     return user
 
 
@@ -42,7 +49,14 @@ async def login(
     db: Annotated[AsyncSession, Depends(get_db)],
 ) -> Token:
     """Login and get access token."""
-    user = await authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -50,7 +64,7 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_user_token(user)
     return Token(access_token=access_token)
 
 
@@ -48,3 +48,5 @@ class TokenData(BaseModel):
     """Schema for token payload data."""
 
     user_id: int | None = None
+    role: str | None = None
+    is_active: bool | None = None
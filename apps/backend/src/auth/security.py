@@ -1,27 +1,227 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import TypeVar
 
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
 from passlib.context import CryptContext
 
+from src.auth.models import User
 from src.auth.schemas import TokenData
+from src.cache import TTLCache
 from src.config import get_settings
 
 settings = get_settings()
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# Password hashing context. Hashes below the configured cost are flagged
+# for rehash, so raising BCRYPT_ROUNDS upgrades users as they log in.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
+    """Verify a password against a hash (blocking; prefer password_hasher)."""
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Generate a password hash."""
+    """Generate a password hash (blocking; prefer password_hasher)."""
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already running or queued."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool instead of the event loop.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    At most max_workers hashes run at once and max_pending more may wait;
+    beyond that callers get PasswordHasherBusy instead of an ever-growing
+    queue of logins that will time out anyway.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        # Only touched from the event loop thread
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Hashes currently running or waiting for a worker."""
+        return self._in_flight
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        if self._in_flight >= self.max_workers + self.max_pending:
+            raise PasswordHasherBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hash"
+            )
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the current cost settings."""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Check a password; also return a new hash if the old one is outdated."""
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads (a later call starts a fresh pool)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+class InvalidTokenError(Exception):
+    """Raised by a JWT backend for a malformed, forged or expired token."""
+
+
+class JWTBackend(ABC):
+    """Signs and checks JWTs for one secret and algorithm."""
+
+    @abstractmethod
+    def encode(self, claims: dict) -> str:
+        """Sign claims into a compact token."""
+
+    @abstractmethod
+    def decode(self, token: str) -> dict:
+        """Verified claims of a token; raises InvalidTokenError."""
+
+
+class JoseBackend(JWTBackend):
+    """python-jose, with the signing key constructed once up front."""
+
+    def __init__(self, secret: str, algorithm: str):
+        self.algorithm = algorithm
+        self._key = jwk.construct(secret, algorithm)
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self._key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jwt.decode(token, self._key, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+class PyJWTBackend(JWTBackend):
+    """PyJWT (the fastjwt extra), which verifies HMAC tokens several times faster."""
+
+    def __init__(self, secret: str, algorithm: str):
+        import jwt as pyjwt
+
+        self.algorithm = algorithm
+        self._jwt = pyjwt
+        self._key = secret
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(claims, self._key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(token, self._key, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+JWT_BACKENDS = {"jose": JoseBackend, "pyjwt": PyJWTBackend}
+
+
+class TokenVerifier:
+    """Signs and verifies access tokens, remembering recent verifications.
+
+    Verified tokens map to their TokenData in a bounded LRU; an entry never
+    outlives the token's own exp claim, so expired tokens are always
+    rejected. Failed verifications are not cached.
+    """
+
+    def __init__(self, backend: JWTBackend, cache_size: int, cache_ttl: float):
+        self.backend = backend
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def encode(self, claims: dict) -> str:
+        """Sign a claims dict into a token."""
+        return self.backend.encode(claims)
+
+    def verify(self, token: str) -> TokenData | None:
+        """TokenData for a valid token, or None."""
+        token_data = self._cache.get(token)
+        if token_data is not None:
+            return token_data
+        try:
+            payload = self.backend.decode(token)
+            subject = payload.get("sub")
+            if subject is None:
+                return None
+            token_data = TokenData(
+                user_id=int(subject),
+                role=payload.get("role"),
+                is_active=payload.get("active"),
+            )
+        except (InvalidTokenError, ValueError):
+            return None
+
+        ttl = self._cache.ttl
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            self._cache.set(token, token_data, ttl=ttl)
+        return token_data
+
+    def clear(self) -> None:
+        """Forget every remembered verification."""
+        self._cache.clear()
+
+
+def create_token_verifier() -> TokenVerifier:
+    """Verifier for the configured secret, algorithm and JWT backend."""
+    backend = JWT_BACKENDS[settings.JWT_BACKEND](settings.SECRET_KEY, settings.ALGORITHM)
+    return TokenVerifier(
+        backend,
+        cache_size=settings.TOKEN_CACHE_MAX_ENTRIES,
+        cache_ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+    )
+
+
+token_verifier = create_token_verifier()
+
+
+def create_user_token(user: User) -> str:
+    """Access token for a user, carrying their signed role and status claims."""
+    return create_access_token(
+        data={"sub": str(user.id), "role": user.role, "active": user.is_active}
+    )
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -34,21 +234,9 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
         )
 
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
-    return encoded_jwt
+    return token_verifier.encode(to_encode)
 
 
 def decode_access_token(token: str) -> TokenData | None:
     """Decode and validate a JWT access token."""
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            return None
-        return TokenData(user_id=user_id)
-    except JWTError:
-        return None
+    return token_verifier.verify(token)
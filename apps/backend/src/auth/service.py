@@ -1,9 +1,10 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.auth.cache import detached_copy, user_cache
 from src.auth.models import User
 from src.auth.schemas import UserCreate
-from src.auth.security import get_password_hash, verify_password
+from src.auth.security import password_hasher
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
@@ -18,9 +19,21 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
     return result.scalars().first()
 
 
+async def get_cached_user(db: AsyncSession, user_id: int) -> User | None:
+    """Get a user by ID, from the per-process user cache when possible."""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        # Attach a copy to this session without querying
+        return await db.merge(cached, load=False)
+    user = await get_user_by_id(db, user_id)
+    if user is not None:
+        user_cache.set(user_id, detached_copy(user))
+    return user
+
+
 async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
     """Create a new user."""
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -38,6 +51,11 @@ async def authenticate_user(
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await password_hasher.verify(password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # Stored hash predates the current cost settings
+        user.hashed_password = new_hash
+        await db.commit()
     return user
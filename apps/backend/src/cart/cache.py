@@ -0,0 +1,47 @@
+"""Cart caches for the cart routes.
+
+cart_handle_cache maps a cart owner to its cart id so mutations can skip the
+cart lookup:
+- ("user", user_id) for authenticated users
+- ("session", session_id) for guests
+
+Values are CartHandle tuples, see src.cart.service. Entries are dropped when
+the service deletes a cart; guest handles also carry their expiry.
+
+cart_summary_cache maps a cart id to its CartSummary (item count and
+subtotal). The cart service drops an entry whenever it changes that cart's
+lines; the TTL bounds how stale another worker's copy can be.
+"""
+
+from src.cache import TTLCache
+from src.config import get_settings
+
+settings = get_settings()
+
+cart_handle_cache = TTLCache(
+    maxsize=settings.CART_HANDLE_CACHE_MAX_ENTRIES,
+    ttl=settings.CART_HANDLE_CACHE_TTL_SECONDS,
+)
+
+cart_summary_cache = TTLCache(
+    maxsize=settings.CART_HANDLE_CACHE_MAX_ENTRIES,
+    ttl=settings.CART_SUMMARY_CACHE_TTL_SECONDS,
+)
+
+
+def owner_key(user_id: int | None = None, session_id: str | None = None) -> tuple:
+    """Cache key for the cart owned by a user or, failing that, a guest session."""
+    if user_id:
+        return ("user", user_id)
+    return ("session", session_id)
+
+
+def forget_cart(user_id: int | None = None, session_id: str | None = None) -> None:
+    """Drop the cached handle for an owner's cart."""
+    cart_handle_cache.pop(owner_key(user_id, session_id))
+
+
+def forget_summary(*cart_ids: int) -> None:
+    """Drop the cached summaries for carts whose lines changed."""
+    for cart_id in cart_ids:
+        cart_summary_cache.pop(cart_id)
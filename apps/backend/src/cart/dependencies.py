@@ -5,48 +5,21 @@ from typing import Annotated
 from fastapi import Cookie, Depends, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.auth.dependencies import get_current_user
-from src.auth.models import User
+from src.auth.dependencies import OptionalIdentity, OptionalUserIdentity
+from src.auth.schemas import TokenData
 from src.cart.models import Cart
-from src.cart.service import get_or_create_cart
+from src.cart.store import CartStore, cart_store
 from src.database import get_db
 
 
-async def get_optional_current_user(
-    token: Annotated[str | None, Header(alias="Authorization")] = None,
-    db: Annotated[AsyncSession, Depends(get_db)] = None,
-) -> User | None:
-    """Get the current user if authenticated, None otherwise."""
-    if not token or not token.startswith("Bearer "):
-        return None
-
-    try:
-        # Extract token and validate
-        from src.auth.security import decode_access_token
-        from src.auth.service import get_user_by_id
-
-        token_str = token.split(" ")[1]
-        token_data = decode_access_token(token_str)
-        if token_data is None or token_data.user_id is None:
-            return None
-
-        user = await get_user_by_id(db, token_data.user_id)
-        if user is None or not user.is_active:
-            return None
-
-        return user
-    except Exception:
-        return None
-
-
-async def get_current_cart(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    user: Annotated[User | None, Depends(get_optional_current_user)] = None,
-    session_id: Annotated[str | None, Cookie(alias="cart_session_id")] = None,
-    x_session_id: Annotated[str | None, Header(alias="X-Session-ID")] = None,
-) -> Cart:
+def _store_for(
+    db: AsyncSession,
+    identity: TokenData | None,
+    session_id: str | None,
+    x_session_id: str | None,
+) -> CartStore:
     """
-    Get or create the current cart.
+    Get the store for the current cart; nothing is loaded yet.
 
     For authenticated users, uses user_id.
     For guests, uses session_id from cookie or X-Session-ID header.
@@ -54,13 +27,42 @@ async def get_current_cart(
     # Use header if cookie not present
     effective_session_id = session_id or x_session_id
 
-    if user:
-        return await get_or_create_cart(db, user_id=user.id)
+    if identity:
+        return cart_store(db, user_id=identity.user_id)
     elif effective_session_id:
-        return await get_or_create_cart(db, session_id=effective_session_id)
+        return cart_store(db, session_id=effective_session_id)
     else:
         raise ValueError("No user or session ID provided")
 
 
-# Type alias for dependency injection
+async def get_cart_store(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    identity: OptionalIdentity = None,
+    session_id: Annotated[str | None, Cookie(alias="cart_session_id")] = None,
+    x_session_id: Annotated[str | None, Header(alias="X-Session-ID")] = None,
+) -> CartStore:
+    """Store for reading the current cart (the user may come from token claims)."""
+    return _store_for(db, identity, session_id, x_session_id)
+
+
+async def get_cart_store_for_update(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    identity: OptionalUserIdentity = None,
+    session_id: Annotated[str | None, Cookie(alias="cart_session_id")] = None,
+    x_session_id: Annotated[str | None, Header(alias="X-Session-ID")] = None,
+) -> CartStore:
+    """Store for changing the current cart; the user is checked against its row."""
+    return _store_for(db, identity, session_id, x_session_id)
+
+
+async def get_current_cart(
+    store: Annotated[CartStore, Depends(get_cart_store_for_update)],
+) -> Cart:
+    """Get the current cart with all items and products loaded (e.g. to check out)."""
+    return await store.get()
+
+
+# Type aliases for dependency injection
+CurrentCartStore = Annotated[CartStore, Depends(get_cart_store)]
+CartStoreForUpdate = Annotated[CartStore, Depends(get_cart_store_for_update)]
 CurrentCart = Annotated[Cart, Depends(get_current_cart)]
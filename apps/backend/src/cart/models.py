@@ -1,11 +1,12 @@
 """Cart database models."""
 
+import hashlib
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Numeric, String, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, Index, Numeric, String, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from src.database import Base
 
@@ -40,7 +41,9 @@ class Cart(Base):
     updated_at: Mapped[datetime] = mapped_column(
         default=datetime.utcnow, onupdate=datetime.utcnow
     )
-    expires_at: Mapped[datetime | None] = mapped_column()  # For guest cart cleanup
+    expires_at: Mapped[datetime | None] = mapped_column(
+        index=True
+    )  # For guest cart cleanup
 
     # Relationships
     user: Mapped["User | None"] = relationship(back_populates="cart")
@@ -70,10 +73,27 @@ class Cart(Base):
         return len(self.items) == 0
 
 
+def instructions_hash(instructions: str | None) -> str:
+    """Fixed-width key for special instructions ("" when there are none)."""
+    if instructions is None:
+        return ""
+    return hashlib.md5(instructions.encode(), usedforsecurity=False).hexdigest()
+
+
 class CartItem(Base):
     """Individual item in a shopping cart."""
 
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # One line per product and instructions; add-to-cart upserts against it
+        Index(
+            "uq_cart_items_cart_product_instructions",
+            "cart_id",
+            "product_id",
+            "special_instructions_hash",
+            unique=True,
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     cart_id: Mapped[int] = mapped_column(
@@ -90,6 +110,7 @@ class CartItem(Base):
     special_instructions: Mapped[str | None] = mapped_column(
         Text
     )  # "Happy Birthday John!"
+    special_instructions_hash: Mapped[str] = mapped_column(String(32), default="")
 
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
@@ -101,6 +122,12 @@ class CartItem(Base):
     cart: Mapped["Cart"] = relationship(back_populates="items")
     product: Mapped["Product"] = relationship(lazy="selectin")
 
+    @validates("special_instructions")
+    def _hash_instructions(self, key: str, value: str | None) -> str | None:
+        """Keep the instructions hash in step with the instructions."""
+        self.special_instructions_hash = instructions_hash(value)
+        return value
+
     @property
     def line_total(self) -> Decimal:
         """Calculate line item total."""
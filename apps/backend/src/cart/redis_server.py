@@ -0,0 +1,205 @@
+"""In-process server speaking the Redis protocol (RESP2/RESP3) for guest carts.
+
+Serves the commands the key-value cart store uses from an InMemoryRedis
+keyspace, so the real redis.asyncio client path can run against it in tests
+and local development without a Redis install:
+
+    async with FakeRedisServer() as server:
+        client = redis.asyncio.from_url(server.url, decode_responses=True)
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from src.cart.store import InMemoryRedis
+
+
+class _Status(str):
+    """A simple string reply (+OK) rather than a bulk string."""
+
+
+class _Error(Exception):
+    """Sent back to the client as an error reply."""
+
+
+OK = _Status("OK")
+
+
+def _encode(value: Any, protocol: int = 2) -> bytes:
+    """Serialize a reply; RESP3 has its own null and map types."""
+    if value is None:
+        return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+    if isinstance(value, _Status):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, bool | int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if isinstance(value, dict):
+        items = [item for pair in value.items() for item in pair]
+        if protocol == 3:
+            return b"%%%d\r\n" % len(value) + b"".join(
+                _encode(item, protocol) for item in items
+            )
+        return _encode(items, protocol)
+    if isinstance(value, list | tuple):
+        return b"*%d\r\n" % len(value) + b"".join(
+            _encode(item, protocol) for item in value
+        )
+    raise TypeError(f"Can't encode {type(value).__name__}")
+
+
+async def _read_command(reader: asyncio.StreamReader) -> list[str] | None:
+    """Read one command as a list of arguments; None once the client is gone."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.decode().split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        data = await reader.readexactly(int(header[1:]) + 2)
+        args.append(data[:-2].decode())
+    return args
+
+
+def _pairs(args: list[str]) -> dict[str, str]:
+    if not args or len(args) % 2:
+        raise _Error("ERR wrong number of arguments")
+    return dict(zip(args[::2], args[1::2], strict=True))
+
+
+def _integer(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise _Error("ERR value is not an integer or out of range") from None
+
+
+class FakeRedisServer:
+    """A TCP server on localhost answering Redis commands from a keyspace."""
+
+    def __init__(self, keyspace: InMemoryRedis | None = None):
+        self.keyspace = keyspace or InMemoryRedis()
+        self.url = ""
+        self._server: asyncio.Server | None = None
+        self._commands: dict[str, Callable[..., Awaitable[Any]]] = {
+            "PING": self._ping,
+            "CLIENT": self._ok,
+            "SELECT": self._ok,
+            "HGET": self.keyspace.hget,
+            "HGETALL": self.keyspace.hgetall,
+            "HSET": self._hset,
+            "HSETNX": self.keyspace.hsetnx,
+            "HINCRBY": self._hincrby,
+            "HDEL": self.keyspace.hdel,
+            "EXPIRE": self._expire,
+            "TTL": self.keyspace.ttl,
+            "DEL": self.keyspace.delete,
+            "RENAME": self._rename,
+            "FLUSHALL": self._flushall,
+            "FLUSHDB": self._flushall,
+        }
+
+    async def start(self) -> str:
+        """Listen on a free port; returns the redis:// URL to connect to."""
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.url = f"redis://{host}:{port}/0"
+        return self.url
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeRedisServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        protocol = 2
+        try:
+            while (args := await _read_command(reader)) is not None:
+                if not args:
+                    continue
+                if args[0].upper() == "HELLO":
+                    protocol, reply = self._hello(args[1:], protocol)
+                    writer.write(reply)
+                else:
+                    writer.write(await self._execute(args, protocol))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _hello(args: list[str], protocol: int) -> tuple[int, bytes]:
+        """Switch the connection's protocol, as redis-py asks on connect."""
+        try:
+            requested = _integer(args[0]) if args else protocol
+        except _Error as e:
+            return protocol, b"-%s\r\n" % str(e).encode()
+        if requested not in (2, 3):
+            return protocol, b"-NOPROTO unsupported protocol version\r\n"
+        info = {
+            "server": "redis",
+            "version": "7.2.0",
+            "proto": requested,
+            "id": 1,
+            "mode": "standalone",
+            "role": "master",
+            "modules": [],
+        }
+        return requested, _encode(info, requested)
+
+    async def _execute(self, args: list[str], protocol: int = 2) -> bytes:
+        name, *params = args
+        command = self._commands.get(name.upper())
+        if command is None:
+            return b"-ERR unknown command '%s'\r\n" % name.encode()
+        try:
+            return _encode(await command(*params), protocol)
+        except _Error as e:
+            return b"-%s\r\n" % str(e).encode()
+        except TypeError:
+            return b"-ERR wrong number of arguments for '%s'\r\n" % name.encode()
+
+    # Commands whose arguments or replies differ from the keyspace's methods
+
+    async def _ping(self, message: str | None = None) -> Any:
+        return _Status("PONG") if message is None else message
+
+    async def _ok(self, *args: str) -> _Status:
+        return OK
+
+    async def _hset(self, key: str, *args: str) -> int:
+        return await self.keyspace.hset(key, mapping=_pairs(list(args)))
+
+    async def _hincrby(self, key: str, field: str, amount: str) -> int:
+        return await self.keyspace.hincrby(key, field, _integer(amount))
+
+    async def _expire(self, key: str, seconds: str) -> bool:
+        return await self.keyspace.expire(key, _integer(seconds))
+
+    async def _rename(self, key: str, newkey: str) -> _Status:
+        try:
+            await self.keyspace.rename(key, newkey)
+        except KeyError:
+            raise _Error("ERR no such key") from None
+        return OK
+
+    async def _flushall(self, *args: str) -> _Status:
+        self.keyspace.flushall()
+        return OK
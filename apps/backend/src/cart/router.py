@@ -6,24 +6,18 @@ from fastapi import APIRouter, Depends, HTTPException, Header, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import CurrentUser
-from src.cart.dependencies import CurrentCart
+from src.cart.dependencies import CartStoreForUpdate, CurrentCartStore
 from src.cart.schemas import (
+    CartBatchRequest,
     CartDeliveryUpdate,
     CartItemCreate,
     CartItemResponse,
     CartItemUpdate,
     CartMergeRequest,
     CartResponse,
+    CartSummaryResponse,
 )
-from src.cart.service import (
-    add_item_to_cart,
-    clear_cart,
-    get_cart_item_by_id,
-    merge_guest_cart,
-    remove_cart_item,
-    update_cart_delivery,
-    update_cart_item,
-)
+from src.cart.store import cart_store
 from src.database import get_db
 
 router = APIRouter(prefix="/cart", tags=["cart"])
@@ -34,9 +28,20 @@ router = APIRouter(prefix="/cart", tags=["cart"])
     response_model=CartResponse,
     operation_id="getCart",
 )
-async def get_cart(cart: CurrentCart) -> CartResponse:
+async def get_cart(store: CurrentCartStore) -> CartResponse:
     """Get the current cart."""
-    return cart
+    return await store.get()
+
+
+@router.get(
+    "/summary",
+    response_model=CartSummaryResponse,
+    operation_id="getCartSummary",
+)
+async def get_cart_summary(store: CurrentCartStore) -> CartSummaryResponse:
+    """Get the cart's item count and subtotal (for the header badge)."""
+    summary = await store.summary()
+    return CartSummaryResponse(**summary._asdict())
 
 
 @router.post(
@@ -47,12 +52,11 @@ async def get_cart(cart: CurrentCart) -> CartResponse:
 )
 async def add_item(
     item_data: CartItemCreate,
-    cart: CurrentCart,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    store: CartStoreForUpdate,
 ) -> CartItemResponse:
     """Add an item to the cart."""
     try:
-        item = await add_item_to_cart(db, cart, item_data)
+        item = await store.add_item(item_data)
         return item
     except ValueError as e:
         raise HTTPException(
@@ -61,6 +65,26 @@ async def add_item(
         )
 
 
+@router.post(
+    "/items:batch",
+    response_model=CartResponse,
+    operation_id="batchCartItems",
+)
+async def batch_items(
+    batch: CartBatchRequest,
+    store: CartStoreForUpdate,
+) -> CartResponse:
+    """Add, update and remove several items at once; all or nothing."""
+    try:
+        cart = await store.apply_batch(batch.operations)
+        return cart
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
 @router.put(
     "/items/{item_id}",
     response_model=CartItemResponse,
@@ -69,26 +93,24 @@ async def add_item(
 async def update_item(
     item_id: int,
     item_data: CartItemUpdate,
-    cart: CurrentCart,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    store: CartStoreForUpdate,
 ) -> CartItemResponse:
     """Update a cart item's quantity or instructions."""
-    item = await get_cart_item_by_id(db, item_id, cart.id)
-    if not item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cart item not found",
-        )
-
     try:
-        updated = await update_cart_item(db, item, item_data)
-        return updated
+        updated = await store.update_item(item_id, item_data)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
 
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cart item not found",
+        )
+    return updated
+
 
 @router.delete(
     "/items/{item_id}",
@@ -97,31 +119,24 @@ async def update_item(
 )
 async def remove_item(
     item_id: int,
-    cart: CurrentCart,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    store: CartStoreForUpdate,
 ) -> None:
     """Remove an item from the cart."""
-    item = await get_cart_item_by_id(db, item_id, cart.id)
-    if not item:
+    if not await store.remove_item(item_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cart item not found",
         )
 
-    await remove_cart_item(db, item)
-
 
 @router.delete(
     "",
     status_code=status.HTTP_204_NO_CONTENT,
     operation_id="clearCart",
 )
-async def clear_cart_items(
-    cart: CurrentCart,
-    db: Annotated[AsyncSession, Depends(get_db)],
-) -> None:
+async def clear_cart_items(store: CartStoreForUpdate) -> None:
     """Clear all items from the cart."""
-    await clear_cart(db, cart)
+    await store.clear()
 
 
 @router.put(
@@ -131,11 +146,10 @@ async def clear_cart_items(
 )
 async def update_delivery(
     delivery_data: CartDeliveryUpdate,
-    cart: CurrentCart,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    store: CartStoreForUpdate,
 ) -> CartResponse:
     """Update cart delivery preferences."""
-    updated = await update_cart_delivery(db, cart, delivery_data)
+    updated = await store.update_delivery(delivery_data)
     return updated
 
 
@@ -150,5 +164,6 @@ async def merge_cart(
     db: Annotated[AsyncSession, Depends(get_db)],
 ) -> CartResponse:
     """Merge a guest cart into the current user's cart."""
-    cart = await merge_guest_cart(db, current_user.id, merge_data.session_id)
+    guest_store = cart_store(db, session_id=merge_data.session_id)
+    cart = await guest_store.move_to(current_user.id)
     return cart
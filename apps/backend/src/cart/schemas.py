@@ -2,6 +2,7 @@
 
 from datetime import date, datetime
 from decimal import Decimal
+from typing import Annotated, Literal
 
 from pydantic import BaseModel, Field
 
@@ -72,6 +73,44 @@ class CartResponse(BaseModel):
         from_attributes = True
 
 
+class CartBatchAdd(CartItemCreate):
+    """Batch operation: add a product (merging into a matching line)."""
+
+    op: Literal["add"]
+
+
+class CartBatchUpdate(CartItemUpdate):
+    """Batch operation: change an existing line."""
+
+    op: Literal["update"]
+    item_id: int
+
+
+class CartBatchRemove(BaseModel):
+    """Batch operation: remove an existing line."""
+
+    op: Literal["remove"]
+    item_id: int
+
+
+CartBatchOperation = Annotated[
+    CartBatchAdd | CartBatchUpdate | CartBatchRemove, Field(discriminator="op")
+]
+
+
+class CartBatchRequest(BaseModel):
+    """Schema for applying several cart operations at once."""
+
+    operations: list[CartBatchOperation] = Field(..., min_length=1, max_length=100)
+
+
+class CartSummaryResponse(BaseModel):
+    """Schema for the cart badge (counts only, no items)."""
+
+    item_count: int
+    subtotal: Decimal
+
+
 class CartMergeRequest(BaseModel):
     """Schema for merging a guest cart into a user cart."""
 
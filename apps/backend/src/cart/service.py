@@ -2,14 +2,31 @@
 
 from datetime import datetime, timedelta
 from decimal import Decimal
+from typing import NamedTuple
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-
-from src.cart.models import Cart, CartItem
-from src.cart.schemas import CartDeliveryUpdate, CartItemCreate, CartItemUpdate
+from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.cart.cache import (
+    cart_handle_cache,
+    cart_summary_cache,
+    forget_cart,
+    forget_summary,
+    owner_key,
+)
+from src.cart.models import Cart, CartItem, instructions_hash
+from src.cart.schemas import (
+    CartBatchOperation,
+    CartDeliveryUpdate,
+    CartItemCreate,
+    CartItemUpdate,
+)
+from src.database import upsert
 from src.products.models import Product
+from src.services.inventory import InventoryService
 
 
 async def get_cart_by_user(db: AsyncSession, user_id: int) -> Cart | None:
@@ -17,7 +34,11 @@ async def get_cart_by_user(db: AsyncSession, user_id: int) -> Cart | None:
     query = (
         select(Cart)
         .where(Cart.user_id == user_id)
-        .options(selectinload(Cart.items).selectinload(CartItem.product))
+        .options(
+            selectinload(Cart.items)
+            .selectinload(CartItem.product)
+            .selectinload(Product.category)
+        )
     )
     result = await db.execute(query)
     return result.scalars().first()
@@ -29,12 +50,82 @@ async def get_cart_by_session(db: AsyncSession, session_id: str) -> Cart | None:
         select(Cart)
         .where(Cart.session_id == session_id)
         .where(Cart.expires_at > datetime.utcnow())
-        .options(selectinload(Cart.items).selectinload(CartItem.product))
+        .options(
+            selectinload(Cart.items)
+            .selectinload(CartItem.product)
+            .selectinload(Product.category)
+        )
     )
     result = await db.execute(query)
     return result.scalars().first()
 
 
+async def get_cart_by_id(db: AsyncSession, cart_id: int) -> Cart | None:
+    """Get a cart with its items and their products."""
+    query = (
+        select(Cart)
+        .where(Cart.id == cart_id)
+        .options(
+            selectinload(Cart.items)
+            .selectinload(CartItem.product)
+            .selectinload(Product.category)
+        )
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+class CartHandle(NamedTuple):
+    """Just enough of a cart to address it; nothing is loaded."""
+
+    id: int
+    expires_at: datetime | None = None
+
+
+async def get_cart_handle(
+    db: AsyncSession,
+    user_id: int | None = None,
+    session_id: str | None = None,
+    create: bool = True,
+) -> CartHandle | None:
+    """Resolve the owner's cart id, cached per owner.
+
+    The cart is created if missing unless create is False (then None).
+    """
+    key = owner_key(user_id, session_id)
+    handle = cart_handle_cache.get(key)
+    if handle and (handle.expires_at is None or handle.expires_at > datetime.utcnow()):
+        return handle
+
+    query = select(Cart.id, Cart.expires_at)
+    if user_id:
+        query = query.where(Cart.user_id == user_id)
+    else:
+        query = query.where(Cart.session_id == session_id).where(
+            Cart.expires_at > datetime.utcnow()
+        )
+    row = (await db.execute(query)).first()
+    if row:
+        handle = CartHandle(*row)
+    elif not create:
+        return None
+    else:
+        cart = Cart(
+            user_id=user_id,
+            session_id=session_id if not user_id else None,
+            expires_at=(
+                datetime.utcnow() + timedelta(days=7) if not user_id else None
+            ),
+        )
+        db.add(cart)
+        await db.commit()
+        handle = CartHandle(cart.id, cart.expires_at)
+
+    cart_handle_cache.set(key, handle)
+    return handle
+
+
 async def get_or_create_cart(
     db: AsyncSession,
     user_id: int | None = None,
@@ -63,55 +154,217 @@ async def get_or_create_cart(
     return cart
 
 
-async def add_item_to_cart(
-    db: AsyncSession,
-    cart: Cart,
-    item_data: CartItemCreate,
-) -> CartItem:
-    """Add an item to the cart or update quantity if already exists."""
-    # Get product to validate and get price
-    product = await db.get(Product, item_data.product_id)
+class CartSummary(NamedTuple):
+    """Totals for the cart badge."""
+
+    item_count: int = 0
+    subtotal: Decimal = Decimal("0.00")
+
+
+async def get_cart_summary(db: AsyncSession, cart_id: int) -> CartSummary:
+    """Item count and subtotal from one aggregate query, cached per cart."""
+    summary = cart_summary_cache.get(cart_id)
+    if summary is None:
+        item_count, subtotal = (
+            await db.execute(
+                select(
+                    func.coalesce(func.sum(CartItem.quantity), 0),
+                    func.coalesce(func.sum(CartItem.quantity * CartItem.unit_price), 0),
+                ).where(CartItem.cart_id == cart_id)
+            )
+        ).one()
+        summary = CartSummary(
+            int(item_count), Decimal(str(subtotal)).quantize(Decimal("0.01"))
+        )
+        cart_summary_cache.set(cart_id, summary)
+    return summary
+
+
+def check_purchasable(product: Product | None) -> Product:
+    """Raise ValueError unless the product can go in a cart."""
     if not product:
         raise ValueError("Product not found")
     if not product.is_active:
         raise ValueError("Product is not available")
     if not product.is_in_stock:
         raise ValueError("Product is out of stock")
+    return product
+
 
-    # Validate quantity against product constraints
-    quantity = item_data.quantity
+async def get_purchasable_product(db: AsyncSession, product_id: int) -> Product:
+    """Load a product that is about to go in a cart, or raise ValueError."""
+    product = await db.get(
+        Product, product_id, options=[selectinload(Product.category)]
+    )
+    return check_purchasable(product)
+
+
+async def get_products_by_id(
+    db: AsyncSession, product_ids: set[int]
+) -> dict[int, Product]:
+    """Load products (with category) for a set of ids in one query."""
+    if not product_ids:
+        return {}
+    result = await db.scalars(
+        select(Product)
+        .where(Product.id.in_(product_ids))
+        .options(selectinload(Product.category))
+    )
+    return {product.id: product for product in result}
+
+
+def check_quantity(product: Product, quantity: int) -> None:
+    """Validate a line quantity against the product's ordering constraints."""
     if product.minimum_quantity and quantity < product.minimum_quantity:
         raise ValueError(f"Minimum order quantity is {product.minimum_quantity}")
     if product.quantity_increment and quantity % product.quantity_increment != 0:
         raise ValueError(f"Quantity must be in increments of {product.quantity_increment}")
 
-    # Check if item already exists in cart
-    existing_item = None
-    for item in cart.items:
-        if item.product_id == item_data.product_id:
-            # Only merge if no special instructions or same instructions
-            if item.special_instructions == item_data.special_instructions:
-                existing_item = item
-                break
-
-    if existing_item:
-        existing_item.quantity += quantity
-        existing_item.updated_at = datetime.utcnow()
-        await db.commit()
-        await db.refresh(existing_item)
-        return existing_item
-    else:
-        new_item = CartItem(
-            cart_id=cart.id,
-            product_id=item_data.product_id,
-            quantity=quantity,
-            unit_price=product.price,
-            special_instructions=item_data.special_instructions,
-        )
-        db.add(new_item)
-        await db.commit()
-        await db.refresh(new_item)
-        return new_item
+
+def is_limited(product: Product) -> bool:
+    """Whether carts may only hold what is left of the product (seasonal drops)."""
+    return (
+        product.is_seasonal and product.track_inventory and not product.allow_backorder
+    )
+
+
+async def check_available(
+    db: AsyncSession, products: dict[int, Product], quantities: dict[int, int]
+) -> None:
+    """For limited (seasonal) drops, reject carts holding more than is left.
+
+    quantities maps product ids to the total the cart would hold once the
+    change is made, across all of its lines for that product. Counts stock
+    held by orders awaiting payment, so a cart that would fail at checkout
+    is refused when it is changed instead.
+    """
+    limited = {
+        product_id
+        for product_id in quantities
+        if products.get(product_id) and is_limited(products[product_id])
+    }
+    if not limited:
+        return
+    available = await InventoryService(db).available_to_sell(limited)
+    for product_id in sorted(limited):
+        left = max(available.get(product_id, 0), 0)
+        if quantities[product_id] > left:
+            raise ValueError(f"Only {left} available")
+
+
+async def check_cart_available(
+    db: AsyncSession,
+    cart_id: int,
+    products: dict[int, Product],
+    changes: dict[int, int],
+) -> None:
+    """check_available for a database cart, given how much a change adds.
+
+    changes maps product ids to the quantity the change adds to the cart
+    (negative if it takes some away). Only limited products are looked up.
+    """
+    limited = {
+        product_id
+        for product_id in changes
+        if products.get(product_id) and is_limited(products[product_id])
+    }
+    if not limited:
+        return
+    result = await db.execute(
+        select(CartItem.product_id, func.sum(CartItem.quantity))
+        .where(CartItem.cart_id == cart_id)
+        .where(CartItem.product_id.in_(limited))
+        .group_by(CartItem.product_id)
+    )
+    quantities = {product_id: changes[product_id] for product_id in limited}
+    for product_id, quantity in result.all():
+        quantities[product_id] += quantity
+    await check_available(db, products, quantities)
+
+
+def _add_quantity_on_conflict(insert_stmt, now: datetime):
+    """Turn an INSERT into cart_items into an upsert that sums quantities."""
+    return insert_stmt.on_conflict_do_update(
+        index_elements=[
+            CartItem.cart_id,
+            CartItem.product_id,
+            CartItem.special_instructions_hash,
+        ],
+        set_={
+            "quantity": CartItem.quantity + insert_stmt.excluded.quantity,
+            "updated_at": now,
+        },
+    )
+
+
+def _upsert_lines(db: AsyncSession, cart_id: int, lines: list[dict]):
+    """INSERT cart lines, adding quantities onto matching lines already there.
+
+    Each line needs product_id, quantity, unit_price and special_instructions.
+    """
+    now = datetime.utcnow()
+    insert_stmt = upsert(db, CartItem).values(
+        [
+            {
+                **line,
+                "cart_id": cart_id,
+                "special_instructions_hash": instructions_hash(
+                    line["special_instructions"]
+                ),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for line in lines
+        ]
+    )
+    return _add_quantity_on_conflict(insert_stmt, now)
+
+
+async def add_item_to_cart(
+    db: AsyncSession,
+    cart_id: int,
+    item_data: CartItemCreate,
+) -> CartItem:
+    """Add an item to the cart or update quantity if already exists."""
+    product = await get_purchasable_product(db, item_data.product_id)
+    check_quantity(product, item_data.quantity)
+    await check_cart_available(
+        db, cart_id, {product.id: product}, {product.id: item_data.quantity}
+    )
+
+    # Insert the line, or add to the matching one, in a single atomic statement
+    # so concurrent adds from two tabs can't overwrite each other
+    stmt = _upsert_lines(
+        db,
+        cart_id,
+        [
+            {
+                "product_id": product.id,
+                "quantity": item_data.quantity,
+                "unit_price": product.price,
+                "special_instructions": item_data.special_instructions,
+            }
+        ],
+    ).returning(CartItem)
+    # The product is already loaded; attach it rather than selecting it again
+    query = (
+        select(CartItem)
+        .from_statement(stmt)
+        .options(noload(CartItem.product))
+        .execution_options(populate_existing=True)
+    )
+    item = (await db.scalars(query)).one()
+    set_committed_value(item, "product", product)
+    await db.commit()
+    forget_summary(cart_id)
+    return item
+
+
+async def add_lines_to_cart(db: AsyncSession, cart_id: int, lines: list[dict]) -> None:
+    """Copy already-priced lines (e.g. from a guest cart) into a cart."""
+    if lines:
+        await db.execute(_upsert_lines(db, cart_id, lines))
+        forget_summary(cart_id)
 
 
 async def update_cart_item(
@@ -124,17 +377,25 @@ async def update_cart_item(
         # Validate against product constraints
         product = await db.get(Product, item.product_id)
         if product:
-            if product.minimum_quantity and item_data.quantity < product.minimum_quantity:
-                raise ValueError(f"Minimum order quantity is {product.minimum_quantity}")
-            if product.quantity_increment and item_data.quantity % product.quantity_increment != 0:
-                raise ValueError(f"Quantity must be in increments of {product.quantity_increment}")
+            check_quantity(product, item_data.quantity)
+            await check_cart_available(
+                db,
+                item.cart_id,
+                {product.id: product},
+                {product.id: item_data.quantity - item.quantity},
+            )
         item.quantity = item_data.quantity
 
     if item_data.special_instructions is not None:
         item.special_instructions = item_data.special_instructions
 
     item.updated_at = datetime.utcnow()
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise ValueError("This item is already in the cart with the same instructions")
+    forget_summary(item.cart_id)
     await db.refresh(item)
     return item
 
@@ -143,12 +404,14 @@ async def remove_cart_item(db: AsyncSession, item: CartItem) -> None:
     """Remove an item from the cart."""
     await db.delete(item)
     await db.commit()
+    forget_summary(item.cart_id)
 
 
-async def clear_cart(db: AsyncSession, cart: Cart) -> None:
+async def clear_cart(db: AsyncSession, cart_id: int) -> None:
     """Remove all items from the cart."""
-    await db.execute(delete(CartItem).where(CartItem.cart_id == cart.id))
+    await db.execute(delete(CartItem).where(CartItem.cart_id == cart_id))
     await db.commit()
+    forget_summary(cart_id)
 
 
 async def update_cart_delivery(
@@ -173,46 +436,74 @@ async def merge_guest_cart(
     user_id: int,
     session_id: str,
 ) -> Cart:
-    """Merge a guest cart into a user's cart after login."""
-    guest_cart = await get_cart_by_session(db, session_id)
-    user_cart = await get_or_create_cart(db, user_id=user_id)
-
-    if guest_cart and guest_cart.items:
-        for guest_item in guest_cart.items:
-            # Check if user cart already has this product
-            existing = None
-            for item in user_cart.items:
-                if item.product_id == guest_item.product_id:
-                    if item.special_instructions == guest_item.special_instructions:
-                        existing = item
-                        break
-
-            if existing:
-                existing.quantity += guest_item.quantity
-            else:
-                # Move item to user cart
-                new_item = CartItem(
-                    cart_id=user_cart.id,
-                    product_id=guest_item.product_id,
-                    quantity=guest_item.quantity,
-                    unit_price=guest_item.unit_price,
-                    special_instructions=guest_item.special_instructions,
-                )
-                db.add(new_item)
+    """Merge a guest cart into a user's cart after login.
+
+    Runs as a few set-based statements in one transaction, whatever the size
+    of either cart. The guest cart row is locked first, so a concurrent login
+    with the same session waits and then finds nothing left to merge.
+    """
+    user_cart_id = (await get_cart_handle(db, user_id=user_id)).id
+
+    guest = (
+        await db.execute(
+            select(Cart.id, Cart.requested_delivery_date, Cart.delivery_time_slot)
+            .where(Cart.session_id == session_id)
+            .where(Cart.expires_at > datetime.utcnow())
+            .with_for_update()
+        )
+    ).first()
+
+    if guest:
+        # Move every guest line across, summing quantities on matching lines
+        now = datetime.utcnow()
+        columns = [
+            "cart_id",
+            "product_id",
+            "quantity",
+            "unit_price",
+            "special_instructions",
+            "special_instructions_hash",
+            "created_at",
+            "updated_at",
+        ]
+        guest_lines = select(
+            literal(user_cart_id),
+            CartItem.product_id,
+            CartItem.quantity,
+            CartItem.unit_price,
+            CartItem.special_instructions,
+            CartItem.special_instructions_hash,
+            literal(now),
+            literal(now),
+        ).where(CartItem.cart_id == guest.id)
+        await db.execute(
+            _add_quantity_on_conflict(
+                upsert(db, CartItem).from_select(columns, guest_lines), now
+            )
+        )
 
         # Copy delivery preferences if user cart doesn't have them
-        if guest_cart.requested_delivery_date and not user_cart.requested_delivery_date:
-            user_cart.requested_delivery_date = guest_cart.requested_delivery_date
-        if guest_cart.delivery_time_slot and not user_cart.delivery_time_slot:
-            user_cart.delivery_time_slot = guest_cart.delivery_time_slot
+        await db.execute(
+            update(Cart)
+            .where(Cart.id == user_cart_id)
+            .values(
+                requested_delivery_date=func.coalesce(
+                    Cart.requested_delivery_date, guest.requested_delivery_date
+                ),
+                delivery_time_slot=func.coalesce(
+                    Cart.delivery_time_slot, guest.delivery_time_slot
+                ),
+            )
+        )
 
         # Delete guest cart
-        await db.delete(guest_cart)
-
+        await db.execute(delete(CartItem).where(CartItem.cart_id == guest.id))
+        await db.execute(delete(Cart).where(Cart.id == guest.id))
         await db.commit()
-        await db.refresh(user_cart)
+        forget_cart(session_id=session_id)
+        forget_summary(user_cart_id, guest.id)
 
-    return user_cart
+    return await get_cart_by_id(db, user_cart_id)
 
 
 async def get_cart_item_by_id(
@@ -225,16 +516,155 @@ async def get_cart_item_by_id(
         select(CartItem)
         .where(CartItem.id == item_id)
         .where(CartItem.cart_id == cart_id)
-        .options(selectinload(CartItem.product))
+        .options(selectinload(CartItem.product).selectinload(Product.category))
     )
     result = await db.execute(query)
     return result.scalars().first()
 
 
-async def cleanup_expired_carts(db: AsyncSession) -> int:
-    """Clean up expired guest carts. Returns number deleted."""
-    result = await db.execute(
-        delete(Cart).where(Cart.expires_at < datetime.utcnow())
+def validate_cart_batch(
+    operations: list[CartBatchOperation],
+    line_products: dict[int, int],
+    products: dict[int, Product],
+) -> None:
+    """Check a whole batch up front; raise ValueError for the first bad one.
+
+    line_products maps the cart's line ids to their product ids.
+    """
+    seen_items = set()
+    for operation in operations:
+        if operation.op == "add":
+            product = check_purchasable(products.get(operation.product_id))
+            check_quantity(product, operation.quantity)
+            continue
+
+        if operation.item_id not in line_products:
+            raise ValueError(f"Cart item {operation.item_id} not found")
+        if operation.item_id in seen_items:
+            raise ValueError(f"Cart item {operation.item_id} appears more than once")
+        seen_items.add(operation.item_id)
+
+        product = products.get(line_products[operation.item_id])
+        if operation.op == "update" and operation.quantity is not None and product:
+            check_quantity(product, operation.quantity)
+
+
+def batch_changes(
+    operations: list[CartBatchOperation], lines: dict[int, tuple[int, int]]
+) -> dict[int, int]:
+    """How much a (validated) batch adds to the cart per product id.
+
+    lines maps the cart's line ids to their (product id, quantity).
+    """
+    changes: dict[int, int] = {}
+    for operation in operations:
+        if operation.op == "add":
+            product_id, change = operation.product_id, operation.quantity
+        else:
+            product_id, quantity = lines[operation.item_id]
+            if operation.op == "remove":
+                change = -quantity
+            elif operation.quantity is not None:
+                change = operation.quantity - quantity
+            else:
+                continue
+        changes[product_id] = changes.get(product_id, 0) + change
+    return changes
+
+
+async def apply_cart_batch(
+    db: AsyncSession,
+    cart_id: int,
+    operations: list[CartBatchOperation],
+) -> Cart:
+    """Apply add/update/remove operations in one transaction.
+
+    Every product is loaded with one IN query and every operation validated
+    before anything is written; one bad operation rejects the batch. Updates
+    and removals address the lines as they were before the batch and are
+    applied first, then all adds go in as one upsert.
+    """
+    item_ids = [op.item_id for op in operations if op.op != "add"]
+    items = {}
+    if item_ids:
+        result = await db.scalars(
+            select(CartItem)
+            .where(CartItem.cart_id == cart_id)
+            .where(CartItem.id.in_(item_ids))
+            .options(noload(CartItem.product))
+        )
+        items = {item.id: item for item in result}
+
+    product_ids = {op.product_id for op in operations if op.op == "add"}
+    product_ids |= {item.product_id for item in items.values()}
+    products = await get_products_by_id(db, product_ids)
+    validate_cart_batch(
+        operations, {item.id: item.product_id for item in items.values()}, products
+    )
+    await check_cart_available(
+        db,
+        cart_id,
+        products,
+        batch_changes(
+            operations,
+            {item.id: (item.product_id, item.quantity) for item in items.values()},
+        ),
+    )
+
+    now = datetime.utcnow()
+    lines: dict[tuple, dict] = {}
+    for operation in operations:
+        if operation.op == "update":
+            item = items[operation.item_id]
+            if operation.quantity is not None:
+                item.quantity = operation.quantity
+            if operation.special_instructions is not None:
+                item.special_instructions = operation.special_instructions
+            item.updated_at = now
+        elif operation.op == "remove":
+            await db.delete(items[operation.item_id])
+        else:
+            # Adds of the same product and instructions collapse into one line
+            line = lines.setdefault(
+                (operation.product_id, operation.special_instructions),
+                {
+                    "product_id": operation.product_id,
+                    "quantity": 0,
+                    "unit_price": products[operation.product_id].price,
+                    "special_instructions": operation.special_instructions,
+                },
+            )
+            line["quantity"] += operation.quantity
+
+    try:
+        await db.flush()
+        await add_lines_to_cart(db, cart_id, list(lines.values()))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise ValueError("This item is already in the cart with the same instructions")
+    forget_summary(cart_id)
+    return await get_cart_by_id(db, cart_id)
+
+
+async def cleanup_expired_carts(db: AsyncSession, limit: int = 1000) -> int:
+    """Delete up to `limit` expired guest carts in one transaction.
+
+    Rows another transaction holds (a reaper in another worker, a guest
+    touching their cart) are skipped rather than waited on. Returns the number
+    deleted; call again until it returns less than `limit`.
+    """
+    expired = (
+        select(Cart.id)
+        .where(Cart.expires_at < datetime.utcnow())
+        .order_by(Cart.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
     )
+    cart_ids = list(await db.scalars(expired))
+    if cart_ids:
+        await db.execute(delete(CartItem).where(CartItem.cart_id.in_(cart_ids)))
+        await db.execute(delete(Cart).where(Cart.id.in_(cart_ids)))
     await db.commit()
-    return result.rowcount
+    forget_summary(*cart_ids)
+    return len(cart_ids)
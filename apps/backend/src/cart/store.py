@@ -0,0 +1,645 @@
+"""Cart storage backends.
+
+Authenticated carts always live in the database. CART_GUEST_STORE picks where
+guest carts live:
+- "sql": carts/cart_items rows like user carts (expired rows need reaping)
+- "redis": one Redis hash per session that expires natively
+- "memory": the same hash layout in an in-process fake Redis (dev and tests)
+
+A guest cart moves into the database when its owner logs in (move_to).
+"""
+
+import json
+import secrets
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from src.cart import service
+from src.cart.cache import forget_cart
+from src.cart.models import Cart, instructions_hash
+from src.cart.schemas import (
+    CartBatchOperation,
+    CartDeliveryUpdate,
+    CartItemCreate,
+    CartItemUpdate,
+)
+from src.config import get_settings
+from src.products.models import Product
+from src.products.service import get_product_list_items
+
+settings = get_settings()
+
+GUEST_CART_TTL = timedelta(days=7)
+
+
+class CartStore(ABC):
+    """One owner's cart, wherever it is stored.
+
+    Reads return objects shaped like CartResponse / CartItemResponse.
+    """
+
+    @abstractmethod
+    async def get(self) -> Any:
+        """The whole cart with items and their products."""
+
+    @abstractmethod
+    async def summary(self) -> service.CartSummary:
+        """Item count and subtotal without loading the lines."""
+
+    @abstractmethod
+    async def add_item(self, item_data: CartItemCreate) -> Any:
+        """Add a line, or add to the quantity of the matching line."""
+
+    @abstractmethod
+    async def update_item(self, item_id: int, item_data: CartItemUpdate) -> Any | None:
+        """Update a line. None if the cart has no such line."""
+
+    @abstractmethod
+    async def remove_item(self, item_id: int) -> bool:
+        """Remove a line. False if the cart has no such line."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove every line."""
+
+    @abstractmethod
+    async def apply_batch(self, operations: list[CartBatchOperation]) -> Any:
+        """Validate and apply several operations, returning the whole cart."""
+
+    @abstractmethod
+    async def update_delivery(self, delivery_data: CartDeliveryUpdate) -> Any:
+        """Update delivery preferences and return the whole cart."""
+
+    @abstractmethod
+    async def move_to(self, user_id: int) -> Cart:
+        """Merge this guest cart into a user's cart, then delete it."""
+
+
+# ============ Database ============
+
+
+class SqlCartStore(CartStore):
+    """Cart rows in the database, addressed through the cached cart handle."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        user_id: int | None = None,
+        session_id: str | None = None,
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.session_id = session_id
+
+    async def _cart_id(self) -> int:
+        handle = await service.get_cart_handle(self.db, self.user_id, self.session_id)
+        return handle.id
+
+    async def get(self) -> Cart:
+        cart = await service.get_cart_by_id(self.db, await self._cart_id())
+        if cart is None:
+            # Cached handle outlived its cart (e.g. deleted by another worker)
+            forget_cart(self.user_id, self.session_id)
+            cart = await service.get_cart_by_id(self.db, await self._cart_id())
+        return cart
+
+    async def summary(self) -> service.CartSummary:
+        # Don't create a cart row just to report that it's empty
+        handle = await service.get_cart_handle(
+            self.db, self.user_id, self.session_id, create=False
+        )
+        if handle is None:
+            return service.CartSummary()
+        return await service.get_cart_summary(self.db, handle.id)
+
+    async def add_item(self, item_data: CartItemCreate) -> Any:
+        return await service.add_item_to_cart(self.db, await self._cart_id(), item_data)
+
+    async def update_item(self, item_id: int, item_data: CartItemUpdate) -> Any | None:
+        item = await service.get_cart_item_by_id(self.db, item_id, await self._cart_id())
+        if not item:
+            return None
+        return await service.update_cart_item(self.db, item, item_data)
+
+    async def remove_item(self, item_id: int) -> bool:
+        item = await service.get_cart_item_by_id(self.db, item_id, await self._cart_id())
+        if not item:
+            return False
+        await service.remove_cart_item(self.db, item)
+        return True
+
+    async def clear(self) -> None:
+        await service.clear_cart(self.db, await self._cart_id())
+
+    async def apply_batch(self, operations: list[CartBatchOperation]) -> Cart:
+        return await service.apply_cart_batch(self.db, await self._cart_id(), operations)
+
+    async def update_delivery(self, delivery_data: CartDeliveryUpdate) -> Cart:
+        return await service.update_cart_delivery(self.db, await self.get(), delivery_data)
+
+    async def move_to(self, user_id: int) -> Cart:
+        return await service.merge_guest_cart(self.db, user_id, self.session_id)
+
+
+# ============ Key-Value (Redis) ============
+
+
+class KeyValueCartStore(CartStore):
+    """A guest cart as one Redis hash that expires GUEST_CART_TTL after a write.
+
+    Hash fields:
+    - "seq": line id counter
+    - "key:{product_id}:{instructions hash}": id of the line for that pair
+    - "qty:{id}": line quantity (HINCRBY keeps concurrent adds atomic)
+    - "line:{id}": JSON product_id, unit_price, special_instructions, timestamps
+    - "created_at", "updated_at", "requested_delivery_date", "delivery_time_slot"
+    """
+
+    def __init__(self, client: Any, db: AsyncSession, session_id: str):
+        self.client = client
+        self.db = db
+        self.session_id = session_id
+        self.key = f"cart:{session_id}"
+
+    @staticmethod
+    def _line_key(product_id: int, special_instructions: str | None) -> str:
+        return f"key:{product_id}:{instructions_hash(special_instructions)}"
+
+    async def _line(self, item_id: int) -> dict | None:
+        raw = await self.client.hget(self.key, f"line:{item_id}")
+        return json.loads(raw) if raw else None
+
+    @staticmethod
+    def _lines(fields: dict[str, str]) -> dict[int, tuple[dict, int]]:
+        """(line, quantity) by line id from the cart's hash fields."""
+        lines = {}
+        for field, value in fields.items():
+            if field.startswith("line:"):
+                item_id = int(field.removeprefix("line:"))
+                quantity = fields.get(f"qty:{item_id}")
+                if quantity:
+                    lines[item_id] = (json.loads(value), int(quantity))
+        return lines
+
+    async def _check_available(
+        self, products: dict[int, Any], changes: dict[int, int]
+    ) -> None:
+        """service.check_cart_available against the lines in this hash."""
+        if not any(
+            products.get(product_id) and service.is_limited(products[product_id])
+            for product_id in changes
+        ):
+            return
+        quantities = dict(changes)
+        for line, quantity in self._lines(await self.client.hgetall(self.key)).values():
+            if line["product_id"] in quantities:
+                quantities[line["product_id"]] += quantity
+        await service.check_available(self.db, products, quantities)
+
+    async def _touch(self, **fields: str) -> None:
+        """Stamp the cart as written and restart its expiry."""
+        now = datetime.utcnow().isoformat()
+        await self.client.hsetnx(self.key, "created_at", now)
+        await self.client.hset(self.key, mapping={"updated_at": now, **fields})
+        await self.client.expire(self.key, int(GUEST_CART_TTL.total_seconds()))
+
+    @staticmethod
+    def _item(item_id: int, line: dict, quantity: int, product: Any) -> dict:
+        unit_price = Decimal(line["unit_price"])
+        return {
+            "id": item_id,
+            "product_id": line["product_id"],
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "special_instructions": line["special_instructions"],
+            "line_total": unit_price * quantity,
+            "product": product,
+            "created_at": line["created_at"],
+            "updated_at": line["updated_at"],
+        }
+
+    async def get(self) -> dict:
+        fields = await self.client.hgetall(self.key)
+        lines = self._lines(fields)
+        product_ids = sorted({line["product_id"] for line, _ in lines.values()})
+        products = {
+            product["id"]: product
+            for product in await get_product_list_items(self.db, ids=product_ids)
+        }
+        # Lines for products no longer sold drop out of the cart
+        items = [
+            self._item(item_id, line, quantity, products[line["product_id"]])
+            for item_id, (line, quantity) in sorted(lines.items())
+            if line["product_id"] in products
+        ]
+        now = datetime.utcnow()
+        return {
+            "id": zlib.crc32(self.session_id.encode()),  # stable, not a row id
+            "user_id": None,
+            "session_id": self.session_id,
+            "requested_delivery_date": fields.get("requested_delivery_date"),
+            "delivery_time_slot": fields.get("delivery_time_slot"),
+            "items": items,
+            "item_count": sum(item["quantity"] for item in items),
+            "subtotal": sum((item["line_total"] for item in items), Decimal("0")),
+            "is_empty": not items,
+            "created_at": fields.get("created_at", now),
+            "updated_at": fields.get("updated_at", now),
+        }
+
+    async def summary(self) -> service.CartSummary:
+        lines = self._lines(await self.client.hgetall(self.key)).values()
+        return service.CartSummary(
+            sum(quantity for _, quantity in lines),
+            sum(
+                (Decimal(line["unit_price"]) * quantity for line, quantity in lines),
+                Decimal("0.00"),
+            ),
+        )
+
+    async def add_item(self, item_data: CartItemCreate) -> dict:
+        product = await service.get_purchasable_product(self.db, item_data.product_id)
+        service.check_quantity(product, item_data.quantity)
+        await self._check_available(
+            {product.id: product}, {product.id: item_data.quantity}
+        )
+
+        # Claim a line id for the product/instructions pair unless one exists
+        line_key = self._line_key(product.id, item_data.special_instructions)
+        item_id = await self.client.hincrby(self.key, "seq", 1)
+        if not await self.client.hsetnx(self.key, line_key, item_id):
+            item_id = int(await self.client.hget(self.key, line_key))
+        quantity = await self.client.hincrby(
+            self.key, f"qty:{item_id}", item_data.quantity
+        )
+
+        now = datetime.utcnow().isoformat()
+        line = await self._line(item_id) or {
+            "product_id": product.id,
+            "unit_price": str(product.price),
+            "special_instructions": item_data.special_instructions,
+            "created_at": now,
+        }
+        line["updated_at"] = now
+        await self.client.hset(self.key, f"line:{item_id}", json.dumps(line))
+        await self._touch()
+        return self._item(item_id, line, quantity, product)
+
+    async def update_item(self, item_id: int, item_data: CartItemUpdate) -> dict | None:
+        line = await self._line(item_id)
+        if line is None:
+            return None
+        product = await self.db.get(
+            Product, line["product_id"], options=[selectinload(Product.category)]
+        )
+
+        if item_data.quantity is not None:
+            if product:
+                service.check_quantity(product, item_data.quantity)
+                current = int(await self.client.hget(self.key, f"qty:{item_id}") or 0)
+                await self._check_available(
+                    {product.id: product}, {product.id: item_data.quantity - current}
+                )
+            await self.client.hset(self.key, f"qty:{item_id}", item_data.quantity)
+
+        instructions = item_data.special_instructions
+        if instructions is not None and instructions != line["special_instructions"]:
+            new_key = self._line_key(line["product_id"], instructions)
+            if not await self.client.hsetnx(self.key, new_key, item_id):
+                raise ValueError(
+                    "This item is already in the cart with the same instructions"
+                )
+            await self.client.hdel(
+                self.key,
+                self._line_key(line["product_id"], line["special_instructions"]),
+            )
+            line["special_instructions"] = instructions
+
+        line["updated_at"] = datetime.utcnow().isoformat()
+        await self.client.hset(self.key, f"line:{item_id}", json.dumps(line))
+        await self._touch()
+        quantity = int(await self.client.hget(self.key, f"qty:{item_id}"))
+        return self._item(item_id, line, quantity, product)
+
+    async def remove_item(self, item_id: int) -> bool:
+        line = await self._line(item_id)
+        if line is None:
+            return False
+        await self.client.hdel(
+            self.key,
+            f"line:{item_id}",
+            f"qty:{item_id}",
+            self._line_key(line["product_id"], line["special_instructions"]),
+        )
+        await self._touch()
+        return True
+
+    async def clear(self) -> None:
+        fields = await self.client.hgetall(self.key)
+        line_fields = [f for f in fields if f.startswith(("line:", "qty:", "key:"))]
+        if line_fields:
+            await self.client.hdel(self.key, *line_fields)
+        await self._touch()
+
+    async def apply_batch(self, operations: list[CartBatchOperation]) -> dict:
+        fields = await self.client.hgetall(self.key)
+        lines = self._lines(fields)
+        product_ids = {op.product_id for op in operations if op.op == "add"}
+        product_ids |= {line["product_id"] for line, _ in lines.values()}
+        products = await service.get_products_by_id(self.db, product_ids)
+        service.validate_cart_batch(
+            operations,
+            {item_id: line["product_id"] for item_id, (line, _) in lines.items()},
+            products,
+        )
+
+        # Apply the batch to a copy of the hash and check the result; the
+        # cart is only written, in one step, once every operation went through.
+        # Same order as the database store: existing lines first, then adds
+        staged = dict(fields)
+        now = datetime.utcnow().isoformat()
+        for operation in operations:
+            if operation.op == "update":
+                self._stage_update(staged, operation, now)
+            elif operation.op == "remove":
+                self._stage_remove(staged, operation.item_id)
+        for operation in operations:
+            if operation.op == "add":
+                self._stage_add(staged, operation, products[operation.product_id], now)
+
+        changed = service.batch_changes(
+            operations,
+            {item_id: (line["product_id"], qty) for item_id, (line, qty) in lines.items()},
+        )
+        quantities = dict.fromkeys(changed, 0)
+        for line, quantity in self._lines(staged).values():
+            if line["product_id"] in quantities:
+                quantities[line["product_id"]] += quantity
+        await service.check_available(self.db, products, quantities)
+
+        staged.setdefault("created_at", now)
+        staged["updated_at"] = now
+        await self._replace(staged)
+        return await self.get()
+
+    def _stage_add(
+        self, fields: dict[str, str], item_data: CartItemCreate, product: Any, now: str
+    ) -> None:
+        """add_item on an in-memory copy of the hash."""
+        line_key = self._line_key(product.id, item_data.special_instructions)
+        if line_key in fields:
+            item_id = int(fields[line_key])
+        else:
+            item_id = int(fields.get("seq", 0)) + 1
+            fields["seq"] = str(item_id)
+            fields[line_key] = str(item_id)
+        quantity = int(fields.get(f"qty:{item_id}", 0)) + item_data.quantity
+        fields[f"qty:{item_id}"] = str(quantity)
+
+        raw = fields.get(f"line:{item_id}")
+        line = json.loads(raw) if raw else {
+            "product_id": product.id,
+            "unit_price": str(product.price),
+            "special_instructions": item_data.special_instructions,
+            "created_at": now,
+        }
+        line["updated_at"] = now
+        fields[f"line:{item_id}"] = json.dumps(line)
+
+    def _stage_update(
+        self, fields: dict[str, str], operation: CartBatchOperation, now: str
+    ) -> None:
+        """update_item on an in-memory copy of the hash."""
+        item_id = operation.item_id
+        line = json.loads(fields[f"line:{item_id}"])
+        if operation.quantity is not None:
+            fields[f"qty:{item_id}"] = str(operation.quantity)
+
+        instructions = operation.special_instructions
+        if instructions is not None and instructions != line["special_instructions"]:
+            new_key = self._line_key(line["product_id"], instructions)
+            if new_key in fields:
+                raise ValueError(
+                    "This item is already in the cart with the same instructions"
+                )
+            del fields[self._line_key(line["product_id"], line["special_instructions"])]
+            fields[new_key] = str(item_id)
+            line["special_instructions"] = instructions
+
+        line["updated_at"] = now
+        fields[f"line:{item_id}"] = json.dumps(line)
+
+    def _stage_remove(self, fields: dict[str, str], item_id: int) -> None:
+        """remove_item on an in-memory copy of the hash."""
+        line = json.loads(fields.pop(f"line:{item_id}"))
+        fields.pop(f"qty:{item_id}", None)
+        fields.pop(self._line_key(line["product_id"], line["special_instructions"]), None)
+
+    async def _replace(self, fields: dict[str, str]) -> None:
+        """Swap the whole cart hash for fields in one step.
+
+        The new hash is written under a scratch key that expires on its own,
+        then RENAMEd over the cart, which Redis does atomically.
+        """
+        scratch = f"cart-staging:{secrets.token_hex(8)}"
+        await self.client.hset(scratch, mapping=fields)
+        await self.client.expire(scratch, int(GUEST_CART_TTL.total_seconds()))
+        await self.client.rename(scratch, self.key)
+
+    async def update_delivery(self, delivery_data: CartDeliveryUpdate) -> dict:
+        fields = {}
+        if delivery_data.requested_delivery_date is not None:
+            fields["requested_delivery_date"] = (
+                delivery_data.requested_delivery_date.isoformat()
+            )
+        if delivery_data.delivery_time_slot is not None:
+            fields["delivery_time_slot"] = delivery_data.delivery_time_slot
+        await self._touch(**fields)
+        return await self.get()
+
+    async def _merge_into(self, cart_id: int) -> None:
+        """Copy this cart's lines and delivery preferences into a user's cart."""
+        fields = await self.client.hgetall(self.key)
+        lines = [
+            {
+                "product_id": line["product_id"],
+                "quantity": quantity,
+                "unit_price": Decimal(line["unit_price"]),
+                "special_instructions": line["special_instructions"],
+            }
+            for line, quantity in self._lines(fields).values()
+        ]
+        await service.add_lines_to_cart(self.db, cart_id, lines)
+
+        # Copy delivery preferences if user cart doesn't have them
+        delivery = {}
+        if "requested_delivery_date" in fields:
+            delivery["requested_delivery_date"] = func.coalesce(
+                Cart.requested_delivery_date,
+                date.fromisoformat(fields["requested_delivery_date"]),
+            )
+        if "delivery_time_slot" in fields:
+            delivery["delivery_time_slot"] = func.coalesce(
+                Cart.delivery_time_slot, fields["delivery_time_slot"]
+            )
+        if delivery:
+            await self.db.execute(update(Cart).where(Cart.id == cart_id).values(**delivery))
+
+        await self.db.commit()
+
+    async def move_to(self, user_id: int) -> Cart:
+        handle = await service.get_cart_handle(self.db, user_id=user_id)
+
+        # Only one concurrent login gets to merge a given guest cart; the
+        # claim is given back if the merge doesn't commit, so no lines are lost
+        if await self.client.hsetnx(self.key, "merged_into", user_id):
+            try:
+                await self._merge_into(handle.id)
+            except Exception:
+                await self.client.hdel(self.key, "merged_into")
+                raise
+            await self.client.delete(self.key)
+
+        return await service.get_cart_by_id(self.db, handle.id)
+
+
+class InMemoryRedis:
+    """In-process stand-in for the Redis commands the cart store uses.
+
+    Behaves like redis.asyncio with decode_responses=True, including key
+    expiry, so guest carts work without a Redis server. Each worker process
+    has its own data. src.cart.redis_server serves the same keyspace over
+    the Redis protocol, so tests also exercise the real client.
+    """
+
+    def __init__(self):
+        self._data: dict[str, dict[str, str]] = {}
+        self._expires: dict[str, float] = {}
+
+    def _hash(self, key: str, create: bool = False) -> dict[str, str] | None:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        if create:
+            return self._data.setdefault(key, {})
+        return self._data.get(key)
+
+    def _drop_if_empty(self, key: str) -> None:
+        # Redis removes a hash once its last field is gone
+        if not self._data.get(key):
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return (self._hash(key) or {}).get(field)
+
+    async def hgetall(self, key: str) -> dict[str, str]:
+        return dict(self._hash(key) or {})
+
+    async def hset(
+        self,
+        key: str,
+        field: str | None = None,
+        value: Any = None,
+        mapping: dict[str, Any] | None = None,
+    ) -> int:
+        values = dict(mapping or {})
+        if field is not None:
+            values[field] = value
+        fields = self._hash(key, create=True)
+        added = sum(name not in fields for name in values)
+        fields.update((name, str(v)) for name, v in values.items())
+        return added
+
+    async def hsetnx(self, key: str, field: str, value: Any) -> bool:
+        fields = self._hash(key, create=True)
+        if field in fields:
+            return False
+        fields[field] = str(value)
+        return True
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        fields = self._hash(key, create=True)
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+        return int(fields[field])
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        values = self._hash(key) or {}
+        removed = sum(values.pop(field, None) is not None for field in fields)
+        self._drop_if_empty(key)
+        return removed
+
+    async def rename(self, key: str, newkey: str) -> bool:
+        if self._hash(key) is None:
+            raise KeyError(key)
+        self._data[newkey] = self._data.pop(key)
+        self._expires.pop(newkey, None)
+        if key in self._expires:
+            self._expires[newkey] = self._expires.pop(key)
+        return True
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if self._hash(key) is None:
+            return False
+        if seconds <= 0:
+            await self.delete(key)
+        else:
+            self._expires[key] = time.monotonic() + seconds
+        return True
+
+    async def ttl(self, key: str) -> int:
+        if self._hash(key) is None:
+            return -2
+        if key not in self._expires:
+            return -1
+        return round(self._expires[key] - time.monotonic())
+
+    async def delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            removed += self._hash(key) is not None
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return removed
+
+    def flushall(self) -> None:
+        self._data.clear()
+        self._expires.clear()
+
+
+memory_client = InMemoryRedis()
+
+
+@lru_cache
+def _redis_client() -> Any:
+    """Shared Redis connection pool for guest carts."""
+    try:
+        from redis import asyncio as redis
+    except ImportError as e:
+        raise RuntimeError(
+            'CART_GUEST_STORE="redis" needs the redis package '
+            "(install web-cellar-backend[redis])"
+        ) from e
+    return redis.from_url(settings.CART_REDIS_URL, decode_responses=True)
+
+
+def cart_store(
+    db: AsyncSession,
+    user_id: int | None = None,
+    session_id: str | None = None,
+) -> CartStore:
+    """The store holding a user's cart or, failing that, a guest session's."""
+    if user_id or settings.CART_GUEST_STORE == "sql":
+        return SqlCartStore(db, user_id=user_id, session_id=session_id)
+    client = memory_client if settings.CART_GUEST_STORE == "memory" else _redis_client()
+    return KeyValueCartStore(client, db, session_id)
@@ -20,6 +20,24 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-super-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
+    # "jose" or "pyjwt" (needs the fastjwt extra)
+    JWT_BACKEND: str = "jose"
+    # Recently verified tokens kept per worker (never past their exp)
+    TOKEN_CACHE_MAX_ENTRIES: int = 4096
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+
+    # Password hashing runs on a thread pool off the event loop; logins
+    # beyond workers + pending are refused with 503 rather than queued
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # Authenticated user rows cached per worker process
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    # Let read-only routes use the token's signed role/is_active claims
+    # instead of looking the user up (changes apply when the token expires)
+    TRUST_TOKEN_CLAIMS: bool = False
 
     # Application
     ENVIRONMENT: str = "development"
@@ -40,6 +58,43 @@ class Settings(BaseSettings):
     DEFAULT_LEAD_TIME_HOURS: int = 24
     ORDER_CUTOFF_HOUR: int = 14  # 2pm - orders after this require extra day
 
+    # Catalog read cache (per worker process)
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    CATALOG_CACHE_MAX_ENTRIES: int = 512
+
+    # Listing totals reused per filter set when count=cached
+    COUNT_CACHE_TTL_SECONDS: int = 30
+
+    # Cart id per user/session, so cart mutations skip the lookup
+    CART_HANDLE_CACHE_TTL_SECONDS: int = 300
+    CART_HANDLE_CACHE_MAX_ENTRIES: int = 10000
+
+    # Cart badge totals per cart (dropped locally on every cart change)
+    CART_SUMMARY_CACHE_TTL_SECONDS: int = 10
+
+    # Where guest carts live: "sql", "redis" or "memory" (in-process, dev only)
+    CART_GUEST_STORE: str = "sql"
+    CART_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Online payments hold stock until confirmed or this many seconds pass
+    STOCK_HOLD_TTL_SECONDS: int = 900
+    STOCK_HOLD_SWEEP_INTERVAL_SECONDS: int = 60
+    STOCK_HOLD_SWEEP_BATCH_SIZE: int = 1000
+
+    # Idempotency-Key handling for POST /orders: how long keys replay, how
+    # long a duplicate waits on the first request, and when a first request
+    # that never finished is considered dead
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = 60
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 3600
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = 1000
+
+    # Background maintenance (runs in each app process)
+    MAINTENANCE_ENABLED: bool = True
+    CART_REAPER_INTERVAL_SECONDS: int = 3600
+    CART_REAPER_BATCH_SIZE: int = 1000
+
     @property
     def cors_origins(self) -> list[str]:
         """Parse CORS origins from comma-separated string."""
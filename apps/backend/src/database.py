@@ -1,7 +1,10 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Callable
+from typing import Any
 
+from sqlalchemy import Table, event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 
 from src.config import get_settings
 
@@ -28,6 +31,37 @@ class Base(DeclarativeBase):
     pass
 
 
+def upsert(db: AsyncSession, table: Table | type[Base]):
+    """INSERT construct with ON CONFLICT support for the session's dialect."""
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def after_commit(
+    db: AsyncSession | Session, callback: Callable[..., None], *args: Any
+) -> None:
+    """Call callback(*args) once the session's transaction commits.
+
+    Dropped if the transaction rolls back instead. Cache invalidations go
+    through here: done at flush time, a concurrent read could put the old
+    row back in the cache before the write commits.
+    """
+    session = db.sync_session if isinstance(db, AsyncSession) else db
+    session.info.setdefault("after_commit", []).append((callback, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    for callback, args in session.info.pop("after_commit", []):
+        callback(*args)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session: Session) -> None:
+    session.info.pop("after_commit", None)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency that provides an async database session."""
     async with async_session_maker() as session:
@@ -0,0 +1,77 @@
+"""HTTP conditional request helpers (ETag / Last-Modified / 304).
+
+Routes compute a cheap version for what they are about to return (newest
+updated_at plus row count, or one row's updated_at), turn it into
+validators with the request's filter signature, and answer 304 before
+loading or serializing anything when the client already has that version.
+"""
+
+import hashlib
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, NamedTuple
+
+from fastapi import Request, Response, status
+
+# Cache-Control policies per kind of resource. Browsers revalidate after
+# max-age; shared caches (CDN) may keep serving a stale copy while they do.
+CATALOG_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+PRODUCT_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=600"
+REVIEWS_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=120"
+
+
+def _http_date(value: datetime) -> str:
+    """Format a naive UTC timestamp as an HTTP date."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return format_datetime(value.astimezone(UTC), usegmt=True)
+
+
+class Validators(NamedTuple):
+    """ETag and Last-Modified for one representation of a resource."""
+
+    etag: str
+    last_modified: datetime | None = None
+
+    @classmethod
+    def build(cls, last_modified: datetime | None, *parts: Any) -> "Validators":
+        """Derive a weak ETag from the version and the request's signature."""
+        digest = hashlib.sha1(repr((last_modified, parts)).encode()).hexdigest()
+        return cls(etag=f'W/"{digest[:27]}"', last_modified=last_modified)
+
+    def matches(self, request: Request) -> bool:
+        """True when the client's cached copy is still current."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # Weak comparison: W/ prefixes are ignored on both sides
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=UTC)
+            modified = self.last_modified.replace(microsecond=0)
+            if modified.tzinfo is None:
+                modified = modified.replace(tzinfo=UTC)
+            return modified <= since
+        return False
+
+    def headers(self, cache_control: str) -> dict[str, str]:
+        """Response headers advertising these validators."""
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = _http_date(self.last_modified)
+        return headers
+
+
+def not_modified(validators: Validators, cache_control: str) -> Response:
+    """An empty 304 response carrying the current validators."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validators.headers(cache_control),
+    )
@@ -8,7 +8,7 @@ from src.addresses.router import router as addresses_router
 from src.auth.router import router as auth_router
 from src.auth.admin_router import router as customers_admin_router
 from src.auth.models import User
-from src.auth.security import get_password_hash
+from src.auth.security import password_hasher
 from src.cart.router import router as cart_router
 from src.config import get_settings
 from src.database import async_session_maker
@@ -22,6 +22,7 @@ from src.products.router import categories_router, router as products_router
 from src.reviews.router import router as reviews_router
 from src.reviews.admin_router import router as reviews_admin_router
 from src.promo.router import router as promo_admin_router
+from src.services.maintenance import create_scheduler
 
 settings = get_settings()
 
@@ -42,7 +43,7 @@ async def create_test_users():
                 continue
             user = User(
                 email=user_data["email"],
-                hashed_password=get_password_hash(user_data["password"]),
+                hashed_password=await password_hasher.hash(user_data["password"]),
                 first_name=user_data["first_name"],
                 last_name=user_data["last_name"],
                 role=user_data["role"],
@@ -61,8 +62,16 @@ async def lifespan(app: FastAPI):
             await create_test_users()
         except Exception as e:
             print(f"Could not create test users: {e}")
+
+    scheduler = create_scheduler() if settings.MAINTENANCE_ENABLED else None
+    if scheduler:
+        scheduler.start()
+    app.state.maintenance = scheduler
     yield
-    # Shutdown: nothing needed
+    # Shutdown: stop background maintenance
+    if scheduler:
+        await scheduler.stop()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import CurrentAdmin
 from src.database import get_db
+from src.pagination import CountStrategy, total_pages
 from src.orders.schemas import (
     OrderFilters,
     OrderListResponse,
@@ -35,20 +36,32 @@ async def list_all_orders(
     db: Annotated[AsyncSession, Depends(get_db)],
     page: Annotated[int, Query(ge=1)] = 1,
     page_size: Annotated[int, Query(ge=1, le=100)] = 20,
-    status: Annotated[str | None, Query()] = None,
+    status_filter: Annotated[str | None, Query(alias="status")] = None,
     payment_status: Annotated[str | None, Query()] = None,
     fulfillment_type: Annotated[str | None, Query()] = None,
     search: Annotated[str | None, Query()] = None,
+    cursor: Annotated[str | None, Query()] = None,
+    count: Annotated[
+        CountStrategy, Query(description="How to compute total (exact/estimated/cached/none)")
+    ] = "cached",
 ) -> PaginatedOrders:
     """List all orders with filters (admin only)."""
     filters = OrderFilters(
-        status=status,
+        status=status_filter,
         payment_status=payment_status,
         fulfillment_type=fulfillment_type,
         search=search,
     )
 
-    orders, total = await get_all_orders(db, filters, page, page_size)
+    try:
+        orders, total, next_cursor = await get_all_orders(
+            db, filters, page, page_size, cursor, count
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     items = []
     for order in orders:
@@ -66,13 +79,14 @@ async def list_all_orders(
             )
         )
 
-    total_pages = (total + page_size - 1) // page_size
     return PaginatedOrders(
         items=items,
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages,
+        total_pages=total_pages(total, page_size),
+        has_more=next_cursor is not None,
+        next_cursor=next_cursor,
     )
 
 
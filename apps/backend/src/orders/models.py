@@ -4,7 +4,7 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Index, JSON, Numeric, String, Text
+from sqlalchemy import ForeignKey, Index, JSON, Numeric, Sequence, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -114,6 +114,19 @@ class Order(Base):
         return self.status == "pending"
 
 
+# Source of order numbers on PostgreSQL (see src.orders.numbers)
+order_number_seq = Sequence("order_number_seq", metadata=Base.metadata)
+
+
+class OrderNumberCounter(Base):
+    """Single-row order number counter for databases without sequences."""
+
+    __tablename__ = "order_number_counters"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    value: Mapped[int] = mapped_column()
+
+
 class OrderItem(Base):
     """Individual item in an order."""
 
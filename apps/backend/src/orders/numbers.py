@@ -0,0 +1,98 @@
+"""Order number allocation and encoding.
+
+Order numbers look like BB-250112-000A3KX: the order date, then a
+database-allocated sequence value as six Crockford base32 characters, then
+a Luhn mod 32 check character. Sequence values are unique, so numbers never
+collide and never need a retry. The alphabet sorts in ASCII order and the
+width is fixed, so numbers sort by date and then allocation order, which
+keeps inserts into the order_number index at its right-hand edge.
+"""
+
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import upsert
+from src.orders.models import OrderNumberCounter, order_number_seq
+
+PREFIX = "BB"
+# Crockford base32: no I, L, O or U, so numbers read back unambiguously
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+SEQUENCE_WIDTH = 6
+# 32**6 values: about a billion orders before the width has to grow
+MAX_SEQUENCE = len(ALPHABET) ** SEQUENCE_WIDTH - 1
+
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+# Luhn contribution of a doubled character: digit sum of 2 * value in base 32
+_DOUBLED = {
+    char: (2 * value) // len(ALPHABET) + (2 * value) % len(ALPHABET)
+    for char, value in _VALUES.items()
+}
+
+
+def encode_base32(value: int, width: int = SEQUENCE_WIDTH) -> str:
+    """Fixed-width Crockford base32 for a non-negative integer."""
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    if value:
+        raise ValueError("Value does not fit in the order number width")
+    return "".join(reversed(chars))
+
+
+def check_character(payload: str) -> str:
+    """Luhn mod 32 check character for a string over ALPHABET.
+
+    Catches every single-character error and every adjacent transposition
+    except 0 <-> Z.
+    """
+    # Doubling starts from the rightmost payload character
+    total = sum(_DOUBLED[char] for char in payload[::-2])
+    total += sum(_VALUES[char] for char in payload[-2::-2])
+    return ALPHABET[-total % len(ALPHABET)]
+
+
+def format_order_number(day: date, sequence: int) -> str:
+    """Order number for a sequence value allocated on a given day."""
+    if not 0 < sequence <= MAX_SEQUENCE:
+        raise ValueError("Order number sequence out of range")
+    payload = day.strftime("%y%m%d") + encode_base32(sequence)
+    return f"{PREFIX}-{payload[:6]}-{payload[6:]}{check_character(payload)}"
+
+
+def is_valid_order_number(order_number: str) -> bool:
+    """True if the number is well formed and its check character matches."""
+    parts = order_number.split("-")
+    if len(parts) != 3 or parts[0] != PREFIX:
+        return False
+    payload = parts[1] + parts[2]
+    if len(payload) != 6 + SEQUENCE_WIDTH + 1 or not parts[1].isdigit():
+        return False
+    if any(char not in _VALUES for char in payload):
+        return False
+    return check_character(payload[:-1]) == payload[-1]
+
+
+async def next_order_sequence(db: AsyncSession) -> int:
+    """Allocate the next order number sequence value.
+
+    PostgreSQL uses a sequence: no row lock, and values are never handed out
+    twice even if the order's transaction rolls back. Elsewhere (SQLite, which
+    serializes writers anyway) a counter row is incremented inside the
+    order's own transaction.
+    """
+    if db.bind.dialect.name == "postgresql":
+        return await db.scalar(select(order_number_seq.next_value()))
+    insert_stmt = upsert(db, OrderNumberCounter).values(id=1, value=1)
+    stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[OrderNumberCounter.id],
+        set_={"value": OrderNumberCounter.value + 1},
+    ).returning(OrderNumberCounter.value)
+    return await db.scalar(stmt)
+
+
+async def allocate_order_number(db: AsyncSession, day: date) -> str:
+    """A new, never-before-used order number."""
+    return format_order_number(day, await next_order_sequence(db))
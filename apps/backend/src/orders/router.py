@@ -1,14 +1,17 @@
 """Order customer API routes."""
 
+from dataclasses import asdict
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.auth.dependencies import CurrentUser
+from src.auth.dependencies import CurrentIdentity, CurrentUser
 from src.cart.dependencies import CurrentCart
-from src.cart.service import clear_cart
+from src.cart.models import Cart
 from src.database import get_db
+from src.orders.models import Order
 from src.orders.schemas import (
     OrderCancelRequest,
     OrderCreate,
@@ -22,10 +25,53 @@ from src.orders.service import (
     get_order_by_number,
     get_orders_by_user,
 )
+from src.services.idempotency import (
+    IdempotencyClaim,
+    IdempotencyKeyInProgress,
+    IdempotencyKeyLost,
+    IdempotencyKeyMismatch,
+    claim_idempotency_key,
+    release_idempotency_key,
+    request_fingerprint,
+)
+from src.services.inventory import InsufficientStockError
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
+async def _checkout(
+    db: AsyncSession,
+    cart: Cart,
+    order_data: OrderCreate,
+    user_id: int,
+    idempotency_claim: IdempotencyClaim | None = None,
+) -> Order:
+    """Turn the cart into an order, mapping failures to HTTP errors."""
+    try:
+        return await create_order_from_cart(
+            db, cart, order_data, user_id=user_id, idempotency_claim=idempotency_claim
+        )
+    except IdempotencyKeyLost as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
+    except InsufficientStockError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": str(e),
+                "shortfalls": [asdict(shortfall) for shortfall in e.shortfalls],
+            },
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
 @router.post(
     "",
     response_model=OrderResponse,
@@ -37,20 +83,49 @@ async def create_order(
     cart: CurrentCart,
     current_user: CurrentUser,
     db: Annotated[AsyncSession, Depends(get_db)],
-) -> OrderResponse:
-    """Create a new order from the current cart."""
+    idempotency_key: Annotated[
+        str | None, Header(alias="Idempotency-Key", min_length=1, max_length=255)
+    ] = None,
+) -> OrderResponse | JSONResponse:
+    """Create a new order from the current cart.
+
+    With an Idempotency-Key header, retries of the same request return the
+    first attempt's order instead of placing another one.
+    """
+    if idempotency_key is None:
+        return await _checkout(db, cart, order_data, current_user.id)
+
+    fingerprint = request_fingerprint("POST /orders", order_data.model_dump(mode="json"))
     try:
-        order = await create_order_from_cart(
-            db, cart, order_data, user_id=current_user.id
+        claim = await claim_idempotency_key(
+            db, current_user.id, idempotency_key, fingerprint
         )
-        # Clear the cart after successful order
-        await clear_cart(db, cart)
-        return order
-    except ValueError as e:
+    except IdempotencyKeyMismatch as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e),
+        )
+    except IdempotencyKeyInProgress as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
             detail=str(e),
+            headers={"Retry-After": "1"},
         )
+    if claim.response_body is not None:
+        return JSONResponse(
+            claim.response_body,
+            status_code=claim.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    held = IdempotencyClaim.of(claim)
+    try:
+        order = await _checkout(db, cart, order_data, current_user.id, held)
+    except Exception:
+        # Checkout commits last, so nothing was placed; let a retry run it
+        await release_idempotency_key(db, held)
+        raise
+    return OrderResponse.model_validate(order)
 
 
 @router.get(
@@ -59,13 +134,22 @@ async def create_order(
     operation_id="listOrders",
 )
 async def list_orders(
-    current_user: CurrentUser,
+    identity: CurrentIdentity,
     db: Annotated[AsyncSession, Depends(get_db)],
     page: Annotated[int, Query(ge=1)] = 1,
     page_size: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: Annotated[str | None, Query()] = None,
 ) -> PaginatedOrders:
     """List orders for the current user."""
-    orders, total = await get_orders_by_user(db, current_user.id, page, page_size)
+    try:
+        orders, total, next_cursor = await get_orders_by_user(
+            db, identity.user_id, page, page_size, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     # Convert to list response with item count
     items = []
@@ -91,6 +175,8 @@ async def list_orders(
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        has_more=next_cursor is not None,
+        next_cursor=next_cursor,
     )
 
 
@@ -101,11 +187,11 @@ async def list_orders(
 )
 async def get_order(
     order_number: str,
-    current_user: CurrentUser,
+    identity: CurrentIdentity,
     db: Annotated[AsyncSession, Depends(get_db)],
 ) -> OrderResponse:
     """Get a specific order by order number."""
-    order = await get_order_by_number(db, order_number, current_user.id)
+    order = await get_order_by_number(db, order_number, identity.user_id)
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
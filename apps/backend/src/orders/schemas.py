@@ -168,10 +168,12 @@ class PaginatedOrders(BaseModel):
     """Paginated order list response."""
 
     items: list[OrderListResponse]
-    total: int
+    total: int | None  # None when the count was skipped
     page: int
     page_size: int
-    total_pages: int
+    total_pages: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
 
 
 class OrderFilters(BaseModel):
@@ -1,26 +1,46 @@
 """Order service layer for business logic."""
 
-import secrets
-import string
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 from decimal import Decimal
 
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from src.addresses.models import Address
-from src.cart.models import Cart
+from src.cart.cache import forget_summary
+from src.cart.models import Cart, CartItem
+from src.config import get_settings
 from src.orders.models import Order, OrderItem
-from src.orders.schemas import AddressSnapshot, OrderCreate, OrderFilters, OrderStatusUpdate
+from src.orders.numbers import allocate_order_number
+from src.orders.schemas import (
+    AddressSnapshot,
+    OrderCreate,
+    OrderFilters,
+    OrderResponse,
+    OrderStatusUpdate,
+)
+from src.pagination import (
+    CountStrategy,
+    attribute_values,
+    count_rows,
+    finish_page,
+    paginate_query,
+)
 from src.products.models import Product
+from src.services.idempotency import (
+    IdempotencyClaim,
+    IdempotencyKeyLost,
+    complete_idempotency_key,
+)
+from src.services.inventory import InsufficientStockError, InventoryService
 
+settings = get_settings()
 
-def generate_order_number() -> str:
-    """Generate a unique order number."""
-    timestamp = datetime.utcnow().strftime("%y%m%d")
-    random_part = "".join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(4))
-    return f"BB-{timestamp}-{random_part}"
+# Newest first, with id as the tiebreaker for cursor pagination
+ORDER_SORT_KEYS = [(Order.created_at, True), (Order.id, True)]
 
 
 async def get_order_by_id(
@@ -62,7 +82,8 @@ async def get_orders_by_user(
     user_id: int,
     page: int = 1,
     page_size: int = 20,
-) -> tuple[list[Order], int]:
+    cursor: str | None = None,
+) -> tuple[list[Order], int, str | None]:
     """Get paginated orders for a user."""
     # Count total
     count_query = select(func.count(Order.id)).where(Order.user_id == user_id)
@@ -73,14 +94,14 @@ async def get_orders_by_user(
         select(Order)
         .where(Order.user_id == user_id)
         .options(selectinload(Order.items))
-        .order_by(Order.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
     )
+    query = paginate_query(query, ORDER_SORT_KEYS, page, page_size, cursor)
     result = await db.execute(query)
-    orders = list(result.scalars().all())
+    orders, next_cursor = finish_page(
+        result.scalars().all(), page_size, attribute_values(ORDER_SORT_KEYS)
+    )
 
-    return orders, total
+    return orders, total, next_cursor
 
 
 async def get_all_orders(
@@ -88,7 +109,9 @@ async def get_all_orders(
     filters: OrderFilters,
     page: int = 1,
     page_size: int = 20,
-) -> tuple[list[Order], int]:
+    cursor: str | None = None,
+    count: CountStrategy = "exact",
+) -> tuple[list[Order], int | None, str | None]:
     """Get paginated orders with filters (admin)."""
     query = select(Order).options(selectinload(Order.items))
 
@@ -110,20 +133,16 @@ async def get_all_orders(
             | (Order.contact_email.ilike(search_term))
         )
 
-    # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
+    total = await count_rows(db, query, count)
 
     # Apply pagination and ordering
-    query = (
-        query.order_by(Order.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-    )
+    query = paginate_query(query, ORDER_SORT_KEYS, page, page_size, cursor)
     result = await db.execute(query)
-    orders = list(result.scalars().all())
+    orders, next_cursor = finish_page(
+        result.scalars().all(), page_size, attribute_values(ORDER_SORT_KEYS)
+    )
 
-    return orders, total
+    return orders, total, next_cursor
 
 
 async def create_order_from_cart(
@@ -131,8 +150,16 @@ async def create_order_from_cart(
     cart: Cart,
     order_data: OrderCreate,
     user_id: int | None = None,
+    idempotency_claim: IdempotencyClaim | None = None,
 ) -> Order:
-    """Create an order from a cart."""
+    """Create an order from a cart and empty the cart.
+
+    With idempotency_claim, the order's response is saved to that claimed
+    key in the same transaction, so a retry replays it and can never run
+    checkout a second time. Commits only once everything succeeded; if a
+    retry took the key over meanwhile, rolls back and raises
+    IdempotencyKeyLost.
+    """
     if cart.is_empty:
         raise ValueError("Cart is empty")
 
@@ -186,7 +213,7 @@ async def create_order_from_cart(
 
     # Create order
     order = Order(
-        order_number=generate_order_number(),
+        order_number=await allocate_order_number(db, datetime.utcnow().date()),
         user_id=user_id,
         status="pending",
         shipping_address_id=order_data.shipping_address_id,
@@ -211,46 +238,87 @@ async def create_order_from_cart(
     db.add(order)
     await db.flush()  # Get order ID
 
-    # Create order items from cart items
+    # Snapshot data only; stock is checked and reserved atomically below
+    quantities: dict[int, int] = defaultdict(int)
     for cart_item in cart.items:
-        product = await db.get(Product, cart_item.product_id)
-        if not product:
-            continue
-
-        # Create product snapshot
-        product_snapshot = {
-            "id": product.id,
-            "name": product.name,
-            "sku": product.sku,
-            "price": str(product.price),
-            "description": product.short_description or product.description[:200] if product.description else None,
-            "is_gluten_free": product.is_gluten_free,
-            "is_dairy_free": product.is_dairy_free,
-            "is_vegan": product.is_vegan,
+        quantities[cart_item.product_id] += cart_item.quantity
+    result = await db.execute(
+        select(Product)
+        .where(Product.id.in_(quantities))
+        .execution_options(populate_existing=True)
+    )
+    products = {product.id: product for product in result.scalars()}
+
+    # Create order items from cart items in one INSERT
+    item_rows = [
+        {
+            "order_id": order.id,
+            "product_id": product.id,
+            "product_name": product.name,
+            "product_sku": product.sku,
+            "product_snapshot": product_snapshot(product),
+            "quantity": cart_item.quantity,
+            "unit_price": cart_item.unit_price,
+            "subtotal": cart_item.line_total,
+            "special_instructions": cart_item.special_instructions,
         }
-
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=product.id,
-            product_name=product.name,
-            product_sku=product.sku,
-            product_snapshot=product_snapshot,
-            quantity=cart_item.quantity,
-            unit_price=cart_item.unit_price,
-            subtotal=cart_item.line_total,
-            special_instructions=cart_item.special_instructions,
+        for cart_item in cart.items
+        if (product := products.get(cart_item.product_id)) is not None
+    ]
+    items = (await db.scalars(insert(OrderItem).returning(OrderItem), item_rows)).all()
+    set_committed_value(order, "items", list(items))
+
+    # Reserve inventory last, so its row locks are held only until commit.
+    # Orders paid online only hold stock until the payment is confirmed.
+    reservation = {product_id: quantities[product_id] for product_id in products}
+    inventory = InventoryService(db)
+    if holds_stock(order):
+        ttl = timedelta(seconds=settings.STOCK_HOLD_TTL_SECONDS)
+        shortfalls = await inventory.hold_all(order.id, reservation, ttl)
+    else:
+        shortfalls = await inventory.reserve_all(reservation)
+    if shortfalls:
+        names = ", ".join(
+            f"{products[shortfall.product_id].name} ({shortfall.available} available)"
+            for shortfall in shortfalls
         )
-        db.add(order_item)
-
-        # Reserve inventory
-        if product.track_inventory:
-            product.stock_quantity -= cart_item.quantity
-
+        await db.rollback()
+        raise InsufficientStockError(shortfalls, f"Not enough stock for: {names}")
+
+    # Empty the cart and save the replayable response in the order's own
+    # transaction, so a crash can't leave an order without either
+    await db.execute(delete(CartItem).where(CartItem.cart_id == cart.id))
+    if idempotency_claim is not None:
+        response = OrderResponse.model_validate(order).model_dump(mode="json")
+        try:
+            await complete_idempotency_key(db, idempotency_claim, 201, response)
+        except IdempotencyKeyLost:
+            await db.rollback()
+            raise
     await db.commit()
-    await db.refresh(order)
+    forget_summary(cart.id)
     return order
 
 
+def holds_stock(order: Order) -> bool:
+    """True while an order's stock is only held (online payment not yet made)."""
+    return order.payment_method == "stripe" and order.payment_status != "paid"
+
+
+def product_snapshot(product: Product) -> dict:
+    """Product details frozen onto an order item."""
+    return {
+        "id": product.id,
+        "name": product.name,
+        "sku": product.sku,
+        "price": str(product.price),
+        "description": product.short_description or product.description[:200] if product.description else None,
+        "is_gluten_free": product.is_gluten_free,
+        "is_dairy_free": product.is_dairy_free,
+        "is_vegan": product.is_vegan,
+    }
+
+
 async def update_order_status(
     db: AsyncSession,
     order: Order,
@@ -292,10 +360,14 @@ async def update_order_status(
         order.cancellation_reason = status_data.reason
 
         # Release inventory
-        for item in order.items:
-            product = await db.get(Product, item.product_id)
-            if product and product.track_inventory:
-                product.stock_quantity += item.quantity
+        if holds_stock(order):
+            await InventoryService(db).release_holds(order.id)
+        else:
+            for item in order.items:
+                product = await db.get(Product, item.product_id)
+                if product and product.track_inventory:
+                    product.stock_quantity += item.quantity
+                    product.refresh_stock_status()
 
     order.updated_at = now
     await db.commit()
@@ -334,7 +406,26 @@ async def confirm_payment(
     order: Order,
     payment_intent_id: str | None = None,
 ) -> Order:
-    """Mark order as paid."""
+    """Mark order as paid, turning its stock holds into a real decrement."""
+    if holds_stock(order):
+        inventory = InventoryService(db)
+        converted = await inventory.convert_holds(order.id)
+        # Lines without a live hold (expired, or backorderable and never
+        # held) are taken now, still refusing to oversell non-backorder stock
+        quantities: dict[int, int] = defaultdict(int)
+        for item in order.items:
+            quantities[item.product_id] += item.quantity
+        remaining = {
+            product_id: quantity - converted.get(product_id, 0)
+            for product_id, quantity in quantities.items()
+            if quantity > converted.get(product_id, 0)
+        }
+        shortfalls = await inventory.reserve_all(remaining)
+        if shortfalls:
+            await db.rollback()
+            raise InsufficientStockError(
+                shortfalls, "Stock hold expired and the items sold out"
+            )
     order.payment_status = "paid"
     if payment_intent_id:
         order.stripe_payment_intent_id = payment_intent_id
@@ -0,0 +1,197 @@
+"""Shared pagination helpers.
+
+Listings support two modes:
+- page numbers (OFFSET), kept for backwards compatibility
+- opaque cursors (keyset), which seek past the last row of the previous
+  page using the sort key plus id and stay fast on deep pages
+
+Both modes fetch one extra row to know whether a next page exists, so a
+next_cursor is returned either way and clients can switch to cursors at
+any point. Listings ordered by something the cursor can't encode (e.g.
+search relevance) drop the next_cursor and page by number only.
+
+Totals are computed according to a count strategy:
+- exact: COUNT(*) over the filtered query
+- estimated: the planner's row estimate (PostgreSQL; exact elsewhere)
+- cached: exact, but reused per filter set for COUNT_CACHE_TTL_SECONDS
+- none: no total at all; clients rely on has_more / next_cursor
+"""
+
+import base64
+import json
+from collections.abc import Callable, Sequence
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Literal
+
+from sqlalchemy import ColumnElement, Select, and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+
+from src.cache import TTLCache
+from src.config import get_settings
+
+settings = get_settings()
+
+CountStrategy = Literal["exact", "estimated", "cached", "none"]
+
+_count_cache = TTLCache(maxsize=1024, ttl=settings.COUNT_CACHE_TTL_SECONDS)
+
+# A sort key is an (expression, descending) pair. The last key must be unique
+# (normally the primary key) so the ordering is total.
+SortKey = tuple[ColumnElement, bool]
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(value: Any, expr: ColumnElement) -> Any:
+    if value is None:
+        return None
+    try:
+        python_type = expr.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    if not isinstance(value, python_type):
+        raise TypeError(f"Expected {python_type.__name__}")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode sort key values into an opaque cursor token."""
+    payload = json.dumps([_dump_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> list[Any]:
+    """Decode a cursor token back into typed sort key values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [_load_value(v, expr) for v, (expr, _) in zip(values, keys, strict=True)]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]) -> ColumnElement:
+    """Row-value comparison that works with mixed sort directions."""
+    clauses = []
+    for i, (expr, descending) in enumerate(keys):
+        equal = [key == value for (key, _), value in zip(keys[:i], values[:i], strict=True)]
+        beyond = expr < values[i] if descending else expr > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def paginate_query(
+    query: Select,
+    keys: Sequence[SortKey],
+    page: int = 1,
+    page_size: int = 20,
+    cursor: str | None = None,
+) -> Select:
+    """Order a query by keys and limit it to one page (plus a look-ahead row).
+
+    With a cursor, rows after it are selected and page is ignored.
+    """
+    query = query.order_by(*(expr.desc() if desc else expr.asc() for expr, desc in keys))
+    if cursor:
+        query = query.where(_after(keys, decode_cursor(cursor, keys)))
+    else:
+        query = query.offset((page - 1) * page_size)
+    return query.limit(page_size + 1)
+
+
+def finish_page[T](
+    rows: Sequence[T],
+    page_size: int,
+    cursor_values: Callable[[T], Sequence[Any]],
+) -> tuple[list[T], str | None]:
+    """Trim the look-ahead row and build the cursor for the next page."""
+    rows = list(rows)
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(cursor_values(rows[-1]))
+
+
+def attribute_values(keys: Sequence[SortKey]) -> Callable[[Any], list[Any]]:
+    """Read cursor values off ORM objects for keys that are mapped attributes."""
+    names = [expr.key for expr, _ in keys]
+    return lambda obj: [getattr(obj, name) for name in names]
+
+
+def total_pages(total: int | None, page_size: int) -> int | None:
+    """Number of pages for a total, or None when the total was skipped."""
+    if total is None:
+        return None
+    return (total + page_size - 1) // page_size
+
+
+async def count_rows(
+    db: AsyncSession,
+    query: Select,
+    strategy: CountStrategy = "exact",
+) -> int | None:
+    """Count the rows a listing query would return using the given strategy."""
+    if strategy == "none":
+        return None
+
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+
+    if strategy == "estimated" and db.bind.dialect.name == "postgresql":
+        return await _estimate_rows(db, query)
+
+    if strategy == "cached":
+        compiled = count_query.compile(dialect=db.bind.dialect)
+        cache_key = (str(compiled), repr(sorted(compiled.params.items())))
+        total = _count_cache.get(cache_key)
+        if total is None:
+            total = (await db.execute(count_query)).scalar() or 0
+            _count_cache.set(cache_key, total)
+        return total
+
+    return (await db.execute(count_query)).scalar() or 0
+
+
+def invalidate_counts() -> None:
+    """Drop every cached count (call whenever the counted rows change)."""
+    _count_cache.clear()
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a query, compiled with its binds left as binds."""
+
+    inherit_cache = False
+
+    def __init__(self, query: Select):
+        self.query = query
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler: Any, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.query, **kw)
+
+
+async def _estimate_rows(db: AsyncSession, query: Select) -> int:
+    """Read the planner's row estimate for a query via EXPLAIN."""
+    result = await db.execute(_Explain(query.order_by(None)))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
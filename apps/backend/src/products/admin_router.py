@@ -2,7 +2,8 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import CurrentAdmin
@@ -16,7 +17,6 @@ from src.products.schemas import (
     ProductCreate,
     ProductImageCreate,
     ProductImageResponse,
-    ProductListResponse,
     ProductResponse,
     ProductUpdate,
 )
@@ -39,59 +39,44 @@ async def list_products(
     page_size: int = Query(20, ge=1, le=100),
     search: str | None = None,
     is_active: bool | None = None,
-) -> PaginatedProducts:
+    cursor: str | None = None,
+) -> Response:
     """List all products (including inactive) for admin."""
     from src.products.schemas import ProductFilters
 
     filters = ProductFilters(search=search)
 
-    products, total = await service.get_products(
-        db,
-        filters=filters,
-        page=page,
-        page_size=page_size,
-        include_inactive=True,
-    )
+    try:
+        items, total, next_cursor = await service.get_product_list(
+            db,
+            filters=filters,
+            page=page,
+            page_size=page_size,
+            include_inactive=True,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     # Filter by active status if specified
     if is_active is not None:
-        products = [p for p in products if p.is_active == is_active]
-
-    items = [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            short_description=p.short_description,
-            gradient_from=p.gradient_from,
-            gradient_to=p.gradient_to,
-            is_featured=p.is_featured,
-            is_bestseller=p.is_bestseller,
-            protein_grams=p.protein_grams,
-            is_gluten_free=p.is_gluten_free,
-            is_dairy_free=p.is_dairy_free,
-            is_vegan=p.is_vegan,
-            is_keto_friendly=p.is_keto_friendly,
-            is_active=p.is_active,
-            is_on_sale=p.is_on_sale,
-            is_in_stock=p.is_in_stock,
-            primary_image_url=p.primary_image_url,
-            category=None,
-        )
-        for p in products
-    ]
-
-    total_pages = (total + page_size - 1) // page_size
-
-    return PaginatedProducts(
-        items=items,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
+        items = [item for item in items if item["is_active"] == is_active]
+
+    body = to_json(
+        {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size,
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor,
+        }
     )
+    return Response(content=body, media_type="application/json")
 
 
 @router.get(
@@ -0,0 +1,77 @@
+"""Catalog read cache for the public product routes.
+
+Keys are tuples whose first element is a namespace:
+- ("list", kind, ...) for listing pages (products, featured, bestsellers)
+- ("list", "item", field, value) for single list items (batch lookups)
+- ("product", slug) for product detail responses
+- ("category", slug) for category responses (slug None for the list)
+
+Values are (validators, JSON body) pairs, see src.http_cache. The product
+service invalidates entries whenever a catalog change commits.
+"""
+
+from collections.abc import Hashable
+
+from src.cache import TTLCache
+from src.config import get_settings
+from src.pagination import invalidate_counts
+from src.products.schemas import ProductFilters
+
+settings = get_settings()
+
+catalog_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+)
+
+
+def filters_key(filters: ProductFilters | None) -> tuple:
+    """Normalize filters into a hashable cache key component."""
+    if filters is None:
+        return ()
+    values = filters.model_dump()
+    if values.get("search"):
+        values["search"] = " ".join(values["search"].lower().split())
+    return tuple(sorted(values.items()))
+
+
+def listing_key(kind: str, *parts: Hashable) -> tuple:
+    """Cache key for a listing page."""
+    return ("list", kind, *parts)
+
+
+def item_key(field: str, value: int | str) -> tuple:
+    """Cache key for one product list item by "id" or "slug".
+
+    Lives in the listing namespace so any catalog write drops it.
+    """
+    return listing_key("item", field, value)
+
+
+def product_key(slug: str) -> tuple:
+    """Cache key for a product detail response."""
+    return ("product", slug)
+
+
+def category_key(slug: str | None = None) -> tuple:
+    """Cache key for a category response, or the category list if no slug."""
+    return ("category", slug)
+
+
+def invalidate_listings() -> None:
+    """Drop every cached listing page and the cached listing totals."""
+    catalog_cache.invalidate(lambda key: key[0] == "list")
+    invalidate_counts()
+
+
+def invalidate_products(*slugs: str) -> None:
+    """Drop cached listings plus the detail entries for the given slugs."""
+    invalidate_listings()
+    for slug in slugs:
+        catalog_cache.pop(product_key(slug))
+
+
+def invalidate_catalog() -> None:
+    """Drop everything (e.g. when a category embedded in products changes)."""
+    catalog_cache.clear()
+    invalidate_counts()
@@ -0,0 +1,41 @@
+"""Product dependencies for dependency injection."""
+
+from decimal import Decimal
+from typing import Annotated
+
+from fastapi import Depends, Query
+
+from src.products.schemas import ProductFilters
+
+
+def get_product_filters(
+    category: str | None = Query(None, description="Filter by category slug"),
+    is_featured: bool | None = Query(None, description="Filter by featured status"),
+    is_bestseller: bool | None = Query(None, description="Filter by bestseller status"),
+    is_gluten_free: bool | None = Query(None, description="Filter by gluten-free"),
+    is_dairy_free: bool | None = Query(None, description="Filter by dairy-free"),
+    is_vegan: bool | None = Query(None, description="Filter by vegan"),
+    is_keto_friendly: bool | None = Query(None, description="Filter by keto-friendly"),
+    min_price: Decimal | None = Query(None, ge=0, description="Minimum price"),
+    max_price: Decimal | None = Query(None, ge=0, description="Maximum price"),
+    in_stock_only: bool = Query(False, description="Only products in stock"),
+    search: str | None = Query(None, description="Search in name and description"),
+) -> ProductFilters:
+    """Collect catalog filter query parameters."""
+    return ProductFilters(
+        category_slug=category,
+        is_featured=is_featured,
+        is_bestseller=is_bestseller,
+        is_gluten_free=is_gluten_free,
+        is_dairy_free=is_dairy_free,
+        is_vegan=is_vegan,
+        is_keto_friendly=is_keto_friendly,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        search=search,
+    )
+
+
+# Type alias for dependency injection
+ProductFilterParams = Annotated[ProductFilters, Depends(get_product_filters)]
@@ -4,7 +4,18 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, JSON, Numeric, String, Text
+from sqlalchemy import (
+    ColumnElement,
+    ForeignKey,
+    Index,
+    JSON,
+    Numeric,
+    String,
+    Text,
+    or_,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
@@ -55,6 +66,8 @@ class Product(Base):
     low_stock_threshold: Mapped[int] = mapped_column(default=5)
     track_inventory: Mapped[bool] = mapped_column(default=True)
     allow_backorder: Mapped[bool] = mapped_column(default=False)
+    # Denormalized from the fields above; see refresh_stock_status()
+    is_in_stock: Mapped[bool] = mapped_column(default=True, index=True)
 
     # Display
     gradient_from: Mapped[str | None] = mapped_column(String(7))  # Hex color
@@ -94,10 +107,20 @@ class Product(Base):
     # Status
     is_active: Mapped[bool] = mapped_column(default=True, index=True)
 
+    # Denormalized from images so listings don't need to load them.
+    # Maintained by the product service (refresh_primary_images).
+    primary_image_url: Mapped[str | None] = mapped_column(String(500))
+
     # SEO
     meta_title: Mapped[str | None] = mapped_column(String(70))
     meta_description: Mapped[str | None] = mapped_column(String(160))
 
+    # Full-text search document (weighted name/short_description/description).
+    # Maintained by the service layer; only populated on PostgreSQL.
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR().with_variant(Text(), "sqlite"), deferred=True
+    )
+
     # Relationships
     category_id: Mapped[int | None] = mapped_column(ForeignKey("categories.id"))
     category: Mapped["Category | None"] = relationship(back_populates="products")
@@ -117,25 +140,34 @@ class Product(Base):
         default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
-    @property
-    def primary_image_url(self) -> str | None:
-        """Get the primary image URL."""
-        for image in self.images:
-            if image.is_primary:
-                return image.url
-        return self.images[0].url if self.images else None
+    # Storefront listings always filter is_active and order by one of these
+    # columns (id breaks ties for cursors), so index only the active rows.
+    __table_args__ = tuple(
+        Index(
+            f"ix_products_active_{name}",
+            *columns,
+            "id",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active = 1"),
+        )
+        for name, columns in (
+            ("display_order", ("display_order",)),
+            ("category_display_order", ("category_id", "display_order")),
+            ("price", ("price",)),
+            ("created_at", ("created_at",)),
+        )
+    )
 
     @property
     def is_on_sale(self) -> bool:
         """Check if product is on sale."""
         return self.compare_at_price is not None and self.compare_at_price > self.price
 
-    @property
-    def is_in_stock(self) -> bool:
-        """Check if product is in stock."""
-        if not self.track_inventory:
-            return True
-        return self.stock_quantity > 0 or self.allow_backorder
+    def refresh_stock_status(self) -> None:
+        """Recompute is_in_stock after changing stock or inventory settings."""
+        self.is_in_stock = (
+            not self.track_inventory or self.stock_quantity > 0 or self.allow_backorder
+        )
 
     @property
     def is_low_stock(self) -> bool:
@@ -173,3 +205,19 @@ class ProductImage(Base):
 
     # Relationships
     product: Mapped["Product"] = relationship(back_populates="images")
+
+    __table_args__ = (
+        Index("ix_product_images_product_primary", "product_id", "is_primary"),
+    )
+
+
+def in_stock_condition(stock_quantity: ColumnElement[int]) -> ColumnElement[bool]:
+    """SQL form of Product.refresh_stock_status for bulk stock UPDATEs.
+
+    Pass the new stock expression, e.g. Product.stock_quantity - 2.
+    """
+    return or_(
+        Product.track_inventory.is_(False),
+        Product.allow_backorder.is_(True),
+        stock_quantity > 0,
+    )
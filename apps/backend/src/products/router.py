@@ -1,16 +1,34 @@
 """Product API routes."""
 
-from decimal import Decimal
-from typing import Annotated
+from collections.abc import Awaitable, Callable
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
+from src.http_cache import (
+    CATALOG_CACHE_CONTROL,
+    PRODUCT_CACHE_CONTROL,
+    Validators,
+    not_modified,
+)
+from src.pagination import CountStrategy, total_pages
 from src.products import service
+from src.products.cache import (
+    catalog_cache,
+    category_key,
+    filters_key,
+    item_key,
+    listing_key,
+    product_key,
+)
+from src.products.dependencies import ProductFilterParams
 from src.products.schemas import (
     CategoryResponse,
     PaginatedProducts,
+    ProductFacets,
     ProductFilters,
     ProductListResponse,
     ProductResponse,
@@ -18,6 +36,41 @@ from src.products.schemas import (
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+BATCH_MAX_PRODUCTS = 100
+
+
+async def _conditional_json(
+    request: Request,
+    cache_key: tuple,
+    cache_control: str,
+    version: Callable[[], Awaitable[tuple[Any, ...]]],
+    render: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """Serve a catalog read with ETag/Last-Modified validators.
+
+    version() returns the newest change (plus e.g. a row count) and runs
+    only on a cache miss; when the client's copy matches it we answer 304
+    without loading anything. render() builds the JSON body otherwise.
+    Validators and body are cached together, so a warm hit needs no queries.
+    """
+    cached = catalog_cache.get(cache_key)
+    if cached is None:
+        newest, *parts = await version()
+        validators = Validators.build(newest, *parts, cache_key)
+        if validators.matches(request):
+            return not_modified(validators, cache_control)
+        cached = (validators, await render())
+        catalog_cache.set(cache_key, cached)
+
+    validators, body = cached
+    if validators.matches(request):
+        return not_modified(validators, cache_control)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=validators.headers(cache_control),
+    )
+
 
 @router.get(
     "",
@@ -25,23 +78,14 @@ router = APIRouter(prefix="/products", tags=["products"])
     operation_id="listProducts",
 )
 async def list_products(
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
-    # Filters
-    category: str | None = Query(None, description="Filter by category slug"),
-    is_featured: bool | None = Query(None, description="Filter by featured status"),
-    is_bestseller: bool | None = Query(None, description="Filter by bestseller status"),
-    is_gluten_free: bool | None = Query(None, description="Filter by gluten-free"),
-    is_dairy_free: bool | None = Query(None, description="Filter by dairy-free"),
-    is_vegan: bool | None = Query(None, description="Filter by vegan"),
-    is_keto_friendly: bool | None = Query(None, description="Filter by keto-friendly"),
-    min_price: Decimal | None = Query(None, ge=0, description="Minimum price"),
-    max_price: Decimal | None = Query(None, ge=0, description="Maximum price"),
-    search: str | None = Query(None, description="Search in name and description"),
+    filters: ProductFilterParams,
     # Sorting
     sort_by: str = Query(
         "display_order",
-        description="Sort by field",
-        pattern="^(name|price|created_at|display_order)$",
+        description="Sort by field (relevance ranks search matches)",
+        pattern="^(name|price|created_at|display_order|relevance)$",
     ),
     sort_order: str = Query(
         "asc",
@@ -51,65 +95,85 @@ async def list_products(
     # Pagination
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
-) -> PaginatedProducts:
+    cursor: str | None = Query(None, description="Cursor from a previous page's next_cursor"),
+    count: CountStrategy = Query(
+        "cached", description="How to compute total (exact/estimated/cached/none)"
+    ),
+) -> Response:
     """List products with filtering, sorting, and pagination."""
-    filters = ProductFilters(
-        category_slug=category,
-        is_featured=is_featured,
-        is_bestseller=is_bestseller,
-        is_gluten_free=is_gluten_free,
-        is_dairy_free=is_dairy_free,
-        is_vegan=is_vegan,
-        is_keto_friendly=is_keto_friendly,
-        min_price=min_price,
-        max_price=max_price,
-        search=search,
+    cache_key = listing_key(
+        "products",
+        filters_key(filters),
+        sort_by,
+        sort_order,
+        page,
+        page_size,
+        cursor,
+        count,
     )
 
-    products, total = await service.get_products(
-        db,
-        filters=filters,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        page=page,
-        page_size=page_size,
-    )
+    async def version() -> tuple[Any, ...]:
+        return await service.get_listing_version(db, filters, count)
 
-    # Convert to list response
-    items = [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            short_description=p.short_description,
-            gradient_from=p.gradient_from,
-            gradient_to=p.gradient_to,
-            is_featured=p.is_featured,
-            is_bestseller=p.is_bestseller,
-            protein_grams=p.protein_grams,
-            is_gluten_free=p.is_gluten_free,
-            is_dairy_free=p.is_dairy_free,
-            is_vegan=p.is_vegan,
-            is_keto_friendly=p.is_keto_friendly,
-            is_active=p.is_active,
-            is_on_sale=p.is_on_sale,
-            is_in_stock=p.is_in_stock,
-            primary_image_url=p.primary_image_url,
-            category=CategoryResponse.model_validate(p.category) if p.category else None,
+    async def render() -> bytes:
+        try:
+            items, total, next_cursor = await service.get_product_list(
+                db,
+                filters=filters,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                page=page,
+                page_size=page_size,
+                cursor=cursor,
+                count=count,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+        return to_json(
+            {
+                "items": items,
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages(total, page_size),
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+            }
         )
-        for p in products
-    ]
 
-    total_pages = (total + page_size - 1) // page_size
+    return await _conditional_json(
+        request, cache_key, CATALOG_CACHE_CONTROL, version, render
+    )
+
+
+@router.get(
+    "/facets",
+    response_model=ProductFacets,
+    operation_id="getProductFacets",
+)
+async def get_product_facets(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    filters: ProductFilterParams,
+) -> Response:
+    """Count products per dietary flag, category and price range."""
+
+    async def version() -> tuple[Any, ...]:
+        return await service.get_listing_version(db, filters)
+
+    async def render() -> bytes:
+        facets = await service.get_product_facets(db, filters)
+        return facets.model_dump_json().encode()
 
-    return PaginatedProducts(
-        items=items,
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
+    return await _conditional_json(
+        request,
+        listing_key("facets", filters_key(filters)),
+        CATALOG_CACHE_CONTROL,
+        version,
+        render,
     )
 
 
@@ -119,37 +183,25 @@ async def list_products(
     operation_id="getFeaturedProducts",
 )
 async def get_featured_products(
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
     limit: int = Query(4, ge=1, le=20, description="Number of products to return"),
-) -> list[ProductListResponse]:
+) -> Response:
     """Get featured products for homepage."""
-    products = await service.get_featured_products(db, limit=limit)
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            short_description=p.short_description,
-            gradient_from=p.gradient_from,
-            gradient_to=p.gradient_to,
-            is_featured=p.is_featured,
-            is_bestseller=p.is_bestseller,
-            protein_grams=p.protein_grams,
-            is_gluten_free=p.is_gluten_free,
-            is_dairy_free=p.is_dairy_free,
-            is_vegan=p.is_vegan,
-            is_keto_friendly=p.is_keto_friendly,
-            is_active=p.is_active,
-            is_on_sale=p.is_on_sale,
-            is_in_stock=p.is_in_stock,
-            primary_image_url=p.primary_image_url,
-            category=CategoryResponse.model_validate(p.category) if p.category else None,
-        )
-        for p in products
-    ]
+
+    async def version() -> tuple[Any, ...]:
+        return await service.get_listing_version(db, ProductFilters(is_featured=True))
+
+    async def render() -> bytes:
+        return to_json(await service.get_featured_products(db, limit=limit))
+
+    return await _conditional_json(
+        request,
+        listing_key("featured", limit),
+        CATALOG_CACHE_CONTROL,
+        version,
+        render,
+    )
 
 
 @router.get(
@@ -158,37 +210,95 @@ async def get_featured_products(
     operation_id="getBestsellerProducts",
 )
 async def get_bestseller_products(
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
     limit: int = Query(4, ge=1, le=20, description="Number of products to return"),
-) -> list[ProductListResponse]:
+) -> Response:
     """Get bestseller products."""
-    products = await service.get_bestseller_products(db, limit=limit)
-
-    return [
-        ProductListResponse(
-            id=p.id,
-            name=p.name,
-            slug=p.slug,
-            price=p.price,
-            compare_at_price=p.compare_at_price,
-            short_description=p.short_description,
-            gradient_from=p.gradient_from,
-            gradient_to=p.gradient_to,
-            is_featured=p.is_featured,
-            is_bestseller=p.is_bestseller,
-            protein_grams=p.protein_grams,
-            is_gluten_free=p.is_gluten_free,
-            is_dairy_free=p.is_dairy_free,
-            is_vegan=p.is_vegan,
-            is_keto_friendly=p.is_keto_friendly,
-            is_active=p.is_active,
-            is_on_sale=p.is_on_sale,
-            is_in_stock=p.is_in_stock,
-            primary_image_url=p.primary_image_url,
-            category=CategoryResponse.model_validate(p.category) if p.category else None,
+
+    async def version() -> tuple[Any, ...]:
+        return await service.get_listing_version(
+            db, ProductFilters(is_bestseller=True)
+        )
+
+    async def render() -> bytes:
+        return to_json(await service.get_bestseller_products(db, limit=limit))
+
+    return await _conditional_json(
+        request,
+        listing_key("bestsellers", limit),
+        CATALOG_CACHE_CONTROL,
+        version,
+        render,
+    )
+
+
+def _split_values(values: list[str]) -> list[str]:
+    """Accept both repeated (?ids=1&ids=2) and comma-separated (?ids=1,2) params."""
+    return [part.strip() for value in values for part in value.split(",") if part.strip()]
+
+
+@router.get(
+    "/batch",
+    response_model=list[ProductListResponse],
+    operation_id="getProductsBatch",
+)
+async def get_products_batch(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    ids: list[str] = Query([], description="Product IDs (repeated or comma-separated)"),
+    slugs: list[str] = Query([], description="Product slugs (repeated or comma-separated)"),
+) -> Response:
+    """Get up to 100 products by ID and/or slug in one call.
+
+    Items follow request order; unknown or inactive products are left out.
+    """
+    try:
+        requested = [("id", int(value)) for value in _split_values(ids)]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product IDs must be integers",
+        )
+    requested += [("slug", value) for value in _split_values(slugs)]
+    requested = list(dict.fromkeys(requested))
+
+    if not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide ids or slugs",
+        )
+    if len(requested) > BATCH_MAX_PRODUCTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BATCH_MAX_PRODUCTS} products per request",
+        )
+
+    found = {key: catalog_cache.get(item_key(*key)) for key in requested}
+    missing = [key for key, item in found.items() if item is None]
+    if missing:
+        items = await service.get_product_list_items(
+            db,
+            ids=[value for field, value in missing if field == "id"],
+            slugs=[value for field, value in missing if field == "slug"],
         )
-        for p in products
-    ]
+        for item in items:
+            for key in (("id", item["id"]), ("slug", item["slug"])):
+                catalog_cache.set(item_key(*key), item)
+                if key in found:
+                    found[key] = item
+
+    # A product asked for by both ID and slug is returned once
+    seen = set()
+    result = []
+    for item in found.values():
+        if item is not None and item["id"] not in seen:
+            seen.add(item["id"])
+            result.append(item)
+    return Response(
+        content=to_json(result),
+        media_type="application/json",
+        headers={"Cache-Control": CATALOG_CACHE_CONTROL},
+    )
 
 
 @router.get(
@@ -198,23 +308,32 @@ async def get_bestseller_products(
 )
 async def get_product(
     slug: str,
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
-) -> ProductResponse:
+) -> Response:
     """Get a single product by slug."""
-    product = await service.get_product_by_slug(db, slug)
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found",
-        )
 
-    if not product.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found",
-        )
+    async def version() -> tuple[Any, ...]:
+        updated_at = await service.get_product_version(db, slug)
+        if updated_at is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found",
+            )
+        return (updated_at,)
+
+    async def render() -> bytes:
+        product = await service.get_product_by_slug(db, slug)
+        if not product or not product.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found",
+            )
+        return ProductResponse.model_validate(product).model_dump_json().encode()
 
-    return ProductResponse.model_validate(product)
+    return await _conditional_json(
+        request, product_key(slug), PRODUCT_CACHE_CONTROL, version, render
+    )
 
 
 # ============ Categories Router ============
@@ -228,11 +347,23 @@ categories_router = APIRouter(prefix="/categories", tags=["categories"])
     operation_id="listCategories",
 )
 async def list_categories(
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
-) -> list[CategoryResponse]:
+) -> Response:
     """List all active categories."""
-    categories = await service.get_categories(db)
-    return [CategoryResponse.model_validate(c) for c in categories]
+
+    async def version() -> tuple[Any, ...]:
+        return await service.get_categories_version(db)
+
+    async def render() -> bytes:
+        categories = await service.get_categories(db)
+        return to_json(
+            [CategoryResponse.model_validate(c).model_dump(mode="json") for c in categories]
+        )
+
+    return await _conditional_json(
+        request, category_key(), CATALOG_CACHE_CONTROL, version, render
+    )
 
 
 @categories_router.get(
@@ -242,20 +373,29 @@ async def list_categories(
 )
 async def get_category(
     slug: str,
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
-) -> CategoryResponse:
+) -> Response:
     """Get a category by slug."""
-    category = await service.get_category_by_slug(db, slug)
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Category not found",
-        )
 
-    if not category.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Category not found",
-        )
+    async def version() -> tuple[Any, ...]:
+        updated_at = await service.get_category_version(db, slug)
+        if updated_at is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Category not found",
+            )
+        return (updated_at,)
 
-    return CategoryResponse.model_validate(category)
+    async def render() -> bytes:
+        category = await service.get_category_by_slug(db, slug)
+        if not category or not category.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Category not found",
+            )
+        return CategoryResponse.model_validate(category).model_dump_json().encode()
+
+    return await _conditional_json(
+        request, category_key(slug), CATALOG_CACHE_CONTROL, version, render
+    )
@@ -252,13 +252,14 @@ class ProductFilters(BaseModel):
     is_keto_friendly: bool | None = None
     min_price: Decimal | None = None
     max_price: Decimal | None = None
+    in_stock_only: bool = False
     search: str | None = None
 
 
 class ProductSort(BaseModel):
     """Product sort options."""
 
-    sort_by: str = "display_order"  # name, price, created_at, display_order
+    sort_by: str = "display_order"  # name, price, created_at, display_order, relevance
     sort_order: str = "asc"  # asc, desc
 
 
@@ -266,7 +267,29 @@ class PaginatedProducts(BaseModel):
     """Paginated product list response."""
 
     items: list[ProductListResponse]
-    total: int
+    total: int | None  # None when the count was skipped
     page: int
     page_size: int
-    total_pages: int
+    total_pages: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
+
+
+# ============ Facet Schemas ============
+
+
+class PriceRangeFacet(BaseModel):
+    """Product count for a price bucket (max_price exclusive, None = open)."""
+
+    min_price: Decimal
+    max_price: Decimal | None = None
+    count: int
+
+
+class ProductFacets(BaseModel):
+    """Product counts per filter value for the current filter set."""
+
+    total: int
+    categories: dict[str, int]  # category slug -> count
+    dietary: dict[str, int]  # flag name (e.g. is_vegan) -> count
+    price_ranges: list[PriceRangeFacet]
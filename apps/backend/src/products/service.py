@@ -1,18 +1,52 @@
 """Product service layer."""
 
+import re
+from datetime import datetime
 from decimal import Decimal
-
-from sqlalchemy import Select, func, select
+from typing import Any
+
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    and_,
+    case,
+    false,
+    func,
+    or_,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from src.database import after_commit
+from src.pagination import (
+    CountStrategy,
+    SortKey,
+    attribute_values,
+    count_rows,
+    finish_page,
+    paginate_query,
+)
+from src.products.cache import (
+    invalidate_catalog,
+    invalidate_listings,
+    invalidate_products,
+)
 from src.products.models import Category, Product, ProductImage
 from src.products.schemas import (
     CategoryCreate,
+    CategoryResponse,
     CategoryUpdate,
+    PriceRangeFacet,
     ProductCreate,
+    ProductFacets,
     ProductFilters,
     ProductImageCreate,
+    ProductListResponse,
     ProductUpdate,
 )
 
@@ -62,6 +96,7 @@ async def update_category(
         setattr(category, field, value)
     await db.flush()
     await db.refresh(category)
+    after_commit(db, invalidate_catalog)
     return category
 
 
@@ -69,52 +104,189 @@ async def delete_category(db: AsyncSession, category: Category) -> None:
     """Delete a category."""
     await db.delete(category)
     await db.flush()
+    after_commit(db, invalidate_catalog)
+
+
+# ============ Product Search ============
+
+SEARCH_CONFIG = "english"
+
+# Fields whose changes require the search document to be rebuilt
+SEARCH_FIELDS = {"name", "short_description", "description"}
+
+
+def supports_fulltext(db: AsyncSession) -> bool:
+    """Full-text search needs PostgreSQL; other dialects fall back to ILIKE."""
+    return db.bind.dialect.name == "postgresql"
+
+
+def _search_document() -> ColumnElement:
+    """Weighted tsvector: name (A), short description (B), description (C)."""
+
+    def weighted(column, weight: str) -> ColumnElement:
+        return func.setweight(
+            func.to_tsvector(SEARCH_CONFIG, func.coalesce(column, "")), weight
+        )
+
+    return (
+        weighted(Product.name, "A")
+        .op("||", return_type=TSVECTOR)(weighted(Product.short_description, "B"))
+        .op("||", return_type=TSVECTOR)(weighted(Product.description, "C"))
+    )
+
+
+def search_query(term: str) -> ColumnElement | None:
+    """Build a prefix-matching tsquery where every word must match."""
+    words = re.findall(r"\w+", term.lower())
+    if not words:
+        return None
+    return func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+
+async def refresh_search_vectors(
+    db: AsyncSession,
+    product_ids: list[int] | None = None,
+) -> None:
+    """Rebuild the search document for the given products (all if None)."""
+    if not supports_fulltext(db):
+        return
+    stmt = (
+        update(Product)
+        .values(search_vector=_search_document(), updated_at=Product.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    if product_ids is not None:
+        stmt = stmt.where(Product.id.in_(product_ids))
+    await db.execute(stmt)
+
+
+# ============ Product List Projection ============
+
+# Listings select only the fields of ProductListResponse and turn rows into
+# plain dicts, skipping ORM hydration of products, images and categories.
+
+listed_category = Category.__table__.alias("listed_category")
+
+LIST_FIELDS = tuple(
+    name for name in ProductListResponse.model_fields if name != "category"
+)
+LIST_CATEGORY_FIELDS = tuple(CategoryResponse.model_fields)
+
+
+def _list_columns() -> list[ColumnElement]:
+    """Columns for a product list row, in LIST_FIELDS then category order."""
+    is_on_sale = case(
+        (
+            and_(
+                Product.compare_at_price.is_not(None),
+                Product.compare_at_price > Product.price,
+            ),
+            true(),
+        ),
+        else_=false(),
+    ).label("is_on_sale")
+    return [
+        *(
+            is_on_sale if name == "is_on_sale" else getattr(Product, name)
+            for name in LIST_FIELDS
+        ),
+        *(
+            listed_category.c[name].label(f"category_{name}")
+            for name in LIST_CATEGORY_FIELDS
+        ),
+    ]
+
+
+def _list_item(row: Row) -> dict[str, Any]:
+    """Shape a projected row like ProductListResponse."""
+    item = dict(zip(LIST_FIELDS, row, strict=False))
+    category = row[len(LIST_FIELDS) : len(LIST_FIELDS) + len(LIST_CATEGORY_FIELDS)]
+    item["category"] = (
+        dict(zip(LIST_CATEGORY_FIELDS, category, strict=True))
+        if category[0] is not None
+        else None
+    )
+    return item
 
 
 # ============ Product Service ============
 
+# Fields whose changes require is_in_stock to be recomputed
+STOCK_FIELDS = {"stock_quantity", "track_inventory", "allow_backorder"}
 
-def _build_product_query(
+
+def _product_conditions(
     filters: ProductFilters | None = None,
     include_inactive: bool = False,
-) -> Select:
-    """Build product query with filters."""
-    query = select(Product).options(
-        selectinload(Product.images),
-        selectinload(Product.category),
-    )
-
+    fulltext: bool = False,
+) -> list[ColumnElement]:
+    """WHERE clauses for the given filters, shared by listings and facets."""
+    conditions = []
     if not include_inactive:
-        query = query.where(Product.is_active == True)  # noqa: E712
+        conditions.append(Product.is_active == True)  # noqa: E712
 
     if filters:
         if filters.category_slug:
-            query = query.join(Category).where(Category.slug == filters.category_slug)
+            # Slugs are unique, so equality lets the category index supply order
+            conditions.append(
+                Product.category_id
+                == select(Category.id)
+                .where(Category.slug == filters.category_slug)
+                .scalar_subquery()
+            )
         if filters.is_featured is not None:
-            query = query.where(Product.is_featured == filters.is_featured)
+            conditions.append(Product.is_featured == filters.is_featured)
         if filters.is_bestseller is not None:
-            query = query.where(Product.is_bestseller == filters.is_bestseller)
+            conditions.append(Product.is_bestseller == filters.is_bestseller)
         if filters.is_gluten_free is not None:
-            query = query.where(Product.is_gluten_free == filters.is_gluten_free)
+            conditions.append(Product.is_gluten_free == filters.is_gluten_free)
         if filters.is_dairy_free is not None:
-            query = query.where(Product.is_dairy_free == filters.is_dairy_free)
+            conditions.append(Product.is_dairy_free == filters.is_dairy_free)
         if filters.is_vegan is not None:
-            query = query.where(Product.is_vegan == filters.is_vegan)
+            conditions.append(Product.is_vegan == filters.is_vegan)
         if filters.is_keto_friendly is not None:
-            query = query.where(Product.is_keto_friendly == filters.is_keto_friendly)
+            conditions.append(Product.is_keto_friendly == filters.is_keto_friendly)
         if filters.min_price is not None:
-            query = query.where(Product.price >= filters.min_price)
+            conditions.append(Product.price >= filters.min_price)
         if filters.max_price is not None:
-            query = query.where(Product.price <= filters.max_price)
+            conditions.append(Product.price <= filters.max_price)
+        if filters.in_stock_only:
+            conditions.append(Product.is_in_stock == True)  # noqa: E712
         if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.where(
-                (Product.name.ilike(search_term))
-                | (Product.description.ilike(search_term))
-                | (Product.short_description.ilike(search_term))
-            )
+            tsquery = search_query(filters.search) if fulltext else None
+            if tsquery is not None:
+                conditions.append(Product.search_vector.op("@@")(tsquery))
+            else:
+                search_term = f"%{filters.search}%"
+                conditions.append(
+                    (Product.name.ilike(search_term))
+                    | (Product.description.ilike(search_term))
+                    | (Product.short_description.ilike(search_term))
+                )
 
-    return query
+    return conditions
+
+
+def _build_product_query(
+    filters: ProductFilters | None = None,
+    include_inactive: bool = False,
+    fulltext: bool = False,
+    projected: bool = False,
+) -> Select:
+    """Build product query with filters.
+
+    With projected=True the query selects list columns instead of products.
+    """
+    if projected:
+        query = select(*_list_columns()).outerjoin(
+            listed_category, Product.category_id == listed_category.c.id
+        )
+    else:
+        query = select(Product).options(
+            selectinload(Product.images),
+            selectinload(Product.category),
+        )
+    return query.where(*_product_conditions(filters, include_inactive, fulltext))
 
 
 async def get_products(
@@ -125,64 +297,133 @@ async def get_products(
     page: int = 1,
     page_size: int = 20,
     include_inactive: bool = False,
-) -> tuple[list[Product], int]:
-    """Get products with filters, sorting, and pagination."""
-    query = _build_product_query(filters, include_inactive)
+    cursor: str | None = None,
+    count: CountStrategy = "exact",
+) -> tuple[list[Product], int | None, str | None]:
+    """Get products with filters, sorting, and pagination.
 
-    # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    Returns the page of products, the total count (None when count="none")
+    and the next-page cursor.
+    """
+    fulltext = supports_fulltext(db)
+    query = _build_product_query(filters, include_inactive, fulltext)
 
-    # Apply sorting
-    sort_column = getattr(Product, sort_by, Product.display_order)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
+    total = await count_rows(db, query, count)
+
+    query, keys, ranked = _sort_products(
+        query, filters, fulltext, sort_by, sort_order, cursor
+    )
+    query = paginate_query(query, keys, page, page_size, cursor)
+    result = await db.execute(query)
+    products, next_cursor = finish_page(
+        result.scalars().unique().all(), page_size, attribute_values(keys)
+    )
+    if ranked:
+        next_cursor = None
+
+    return products, total, next_cursor
 
-    # Apply pagination
-    offset = (page - 1) * page_size
-    query = query.offset(offset).limit(page_size)
 
+async def get_product_list(
+    db: AsyncSession,
+    filters: ProductFilters | None = None,
+    sort_by: str = "display_order",
+    sort_order: str = "asc",
+    page: int = 1,
+    page_size: int = 20,
+    include_inactive: bool = False,
+    cursor: str | None = None,
+    count: CountStrategy = "exact",
+) -> tuple[list[dict[str, Any]], int | None, str | None]:
+    """Same as get_products, but returns list items as JSON-ready dicts."""
+    fulltext = supports_fulltext(db)
+    query = _build_product_query(filters, include_inactive, fulltext, projected=True)
+
+    total = await count_rows(db, query, count)
+
+    query, keys, ranked = _sort_products(
+        query, filters, fulltext, sort_by, sort_order, cursor
+    )
+    # Sort key values ride along at the end of each row for the next cursor
+    width = len(query.selected_columns)
+    query = query.add_columns(*(expr for expr, _ in keys))
+    query = paginate_query(query, keys, page, page_size, cursor)
     result = await db.execute(query)
-    products = list(result.scalars().unique().all())
+    rows, next_cursor = finish_page(result.all(), page_size, lambda row: row[width:])
+    if ranked:
+        next_cursor = None
+
+    return [_list_item(row) for row in rows], total, next_cursor
+
+
+def _sort_products(
+    query: Select,
+    filters: ProductFilters | None,
+    fulltext: bool,
+    sort_by: str,
+    sort_order: str,
+    cursor: str | None,
+) -> tuple[Select, list[SortKey], bool]:
+    """Pick the sort keys for a product listing.
+
+    The flag is True when rows are ranked by search relevance ahead of the
+    keys; such listings page by number only and get no next_cursor.
+    """
+    tsquery = search_query(filters.search) if fulltext and filters and filters.search else None
+    if sort_by == "relevance":
+        # Best matches first; without a search term this is display order
+        ranked = tsquery is not None
+        if ranked:
+            if cursor:
+                raise ValueError("Cursor pagination is not supported for relevance sort")
+            query = query.order_by(func.ts_rank_cd(Product.search_vector, tsquery).desc())
+        return query, [(Product.display_order, False), (Product.id, False)], ranked
 
-    return products, total
+    sort_column = getattr(Product, sort_by, Product.display_order)
+    descending = sort_order == "desc"
+    return query, [(sort_column, descending), (Product.id, descending)], False
 
 
 async def get_featured_products(
     db: AsyncSession,
     limit: int = 4,
-) -> list[Product]:
-    """Get featured products for homepage."""
-    query = (
-        select(Product)
-        .options(selectinload(Product.images), selectinload(Product.category))
-        .where(Product.is_active == True)  # noqa: E712
-        .where(Product.is_featured == True)  # noqa: E712
-        .order_by(Product.display_order)
-        .limit(limit)
-    )
+) -> list[dict[str, Any]]:
+    """Get featured products for homepage as list items."""
+    filters = ProductFilters(is_featured=True)
+    query = _build_product_query(filters, projected=True)
+    query = query.order_by(Product.display_order).limit(limit)
     result = await db.execute(query)
-    return list(result.scalars().unique().all())
+    return [_list_item(row) for row in result.all()]
 
 
 async def get_bestseller_products(
     db: AsyncSession,
     limit: int = 4,
-) -> list[Product]:
-    """Get bestseller products."""
-    query = (
-        select(Product)
-        .options(selectinload(Product.images), selectinload(Product.category))
-        .where(Product.is_active == True)  # noqa: E712
-        .where(Product.is_bestseller == True)  # noqa: E712
-        .order_by(Product.display_order)
-        .limit(limit)
-    )
+) -> list[dict[str, Any]]:
+    """Get bestseller products as list items."""
+    filters = ProductFilters(is_bestseller=True)
+    query = _build_product_query(filters, projected=True)
+    query = query.order_by(Product.display_order).limit(limit)
     result = await db.execute(query)
-    return list(result.scalars().unique().all())
+    return [_list_item(row) for row in result.all()]
+
+
+async def get_product_list_items(
+    db: AsyncSession,
+    ids: list[int] | None = None,
+    slugs: list[str] | None = None,
+) -> list[dict[str, Any]]:
+    """Look up active products by id and/or slug in one query, as list items."""
+    keys = []
+    if ids:
+        keys.append(Product.id.in_(ids))
+    if slugs:
+        keys.append(Product.slug.in_(slugs))
+    if not keys:
+        return []
+    query = _build_product_query(projected=True).where(or_(*keys))
+    result = await db.execute(query)
+    return [_list_item(row) for row in result.all()]
 
 
 async def get_product_by_id(db: AsyncSession, product_id: int) -> Product | None:
@@ -216,9 +457,12 @@ async def get_product_by_sku(db: AsyncSession, sku: str) -> Product | None:
 async def create_product(db: AsyncSession, data: ProductCreate) -> Product:
     """Create a new product."""
     product = Product(**data.model_dump())
+    product.refresh_stock_status()
     db.add(product)
     await db.flush()
+    await refresh_search_vectors(db, [product.id])
     await db.refresh(product)
+    after_commit(db, invalidate_listings)
     return product
 
 
@@ -226,11 +470,17 @@ async def update_product(
     db: AsyncSession, product: Product, data: ProductUpdate
 ) -> Product:
     """Update a product."""
+    old_slug = product.slug
     update_data = data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(product, field, value)
+    if STOCK_FIELDS & update_data.keys():
+        product.refresh_stock_status()
     await db.flush()
+    if SEARCH_FIELDS & update_data.keys():
+        await refresh_search_vectors(db, [product.id])
     await db.refresh(product)
+    after_commit(db, invalidate_products, old_slug, product.slug)
     return product
 
 
@@ -238,12 +488,15 @@ async def delete_product(db: AsyncSession, product: Product) -> None:
     """Delete a product (soft delete by setting is_active=False)."""
     product.is_active = False
     await db.flush()
+    after_commit(db, invalidate_products, product.slug)
 
 
 async def hard_delete_product(db: AsyncSession, product: Product) -> None:
     """Permanently delete a product."""
+    slug = product.slug
     await db.delete(product)
     await db.flush()
+    after_commit(db, invalidate_products, slug)
 
 
 async def update_stock(
@@ -255,14 +508,178 @@ async def update_stock(
     product.stock_quantity += quantity_change
     if product.stock_quantity < 0:
         product.stock_quantity = 0
+    product.refresh_stock_status()
     await db.flush()
     await db.refresh(product)
+    after_commit(db, invalidate_products, product.slug)
     return product
 
 
+# ============ Catalog Versions ============
+
+# Cheap freshness markers for HTTP validators, read before loading the data.
+# Categories are embedded in product responses, so their changes count too.
+
+
+def _newest(*values: datetime | None) -> datetime | None:
+    return max((value for value in values if value is not None), default=None)
+
+
+async def get_listing_version(
+    db: AsyncSession,
+    filters: ProductFilters | None = None,
+    count: CountStrategy = "cached",
+) -> tuple[datetime | None, int | None, int | None]:
+    """Newest catalog change, newest product id and the listing's row count.
+
+    The change and id are taken over every product, not just the listed
+    ones, so a product leaving the listing (e.g. soft-deleted) moves the
+    version too. The count follows the listing's own count strategy, so it
+    shares the cached total (or is skipped) instead of running an exact
+    COUNT here.
+    """
+    fulltext = supports_fulltext(db)
+    query = select(
+        func.max(Product.updated_at),
+        func.max(Product.id),
+        select(func.max(Category.updated_at)).scalar_subquery(),
+    )
+    newest, newest_id, category_newest = (await db.execute(query)).one()
+    listing = _build_product_query(filters, fulltext=fulltext, projected=True)
+    total = await count_rows(db, listing, count)
+    return _newest(newest, category_newest), newest_id, total
+
+
+async def get_product_version(db: AsyncSession, slug: str) -> datetime | None:
+    """Newest change to an active product, or None if it isn't visible."""
+    query = (
+        select(Product.updated_at, Category.updated_at)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .where(Product.slug == slug)
+        .where(Product.is_active == True)  # noqa: E712
+    )
+    row = (await db.execute(query)).first()
+    return _newest(*row) if row else None
+
+
+async def get_categories_version(db: AsyncSession) -> tuple[datetime | None, int]:
+    """Newest change among active categories and their count."""
+    query = select(func.max(Category.updated_at), func.count()).where(
+        Category.is_active == True  # noqa: E712
+    )
+    newest, count = (await db.execute(query)).one()
+    return newest, count
+
+
+async def get_category_version(db: AsyncSession, slug: str) -> datetime | None:
+    """Last change to an active category, or None if it isn't visible."""
+    query = (
+        select(Category.updated_at)
+        .where(Category.slug == slug)
+        .where(Category.is_active == True)  # noqa: E712
+    )
+    return (await db.execute(query)).scalar()
+
+
+# ============ Product Facets ============
+
+DIETARY_FLAGS = ("is_gluten_free", "is_dairy_free", "is_vegan", "is_keto_friendly")
+
+# Lower bounds of the price buckets; each runs up to the next bound (exclusive)
+PRICE_BUCKET_BOUNDS = (Decimal("0"), Decimal("5"), Decimal("10"), Decimal("20"))
+
+
+async def get_product_facets(
+    db: AsyncSession,
+    filters: ProductFilters | None = None,
+) -> ProductFacets:
+    """Count matching products per dietary flag, category and price bucket.
+
+    A single query grouped by category; flag and price counts are FILTER
+    aggregates summed across the category groups.
+    """
+    uppers = (*PRICE_BUCKET_BOUNDS[1:], None)
+    buckets = list(zip(PRICE_BUCKET_BOUNDS, uppers, strict=True))
+    price_counts = [
+        func.count().filter(
+            Product.price >= low
+            if high is None
+            else and_(Product.price >= low, Product.price < high)
+        )
+        for low, high in buckets
+    ]
+    flag_counts = [
+        func.count().filter(getattr(Product, flag) == True)  # noqa: E712
+        for flag in DIETARY_FLAGS
+    ]
+    query = (
+        select(listed_category.c.slug, func.count(), *flag_counts, *price_counts)
+        .select_from(Product)
+        .outerjoin(listed_category, Product.category_id == listed_category.c.id)
+        .where(*_product_conditions(filters, fulltext=supports_fulltext(db)))
+        .group_by(listed_category.c.slug)
+    )
+    rows = (await db.execute(query)).all()
+
+    def column_total(index: int) -> int:
+        return sum(row[index] for row in rows)
+
+    flags_start = 2
+    prices_start = flags_start + len(DIETARY_FLAGS)
+    return ProductFacets(
+        total=column_total(1),
+        categories={row[0]: row[1] for row in rows if row[0] is not None},
+        dietary={
+            flag: column_total(flags_start + i) for i, flag in enumerate(DIETARY_FLAGS)
+        },
+        price_ranges=[
+            PriceRangeFacet(
+                min_price=low, max_price=high, count=column_total(prices_start + i)
+            )
+            for i, (low, high) in enumerate(buckets)
+        ],
+    )
+
+
 # ============ Product Image Service ============
 
 
+def _primary_image_url() -> ColumnElement:
+    """First primary image, else the first image in display order."""
+    return (
+        select(ProductImage.url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(
+            ProductImage.is_primary.desc(), ProductImage.display_order, ProductImage.id
+        )
+        .limit(1)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+
+
+async def refresh_primary_images(
+    db: AsyncSession,
+    product_ids: list[int] | None = None,
+) -> None:
+    """Recompute the denormalized primary_image_url (all products if None)."""
+    stmt = (
+        update(Product)
+        .values(primary_image_url=_primary_image_url())
+        .execution_options(synchronize_session=False)
+    )
+    if product_ids is not None:
+        stmt = stmt.where(Product.id.in_(product_ids))
+    await db.execute(stmt)
+
+
+async def _sync_primary_image(db: AsyncSession, product: Product) -> None:
+    """Refresh one product's primary_image_url in the database and in memory."""
+    await db.flush()
+    await refresh_primary_images(db, [product.id])
+    await db.refresh(product, ["primary_image_url", "updated_at"])
+
+
 async def add_product_image(
     db: AsyncSession,
     product: Product,
@@ -278,13 +695,19 @@ async def add_product_image(
     db.add(image)
     await db.flush()
     await db.refresh(image)
+    await _sync_primary_image(db, product)
+    after_commit(db, invalidate_products, product.slug)
     return image
 
 
 async def delete_product_image(db: AsyncSession, image: ProductImage) -> None:
     """Delete a product image."""
+    product = await db.get(Product, image.product_id)
     await db.delete(image)
     await db.flush()
+    if product:
+        await _sync_primary_image(db, product)
+        after_commit(db, invalidate_products, product.slug)
 
 
 async def get_product_image_by_id(
@@ -299,4 +722,5 @@ async def set_primary_image(db: AsyncSession, product: Product, image_id: int) -
     """Set an image as the primary image for a product."""
     for image in product.images:
         image.is_primary = image.id == image_id
-    await db.flush()
+    await _sync_primary_image(db, product)
+    after_commit(db, invalidate_products, product.slug)
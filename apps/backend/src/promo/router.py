@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import CurrentAdmin
 from src.database import get_db
+from src.pagination import attribute_values, finish_page, paginate_query
 from src.promo.models import PromoCode
 from src.promo.schemas import (
     PromoCodeCreate,
@@ -33,6 +34,7 @@ async def list_promo_codes(
     page_size: Annotated[int, Query(ge=1, le=100)] = 20,
     is_active: Annotated[bool | None, Query()] = None,
     search: Annotated[str | None, Query()] = None,
+    cursor: Annotated[str | None, Query()] = None,
 ) -> PaginatedPromoCodes:
     """List all promo codes (admin only)."""
     query = select(PromoCode)
@@ -51,14 +53,19 @@ async def list_promo_codes(
     total = (await db.execute(count_query)).scalar() or 0
 
     # Paginate
-    query = (
-        query.order_by(PromoCode.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-    )
+    sort_keys = [(PromoCode.created_at, True), (PromoCode.id, True)]
+    try:
+        query = paginate_query(query, sort_keys, page, page_size, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     result = await db.execute(query)
-    codes = list(result.scalars().all())
+    codes, next_cursor = finish_page(
+        result.scalars().all(), page_size, attribute_values(sort_keys)
+    )
 
     items = [PromoCodeResponse.model_validate(code) for code in codes]
     total_pages = (total + page_size - 1) // page_size
@@ -69,6 +76,7 @@ async def list_promo_codes(
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        next_cursor=next_cursor,
     )
 
 
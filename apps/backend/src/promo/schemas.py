@@ -67,6 +67,7 @@ class PaginatedPromoCodes(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: str | None = None
 
 
 class PromoCodeValidation(BaseModel):
@@ -2,11 +2,12 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import CurrentUser
 from src.database import get_db
+from src.http_cache import REVIEWS_CACHE_CONTROL, Validators, not_modified
 from src.products.service import get_product_by_slug
 from src.reviews.schemas import (
     PaginatedReviews,
@@ -21,6 +22,7 @@ from src.reviews.service import (
     get_review_by_id,
     get_review_summary,
     get_reviews_by_product,
+    get_reviews_version,
     mark_review_helpful,
     update_review,
 )
@@ -35,21 +37,38 @@ router = APIRouter(tags=["reviews"])
 )
 async def list_product_reviews(
     slug: str,
+    request: Request,
+    response: Response,
     db: Annotated[AsyncSession, Depends(get_db)],
     page: Annotated[int, Query(ge=1)] = 1,
     page_size: Annotated[int, Query(ge=1, le=50)] = 10,
-) -> PaginatedReviews:
+    cursor: Annotated[str | None, Query()] = None,
+) -> PaginatedReviews | Response:
     """Get reviews for a product."""
-    product = await get_product_by_slug(db, slug)
-    if not product:
+    version = await get_reviews_version(db, slug)
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found",
         )
 
-    reviews, total, average_rating = await get_reviews_by_product(
-        db, product.id, page, page_size
+    product_id, newest, review_count = version
+    validators = Validators.build(
+        newest, "reviews", product_id, review_count, page, page_size, cursor
     )
+    if validators.matches(request):
+        return not_modified(validators, REVIEWS_CACHE_CONTROL)
+    response.headers.update(validators.headers(REVIEWS_CACHE_CONTROL))
+
+    try:
+        reviews, total, average_rating, next_cursor = await get_reviews_by_product(
+            db, product_id, page, page_size, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     total_pages = (total + page_size - 1) // page_size
     return PaginatedReviews(
@@ -59,6 +78,7 @@ async def list_product_reviews(
         page_size=page_size,
         total_pages=total_pages,
         average_rating=average_rating,
+        next_cursor=next_cursor,
     )
 
 
@@ -69,17 +89,25 @@ async def list_product_reviews(
 )
 async def get_product_review_summary(
     slug: str,
+    request: Request,
+    response: Response,
     db: Annotated[AsyncSession, Depends(get_db)],
-) -> ReviewSummary:
+) -> ReviewSummary | Response:
     """Get review summary statistics for a product."""
-    product = await get_product_by_slug(db, slug)
-    if not product:
+    version = await get_reviews_version(db, slug)
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found",
         )
 
-    summary = await get_review_summary(db, product.id)
+    product_id, newest, review_count = version
+    validators = Validators.build(newest, "review-summary", product_id, review_count)
+    if validators.matches(request):
+        return not_modified(validators, REVIEWS_CACHE_CONTROL)
+    response.headers.update(validators.headers(REVIEWS_CACHE_CONTROL))
+
+    summary = await get_review_summary(db, product_id)
     return ReviewSummary(**summary)
 
 
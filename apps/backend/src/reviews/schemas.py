@@ -69,6 +69,7 @@ class PaginatedReviews(BaseModel):
     page_size: int
     total_pages: int
     average_rating: float | None
+    next_cursor: str | None = None
 
 
 class ReviewSummary(BaseModel):
@@ -7,11 +7,22 @@ from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from src.database import after_commit
 from src.orders.models import Order, OrderItem
+from src.pagination import attribute_values, finish_page, paginate_query
+from src.products.cache import invalidate_products
 from src.products.models import Product
 from src.reviews.models import Review, ReviewHelpful
 from src.reviews.schemas import ReviewCreate, ReviewUpdate
 
+# Featured first, then most helpful, then newest; id keeps cursors stable
+REVIEW_SORT_KEYS = [
+    (Review.is_featured, True),
+    (Review.helpful_count, True),
+    (Review.created_at, True),
+    (Review.id, True),
+]
+
 
 async def get_reviews_by_product(
     db: AsyncSession,
@@ -19,7 +30,8 @@ async def get_reviews_by_product(
     page: int = 1,
     page_size: int = 10,
     only_approved: bool = True,
-) -> tuple[list[Review], int, float | None]:
+    cursor: str | None = None,
+) -> tuple[list[Review], int, float | None, str | None]:
     """Get paginated reviews for a product."""
     query = (
         select(Review)
@@ -44,15 +56,34 @@ async def get_reviews_by_product(
     average_rating = float(avg_result) if avg_result else None
 
     # Get reviews with pagination
-    query = (
-        query.order_by(Review.is_featured.desc(), Review.helpful_count.desc(), Review.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-    )
+    query = paginate_query(query, REVIEW_SORT_KEYS, page, page_size, cursor)
     result = await db.execute(query)
-    reviews = list(result.scalars().all())
+    reviews, next_cursor = finish_page(
+        result.scalars().all(), page_size, attribute_values(REVIEW_SORT_KEYS)
+    )
+
+    return reviews, total, average_rating, next_cursor
 
-    return reviews, total, average_rating
+
+async def get_reviews_version(
+    db: AsyncSession,
+    slug: str,
+) -> tuple[int, datetime | None, int] | None:
+    """Product id, newest approved review change and review count for a slug.
+
+    Returns None if the product doesn't exist. Used for HTTP validators.
+    """
+    query = (
+        select(Product.id, func.max(Review.updated_at), func.count(Review.id))
+        .outerjoin(
+            Review,
+            (Review.product_id == Product.id) & Review.is_approved.is_(True),
+        )
+        .where(Product.slug == slug)
+        .group_by(Product.id)
+    )
+    row = (await db.execute(query)).first()
+    return tuple(row) if row else None
 
 
 async def get_review_by_id(
@@ -223,11 +254,13 @@ async def _update_product_rating_cache(db: AsyncSession, product_id: int) -> Non
     review_count = row[1] or 0
 
     # Update product
-    await db.execute(
+    result = await db.execute(
         update(Product)
         .where(Product.id == product_id)
         .values(average_rating=avg_rating, review_count=review_count)
+        .returning(Product.slug)
     )
+    after_commit(db, invalidate_products, *result.scalars().all())
     await db.commit()
 
 
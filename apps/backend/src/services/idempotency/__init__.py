@@ -0,0 +1,27 @@
+"""Idempotency-Key handling for non-idempotent endpoints."""
+
+from src.services.idempotency.models import IdempotencyKey
+from src.services.idempotency.service import (
+    IdempotencyClaim,
+    IdempotencyKeyInProgress,
+    IdempotencyKeyLost,
+    IdempotencyKeyMismatch,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    purge_expired_idempotency_keys,
+    release_idempotency_key,
+    request_fingerprint,
+)
+
+__all__ = [
+    "IdempotencyClaim",
+    "IdempotencyKey",
+    "IdempotencyKeyInProgress",
+    "IdempotencyKeyLost",
+    "IdempotencyKeyMismatch",
+    "claim_idempotency_key",
+    "complete_idempotency_key",
+    "purge_expired_idempotency_keys",
+    "release_idempotency_key",
+    "request_fingerprint",
+]
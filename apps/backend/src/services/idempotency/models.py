@@ -0,0 +1,37 @@
+"""Idempotency key database models."""
+
+from datetime import datetime
+
+from sqlalchemy import JSON, ForeignKey, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database import Base
+
+
+class IdempotencyKey(Base):
+    """A client-supplied Idempotency-Key and the response it produced.
+
+    The row is claimed (inserted) before the request runs, so concurrent
+    duplicates find it; response_body stays NULL until the first request
+    finishes, then later duplicates replay it instead of re-executing.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    key: Mapped[str] = mapped_column(String(255))
+    # SHA-256 of the endpoint and request body the key was first used with
+    request_hash: Mapped[str] = mapped_column(String(64))
+
+    status_code: Mapped[int | None] = mapped_column()
+    response_body: Mapped[dict | None] = mapped_column(JSON)
+
+    # When the request holding the key started (or took it over)
+    locked_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
@@ -0,0 +1,217 @@
+"""Idempotency-Key claims, replays and expiry."""
+
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import get_settings
+from src.database import upsert
+from src.services.idempotency.models import IdempotencyKey
+
+settings = get_settings()
+
+# How often a duplicate re-checks a key that another request is still using
+POLL_INTERVAL_SECONDS = 0.1
+
+
+class IdempotencyKeyMismatch(ValueError):
+    """The key was already used with a different request body."""
+
+
+class IdempotencyKeyInProgress(ValueError):
+    """The first request with this key is still running."""
+
+
+class IdempotencyKeyLost(ValueError):
+    """A retry took the key over while this request was still running."""
+
+
+class IdempotencyClaim(NamedTuple):
+    """Which claim a request holds: the key row and when it was locked.
+
+    A retry that takes over a stale claim moves locked_at, so the original
+    request can tell it no longer owns the key.
+    """
+
+    id: int
+    locked_at: datetime
+
+    @classmethod
+    def of(cls, key: IdempotencyKey) -> "IdempotencyClaim":
+        """The claim on a key row this request just claimed."""
+        return cls(key.id, key.locked_at)
+
+
+def request_fingerprint(endpoint: str, body: Any) -> str:
+    """Stable hash of an endpoint and its JSON-compatible request body."""
+    canonical = json.dumps([endpoint, body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def _insert_claim(
+    db: AsyncSession, user_id: int, key: str, fingerprint: str
+) -> IdempotencyKey | None:
+    """Insert a fresh claim; None if the key already has a row."""
+    now = datetime.utcnow()
+    stmt = (
+        upsert(db, IdempotencyKey)
+        .values(
+            user_id=user_id,
+            key=key,
+            request_hash=fingerprint,
+            locked_at=now,
+            created_at=now,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "key"])
+        .returning(IdempotencyKey)
+    )
+    claim = (
+        await db.scalars(select(IdempotencyKey).from_statement(stmt))
+    ).one_or_none()
+    await db.commit()
+    return claim
+
+
+async def _take_over(db: AsyncSession, existing: IdempotencyKey) -> IdempotencyKey | None:
+    """Claim a key whose holder died mid-request; None if someone beat us to it."""
+    stmt = (
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == existing.id)
+        .where(IdempotencyKey.locked_at == existing.locked_at)
+        .where(IdempotencyKey.response_body.is_(None))
+        .values(locked_at=datetime.utcnow())
+        .returning(IdempotencyKey)
+    )
+    claim = (
+        await db.scalars(
+            select(IdempotencyKey)
+            .from_statement(stmt)
+            .execution_options(populate_existing=True)
+        )
+    ).one_or_none()
+    await db.commit()
+    return claim
+
+
+async def claim_idempotency_key(
+    db: AsyncSession, user_id: int, key: str, fingerprint: str
+) -> IdempotencyKey:
+    """Claim a key for this request, or find the response it already produced.
+
+    Returns the key row. If its response_body is set, replay that response;
+    otherwise this request now holds the key and must finish by passing
+    IdempotencyClaim.of(key) to complete_idempotency_key or
+    release_idempotency_key. A duplicate
+    that arrives while the first request is still running waits for it (up
+    to IDEMPOTENCY_WAIT_SECONDS) rather than running checkout again. Commits.
+
+    Raises IdempotencyKeyMismatch if the key was used for a different
+    request, IdempotencyKeyInProgress if the first request is still running
+    when the wait runs out.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claim = await _insert_claim(db, user_id, key, fingerprint)
+        if claim is not None:
+            return claim
+
+        existing = await db.scalar(
+            select(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .execution_options(populate_existing=True)
+        )
+        await db.commit()
+        now = datetime.utcnow()
+        if existing is None:
+            # Released by a failed first attempt; claim it ourselves
+            continue
+        if existing.expires_at <= now:
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == existing.id))
+            await db.commit()
+            continue
+        if existing.request_hash != fingerprint:
+            raise IdempotencyKeyMismatch(
+                "Idempotency-Key was already used with a different request"
+            )
+        if existing.response_body is not None:
+            return existing
+
+        lock_timeout = timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+        if existing.locked_at <= now - lock_timeout:
+            claim = await _take_over(db, existing)
+            if claim is not None:
+                return claim
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInProgress(
+                "A request with this Idempotency-Key is still in progress"
+            )
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def complete_idempotency_key(
+    db: AsyncSession, claim: IdempotencyClaim, status_code: int, body: Any
+) -> None:
+    """Store the response for a claimed key so duplicates replay it.
+
+    Does not commit: call it inside the transaction that does the request's
+    work, so the response is saved if and only if that work is.
+
+    Raises IdempotencyKeyLost if a retry took the key over after
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS; roll the work back then, the retry
+    does it instead.
+    """
+    result = await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == claim.id)
+        .where(IdempotencyKey.locked_at == claim.locked_at)
+        .where(IdempotencyKey.response_body.is_(None))
+        .values(status_code=status_code, response_body=body)
+    )
+    if result.rowcount != 1:
+        raise IdempotencyKeyLost(
+            "A retry of this request took over its Idempotency-Key"
+        )
+
+
+async def release_idempotency_key(db: AsyncSession, claim: IdempotencyClaim) -> None:
+    """Give a key back after a failed request, so a retry runs it again.
+
+    Rolls back first, and leaves the key alone if its response was already
+    committed (the work happened; retries must replay it) or a retry has
+    taken it over. Commits.
+    """
+    await db.rollback()
+    await db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.id == claim.id)
+        .where(IdempotencyKey.locked_at == claim.locked_at)
+        .where(IdempotencyKey.response_body.is_(None))
+    )
+    await db.commit()
+
+
+async def purge_expired_idempotency_keys(db: AsyncSession, limit: int = 1000) -> int:
+    """Delete up to `limit` expired idempotency keys in one transaction.
+
+    Rows another transaction holds are skipped. Returns the number deleted;
+    call again until it returns less than `limit`.
+    """
+    expired = (
+        select(IdempotencyKey.id)
+        .where(IdempotencyKey.expires_at <= datetime.utcnow())
+        .order_by(IdempotencyKey.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    key_ids = list(await db.scalars(expired))
+    if key_ids:
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(key_ids)))
+    await db.commit()
+    return len(key_ids)
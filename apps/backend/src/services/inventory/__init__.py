@@ -1,5 +1,17 @@
 """Inventory management services."""
 
-from src.services.inventory.service import InventoryService
+from src.services.inventory.models import StockHold
+from src.services.inventory.service import (
+    InsufficientStockError,
+    InventoryService,
+    StockShortfall,
+    release_expired_holds,
+)
 
-__all__ = ["InventoryService"]
+__all__ = [
+    "InsufficientStockError",
+    "InventoryService",
+    "StockHold",
+    "StockShortfall",
+    "release_expired_holds",
+]
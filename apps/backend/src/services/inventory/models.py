@@ -0,0 +1,40 @@
+"""Inventory database models."""
+
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database import Base
+
+
+class StockHold(Base):
+    """Stock set aside for an order whose payment is still in flight.
+
+    A hold counts against available-to-sell until it expires. Confirming the
+    payment converts it into a real stock decrement; otherwise the sweeper
+    deletes it once expired, returning the units to sale.
+    """
+
+    __tablename__ = "stock_holds"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE")
+    )
+    order_id: Mapped[int] = mapped_column(
+        ForeignKey("orders.id", ondelete="CASCADE"), index=True
+    )
+    quantity: Mapped[int] = mapped_column()
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    __table_args__ = (
+        # Active holds per product are summed from the index alone
+        Index(
+            "ix_stock_holds_product_expires_at",
+            "product_id",
+            "expires_at",
+            postgresql_include=["quantity"],
+        ),
+    )
@@ -1,9 +1,43 @@
 """Inventory management service."""
 
-from sqlalchemy import update
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.selectable import ScalarSelect
+
+from src.products.models import Product, in_stock_condition
+from src.services.inventory.models import StockHold
+
+
+def held_quantity() -> ScalarSelect[int]:
+    """Units of the outer query's product held by unexpired stock holds."""
+    return (
+        select(func.coalesce(func.sum(StockHold.quantity), 0))
+        .where(StockHold.product_id == Product.id)
+        .where(StockHold.expires_at > datetime.utcnow())
+        .scalar_subquery()
+    )
+
 
-from src.products.models import Product
+@dataclass
+class StockShortfall:
+    """A line that could not be reserved."""
+
+    product_id: int
+    requested: int
+    available: int
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a reservation can't be met in full; nothing was reserved."""
+
+    def __init__(self, shortfalls: list[StockShortfall], message: str | None = None):
+        self.shortfalls = shortfalls
+        super().__init__(message or "Not enough stock for some items")
 
 
 class InventoryService:
@@ -43,6 +77,207 @@ class InventoryService:
 
         return True, None
 
+    async def available_to_sell(self, product_ids: set[int]) -> dict[int, int]:
+        """
+        Stock minus active holds for each product.
+
+        Args:
+            product_ids: Products to look up
+
+        Returns:
+            Units available by product ID (missing products are left out)
+        """
+        result = await self.db.execute(
+            select(Product.id, Product.stock_quantity - held_quantity()).where(
+                Product.id.in_(product_ids)
+            )
+        )
+        return dict(result.all())
+
+    async def _lock_products(self, product_ids: Iterable[int]) -> None:
+        """Lock product rows in id order until the transaction ends.
+
+        Every path that consumes availability (reserving, holding) locks first,
+        so each one's following statements see the others' committed holds.
+        """
+        await self.db.execute(
+            select(Product.id)
+            .where(Product.id.in_(product_ids))
+            .order_by(Product.id)
+            .with_for_update()
+        )
+
+    async def _shortfalls(
+        self,
+        quantities: dict[int, int],
+        missing: list[int],
+    ) -> list[StockShortfall]:
+        """Shortfall details for the lines that couldn't be covered."""
+        available = await self.available_to_sell(set(missing))
+        return [
+            StockShortfall(
+                product_id=product_id,
+                requested=quantities[product_id],
+                available=max(available.get(product_id, 0), 0),
+            )
+            for product_id in missing
+        ]
+
+    async def reserve_all(
+        self,
+        quantities: dict[int, int],
+    ) -> list[StockShortfall]:
+        """
+        Reserve stock for several products in one conditional UPDATE.
+
+        Each row is only decremented if it can cover its quantity on top of
+        active holds (or allows backorders / isn't tracked), checked by the
+        database as it updates the row, so concurrent reservations can never
+        oversell. Does not commit: row locks last until the caller's
+        transaction ends, and the caller must roll back if any shortfall is
+        returned.
+
+        Args:
+            quantities: Quantity to reserve by product ID
+
+        Returns:
+            The lines that could not be reserved (empty on success)
+        """
+        if not quantities:
+            return []
+        await self._lock_products(quantities)
+        requested = case(quantities, value=Product.id)
+        new_stock = case(
+            (Product.track_inventory.is_(True), Product.stock_quantity - requested),
+            else_=Product.stock_quantity,
+        )
+        result = await self.db.execute(
+            update(Product)
+            .where(Product.id.in_(quantities))
+            .where(
+                or_(
+                    Product.track_inventory.is_(False),
+                    Product.allow_backorder.is_(True),
+                    Product.stock_quantity - held_quantity() >= requested,
+                )
+            )
+            .values(stock_quantity=new_stock, is_in_stock=in_stock_condition(new_stock))
+            .returning(Product.id)
+            .execution_options(synchronize_session="fetch")
+        )
+        reserved = set(result.scalars())
+        missing = [product_id for product_id in quantities if product_id not in reserved]
+        if not missing:
+            return []
+        return await self._shortfalls(quantities, missing)
+
+    async def hold_all(
+        self,
+        order_id: int,
+        quantities: dict[int, int],
+        ttl: timedelta,
+    ) -> list[StockShortfall]:
+        """
+        Hold stock for an order awaiting payment, all or nothing.
+
+        Held units stay in stock_quantity but are no longer available to
+        sell until the hold is converted, released or expires. Untracked and
+        backorderable products need no hold; their lines are taken from stock
+        when the payment is confirmed. Does not commit; the caller must roll
+        back if any shortfall is returned.
+
+        Args:
+            order_id: Order the holds belong to
+            quantities: Quantity to hold by product ID
+            ttl: How long the holds last
+
+        Returns:
+            The lines that could not be held (empty on success)
+        """
+        if not quantities:
+            return []
+        await self._lock_products(quantities)
+        result = await self.db.execute(
+            select(
+                Product.id,
+                Product.track_inventory,
+                Product.allow_backorder,
+                Product.stock_quantity - held_quantity(),
+            ).where(Product.id.in_(quantities))
+        )
+        to_hold = {}
+        missing = set(quantities)
+        for product_id, track_inventory, allow_backorder, available in result:
+            if track_inventory and not allow_backorder:
+                if available < quantities[product_id]:
+                    continue
+                to_hold[product_id] = quantities[product_id]
+            missing.discard(product_id)
+        if missing:
+            return await self._shortfalls(quantities, sorted(missing))
+
+        if to_hold:
+            expires_at = datetime.utcnow() + ttl
+            await self.db.execute(
+                insert(StockHold),
+                [
+                    {
+                        "order_id": order_id,
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "expires_at": expires_at,
+                    }
+                    for product_id, quantity in to_hold.items()
+                ],
+            )
+        return []
+
+    async def convert_holds(self, order_id: int) -> dict[int, int]:
+        """
+        Turn an order's unexpired holds into stock decrements (payment succeeded).
+
+        Expired holds are dropped without touching stock: their units may
+        already have been sold to someone else, so the caller must reserve
+        those lines again through reserve_all. Does not commit.
+
+        Args:
+            order_id: Order whose holds to convert
+
+        Returns:
+            Units taken from stock by product ID
+        """
+        now = datetime.utcnow()
+        result = await self.db.execute(
+            delete(StockHold)
+            .where(StockHold.order_id == order_id)
+            .returning(StockHold.product_id, StockHold.quantity, StockHold.expires_at)
+        )
+        quantities: dict[int, int] = defaultdict(int)
+        for product_id, quantity, expires_at in result:
+            if expires_at > now:
+                quantities[product_id] += quantity
+        if not quantities:
+            return {}
+
+        # The holds already kept these units from being sold twice
+        new_stock = Product.stock_quantity - case(quantities, value=Product.id)
+        await self.db.execute(
+            update(Product)
+            .where(Product.id.in_(quantities))
+            .values(stock_quantity=new_stock, is_in_stock=in_stock_condition(new_stock))
+            .execution_options(synchronize_session="fetch")
+        )
+        return dict(quantities)
+
+    async def release_holds(self, order_id: int) -> None:
+        """
+        Drop an order's holds, returning the units to sale. Does not commit.
+
+        Args:
+            order_id: Order whose holds to release
+        """
+        await self.db.execute(delete(StockHold).where(StockHold.order_id == order_id))
+
     async def reserve_stock(
         self,
         product_id: int,
@@ -58,14 +293,9 @@ class InventoryService:
         Returns:
             True if successful, False if not enough stock
         """
-        result = await self.db.execute(
-            update(Product)
-            .where(Product.id == product_id)
-            .where(Product.stock_quantity >= quantity)
-            .values(stock_quantity=Product.stock_quantity - quantity)
-        )
+        shortfalls = await self.reserve_all({product_id: quantity})
         await self.db.commit()
-        return result.rowcount > 0
+        return not shortfalls
 
     async def release_stock(
         self,
@@ -82,7 +312,10 @@ class InventoryService:
         await self.db.execute(
             update(Product)
             .where(Product.id == product_id)
-            .values(stock_quantity=Product.stock_quantity + quantity)
+            .values(
+                stock_quantity=Product.stock_quantity + quantity,
+                is_in_stock=in_stock_condition(Product.stock_quantity + quantity),
+            )
         )
         await self.db.commit()
 
@@ -136,6 +369,28 @@ class InventoryService:
             return None
 
         product.stock_quantity = new_quantity
+        product.refresh_stock_status()
         await self.db.commit()
         await self.db.refresh(product)
         return product
+
+
+async def release_expired_holds(db: AsyncSession, limit: int = 1000) -> int:
+    """Delete up to `limit` expired stock holds in one transaction.
+
+    Expired holds already stopped counting against availability; this just
+    keeps the table small. Rows another transaction holds are skipped.
+    Returns the number deleted; call again until it returns less than `limit`.
+    """
+    expired = (
+        select(StockHold.id)
+        .where(StockHold.expires_at <= datetime.utcnow())
+        .order_by(StockHold.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    hold_ids = list(await db.scalars(expired))
+    if hold_ids:
+        await db.execute(delete(StockHold).where(StockHold.id.in_(hold_ids)))
+    await db.commit()
+    return len(hold_ids)
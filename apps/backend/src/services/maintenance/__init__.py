@@ -0,0 +1,21 @@
+"""Background maintenance services."""
+
+from src.services.maintenance.service import (
+    BatchReaper,
+    CartReaper,
+    IdempotencyKeyPurger,
+    MaintenanceScheduler,
+    ReapResult,
+    StockHoldSweeper,
+    create_scheduler,
+)
+
+__all__ = [
+    "BatchReaper",
+    "CartReaper",
+    "IdempotencyKeyPurger",
+    "MaintenanceScheduler",
+    "ReapResult",
+    "StockHoldSweeper",
+    "create_scheduler",
+]
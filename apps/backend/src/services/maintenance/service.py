@@ -0,0 +1,183 @@
+"""Background maintenance jobs and the in-process scheduler that runs them."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.cart.service import cleanup_expired_carts
+from src.config import get_settings
+from src.database import async_session_maker
+from src.services.idempotency import purge_expired_idempotency_keys
+from src.services.inventory import release_expired_holds
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReapResult:
+    """Outcome of one reaper run."""
+
+    deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+class BatchReaper:
+    """Deletes expired rows in bounded batches.
+
+    Each batch is its own short transaction, so row locks are held for one
+    batch at a time rather than the whole run. Subclasses set reap_batch to
+    a function deleting up to `limit` rows and returning how many it did.
+    """
+
+    reap_batch: Callable[..., Awaitable[int]]
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+        batch_size: int = 1000,
+        max_batches: int | None = None,
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+    async def run(self) -> ReapResult:
+        """Reap until no expired rows are left (or max_batches is hit)."""
+        result = ReapResult()
+        started = time.perf_counter()
+        while self.max_batches is None or result.batches < self.max_batches:
+            async with self.session_maker() as db:
+                deleted = await self.reap_batch(db, limit=self.batch_size)
+            result.batches += 1
+            result.deleted += deleted
+            if deleted < self.batch_size:
+                break
+            # Let request handlers in this process run between batches
+            await asyncio.sleep(0)
+        result.seconds = time.perf_counter() - started
+        return result
+
+
+class CartReaper(BatchReaper):
+    """Deletes expired guest carts (and their items) in bounded batches."""
+
+    reap_batch = staticmethod(cleanup_expired_carts)
+
+
+class StockHoldSweeper(BatchReaper):
+    """Deletes expired stock holds in bounded batches."""
+
+    reap_batch = staticmethod(release_expired_holds)
+
+
+class IdempotencyKeyPurger(BatchReaper):
+    """Deletes expired idempotency keys in bounded batches."""
+
+    reap_batch = staticmethod(purge_expired_idempotency_keys)
+
+
+@dataclass
+class JobStats:
+    """Per-job run metrics kept by the scheduler."""
+
+    runs: int = 0
+    failures: int = 0
+    last_started_at: datetime | None = None
+    last_result: Any = None
+    last_error: str | None = None
+
+
+@dataclass
+class _Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    interval: float
+    stats: JobStats = field(default_factory=JobStats)
+
+
+class MaintenanceScheduler:
+    """Runs maintenance jobs on a fixed cadence inside the app process.
+
+    Every worker runs its own scheduler; jobs must tolerate running
+    concurrently in several processes (the cart reaper skips locked rows).
+    """
+
+    def __init__(self):
+        self._jobs: dict[str, _Job] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval_seconds: float,
+    ) -> None:
+        """Register a job to run every interval_seconds once started."""
+        self._jobs[name] = _Job(name, func, interval_seconds)
+
+    @property
+    def stats(self) -> dict[str, JobStats]:
+        """Run metrics by job name."""
+        return {name: job.stats for name, job in self._jobs.items()}
+
+    async def run_job(self, name: str) -> Any:
+        """Run a job once now, recording its metrics."""
+        job = self._jobs[name]
+        job.stats.runs += 1
+        job.stats.last_started_at = datetime.utcnow()
+        try:
+            result = await job.func()
+        except Exception as e:
+            job.stats.failures += 1
+            job.stats.last_error = repr(e)
+            logger.exception(f"Maintenance job {name} failed")
+            return None
+        job.stats.last_result = result
+        job.stats.last_error = None
+        logger.info(f"Maintenance job {name}: {result}")
+        return result
+
+    async def _loop(self, job: _Job) -> None:
+        while True:
+            await asyncio.sleep(job.interval)
+            await self.run_job(job.name)
+
+    def start(self) -> None:
+        """Start every job's loop on the running event loop."""
+        self._tasks = [
+            asyncio.create_task(self._loop(job), name=f"maintenance:{job.name}")
+            for job in self._jobs.values()
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the job loops and wait for them to finish."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_scheduler() -> MaintenanceScheduler:
+    """Scheduler with the app's maintenance jobs registered from settings."""
+    settings = get_settings()
+    scheduler = MaintenanceScheduler()
+    reaper = CartReaper(batch_size=settings.CART_REAPER_BATCH_SIZE)
+    scheduler.add_job(
+        "cart_reaper", reaper.run, settings.CART_REAPER_INTERVAL_SECONDS
+    )
+    sweeper = StockHoldSweeper(batch_size=settings.STOCK_HOLD_SWEEP_BATCH_SIZE)
+    scheduler.add_job(
+        "stock_hold_sweeper", sweeper.run, settings.STOCK_HOLD_SWEEP_INTERVAL_SECONDS
+    )
+    purger = IdempotencyKeyPurger(batch_size=settings.IDEMPOTENCY_PURGE_BATCH_SIZE)
+    scheduler.add_job(
+        "idempotency_key_purger", purger.run, settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS
+    )
+    return scheduler
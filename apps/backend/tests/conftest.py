@@ -4,9 +4,14 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from src.auth.cache import user_cache
 from src.auth.models import User  # noqa: F401 - Import to register model
+from src.auth.security import token_verifier
+from src.cart.cache import cart_handle_cache, cart_summary_cache
 from src.database import Base, get_db
 from src.main import app
+from src.pagination import _count_cache
+from src.products.cache import catalog_cache
 
 # Use SQLite for tests
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -37,6 +42,24 @@ async def setup_database():
         await conn.run_sync(Base.metadata.drop_all)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Reset in-process caches so tests don't see each other's data."""
+    catalog_cache.clear()
+    _count_cache.clear()
+    cart_handle_cache.clear()
+    cart_summary_cache.clear()
+    user_cache.clear()
+    token_verifier.clear()
+    yield
+    catalog_cache.clear()
+    _count_cache.clear()
+    cart_handle_cache.clear()
+    cart_summary_cache.clear()
+    user_cache.clear()
+    token_verifier.clear()
+
+
 @pytest.fixture
 async def client() -> AsyncGenerator[AsyncClient, None]:
     """Async test client."""
@@ -1,5 +1,23 @@
+import asyncio
+import time
+
 import pytest
 from httpx import AsyncClient
+from passlib.context import CryptContext
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth import dependencies as auth_dependencies
+from src.auth.cache import user_cache
+from src.auth.models import User
+from src.auth.security import (
+    JoseBackend,
+    PasswordHasher,
+    PasswordHasherBusy,
+    TokenVerifier,
+    password_hasher,
+    pwd_context,
+)
 
 
 @pytest.mark.asyncio
@@ -94,3 +112,201 @@ async def test_get_me_unauthenticated(client: AsyncClient):
     """Test getting current user without authentication fails."""
     response = await client.get("/auth/me")
     assert response.status_code == 401
+
+
+async def login(client: AsyncClient, email: str) -> dict[str, str]:
+    """Register a user and return bearer auth headers for them."""
+    await client.post(
+        "/auth/register", json={"email": email, "password": "testpassword123"}
+    )
+    response = await client.post(
+        "/auth/login", data={"username": email, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def user_queries(
+    db: AsyncSession, client: AsyncClient, *args, method: str = "get", **kwargs
+):
+    """Make a request; return the response and the users-table queries run."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        response = await getattr(client, method)(*args, **kwargs)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+    return response, [s for s in statements if "FROM users" in s]
+
+
+@pytest.mark.asyncio
+async def test_authenticated_requests_reuse_cached_user(
+    client: AsyncClient, db: AsyncSession
+):
+    """Test only the first authenticated request looks the user up."""
+    headers = await login(client, "cached@example.com")
+    first, first_queries = await user_queries(db, client, "/auth/me", headers=headers)
+    second, second_queries = await user_queries(db, client, "/auth/me", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert len(first_queries) == 1
+    assert second_queries == []
+
+
+@pytest.mark.asyncio
+async def test_user_changes_invalidate_cache(client: AsyncClient, db: AsyncSession):
+    """Test deactivating a user takes effect on their very next request."""
+    headers = await login(client, "deactivated@example.com")
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+
+    user = await db.scalar(select(User).where(User.email == "deactivated@example.com"))
+    cached = user_cache.get(user.id)
+    user.is_active = False
+    await db.flush()
+    # A request racing the uncommitted write caches the old row again
+    user_cache.set(user.id, cached)
+    await db.commit()
+
+    response = await client.get("/auth/me", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+
+@pytest.mark.asyncio
+async def test_trusted_claims_skip_user_lookup(
+    client: AsyncClient, db: AsyncSession, monkeypatch
+):
+    """Test read-only routes use signed token claims when trusted, writes don't."""
+    headers = await login(client, "claims@example.com")
+
+    response, queries = await user_queries(db, client, "/orders", headers=headers)
+    assert response.status_code == 200
+    assert len(queries) == 1
+
+    user_cache.clear()
+    monkeypatch.setattr(auth_dependencies.settings, "TRUST_TOKEN_CLAIMS", True)
+    response, queries = await user_queries(db, client, "/orders", headers=headers)
+    assert response.status_code == 200
+    assert queries == []
+
+    response, queries = await user_queries(
+        db, client, "/cart/summary", headers=headers
+    )
+    assert response.status_code == 200
+    assert queries == []
+
+    # Routes that change data still check the user row
+    response, queries = await user_queries(
+        db, client, "/cart", method="delete", headers=headers
+    )
+    assert response.status_code == 204
+    assert len(queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client: AsyncClient, db: AsyncSession):
+    """Test a hash below the configured cost is upgraded on login."""
+    legacy_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    db.add(
+        User(
+            email="legacy@example.com",
+            hashed_password=legacy_context.hash("testpassword123"),
+        )
+    )
+    await db.commit()
+
+    response = await client.post(
+        "/auth/login",
+        data={"username": "legacy@example.com", "password": "testpassword123"},
+    )
+    assert response.status_code == 200
+
+    user = await db.scalar(select(User).where(User.email == "legacy@example.com"))
+    await db.refresh(user)
+    assert not pwd_context.needs_update(user.hashed_password)
+    assert pwd_context.verify("testpassword123", user.hashed_password)
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_full():
+    """Test hashes beyond workers + pending are refused, not queued."""
+    hasher = PasswordHasher(
+        CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), max_workers=1, max_pending=1
+    )
+    try:
+        results = await asyncio.gather(
+            *(hasher.hash("secret") for _ in range(3)), return_exceptions=True
+        )
+        assert sum(isinstance(r, PasswordHasherBusy) for r in results) == 1
+        assert hasher.in_flight == 0
+        assert (await hasher.verify("secret", results[0])) == (True, None)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_login_returns_503_when_hasher_busy(client: AsyncClient, monkeypatch):
+    """Test a saturated hasher turns logins away with Retry-After."""
+    await login(client, "busy@example.com")
+    monkeypatch.setattr(password_hasher, "max_workers", 0)
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+
+    response = await client.post(
+        "/auth/login",
+        data={"username": "busy@example.com", "password": "testpassword123"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+class CountingBackend(JoseBackend):
+    """Jose backend that counts signature verifications."""
+
+    decodes = 0
+
+    def decode(self, token: str) -> dict:
+        self.decodes += 1
+        return super().decode(token)
+
+
+def test_token_verifier_caches_verified_tokens():
+    """Test a token is only cryptographically verified once."""
+    verifier = TokenVerifier(CountingBackend("secret", "HS256"), 16, 300)
+    token = verifier.encode({"sub": "7", "role": "admin", "exp": time.time() + 60})
+
+    first = verifier.verify(token)
+    second = verifier.verify(token)
+
+    assert first.user_id == 7 and first.role == "admin"
+    assert second == first
+    assert verifier.backend.decodes == 1
+
+
+def test_token_verifier_honors_exp(monkeypatch):
+    """Test cached tokens are re-verified once their exp passes."""
+    verifier = TokenVerifier(CountingBackend("secret", "HS256"), 16, 300)
+    token = verifier.encode({"sub": "7", "exp": time.time() + 2})
+    assert verifier.verify(token) is not None
+
+    later = time.monotonic() + 5
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    verifier.verify(token)
+    assert verifier.backend.decodes == 2
+
+    expired = verifier.encode({"sub": "7", "exp": time.time() - 10})
+    assert verifier.verify(expired) is None
+
+
+def test_token_verifier_does_not_cache_forged_tokens():
+    """Test tokens signed with another key are rejected every time."""
+    verifier = TokenVerifier(CountingBackend("secret", "HS256"), 16, 300)
+    forged = TokenVerifier(JoseBackend("other", "HS256"), 16, 300).encode({"sub": "7"})
+
+    assert verifier.verify(forged) is None
+    assert verifier.verify(forged) is None
+    assert verifier.backend.decodes == 2
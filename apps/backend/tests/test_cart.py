@@ -0,0 +1,570 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import User
+from src.cart import store as cart_stores
+from src.cart.cache import cart_handle_cache
+from src.cart.models import Cart, CartItem
+from src.cart.redis_server import FakeRedisServer
+from src.cart.schemas import CartItemCreate
+from src.cart.service import add_item_to_cart, get_cart_handle, merge_guest_cart
+from src.cart.store import cart_store, memory_client
+from src.products.models import Category, Product
+
+GUEST = {"X-Session-ID": "guest-session-1"}
+
+
+@pytest.fixture
+async def products(db: AsyncSession) -> list[Product]:
+    """A few purchasable products, the first one in a category."""
+    category = Category(name="Cupcakes", slug="cupcakes")
+    db.add(category)
+    await db.flush()
+    items = [
+        Product(
+            sku=f"SKU-{i:03d}",
+            name=f"Product {i}",
+            slug=f"product-{i}",
+            description="A tasty protein treat.",
+            price=Decimal("4.00") + i,
+            stock_quantity=50,
+            display_order=i,
+        )
+        for i in range(1, 6)
+    ]
+    items[0].category_id = category.id
+    db.add_all(items)
+    await db.commit()
+    return items
+
+
+@pytest.mark.asyncio
+async def test_add_item_merges_matching_line(client: AsyncClient, products):
+    """Test adding the same product twice bumps one line's quantity."""
+    body = {"product_id": products[0].id, "quantity": 2}
+    first = await client.post("/cart/items", json=body, headers=GUEST)
+    second = await client.post("/cart/items", json=body, headers=GUEST)
+    assert first.status_code == second.status_code == 201
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["quantity"] == 4
+    assert second.json()["product"]["slug"] == "product-1"
+
+    cart = (await client.get("/cart", headers=GUEST)).json()
+    assert len(cart["items"]) == 1
+    assert cart["item_count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_add_item_keeps_distinct_instructions(client: AsyncClient, products):
+    """Test lines with different special instructions stay separate."""
+    for instructions in (None, "Happy Birthday!", "Happy Birthday!", None):
+        response = await client.post(
+            "/cart/items",
+            json={"product_id": products[0].id, "special_instructions": instructions},
+            headers=GUEST,
+        )
+        assert response.status_code == 201
+
+    cart = (await client.get("/cart", headers=GUEST)).json()
+    assert sorted(
+        (item["special_instructions"] or "", item["quantity"]) for item in cart["items"]
+    ) == [("", 2), ("Happy Birthday!", 2)]
+
+
+@pytest.mark.asyncio
+async def test_add_item_rejects_unavailable_product(client: AsyncClient, products, db):
+    """Test inactive products can't be added."""
+    products[1].is_active = False
+    await db.commit()
+    response = await client.post(
+        "/cart/items", json={"product_id": products[1].id}, headers=GUEST
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_add_item_statement_count_independent_of_cart_size(
+    db: AsyncSession, products
+):
+    """Test add-to-cart is a product lookup plus one upsert, however full the cart."""
+    cart = await get_cart_handle(db, session_id="guest-session-2")
+    for product in products[1:]:
+        await add_item_to_cart(db, cart.id, CartItemCreate(product_id=product.id))
+    db.expunge_all()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        item = await add_item_to_cart(
+            db, cart.id, CartItemCreate(product_id=products[1].id, quantity=3)
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert item.quantity == 4
+    assert len(statements) == 2, statements
+
+
+@pytest.mark.asyncio
+async def test_cart_mutations_skip_cart_load(client: AsyncClient, products, db):
+    """Test item mutations resolve a cached cart id instead of loading the cart."""
+    response = await client.post(
+        "/cart/items", json={"product_id": products[0].id}, headers=GUEST
+    )
+    item_id = response.json()["id"]
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        update = await client.put(
+            f"/cart/items/{item_id}", json={"quantity": 3}, headers=GUEST
+        )
+        delete = await client.delete(f"/cart/items/{item_id}", headers=GUEST)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert update.status_code == 200
+    assert update.json()["quantity"] == 3
+    assert delete.status_code == 204
+    assert not [s for s in statements if "FROM carts" in s], statements
+    assert (await client.get("/cart", headers=GUEST)).json()["items"] == []
+
+
+@pytest.mark.asyncio
+async def test_cart_handle_expired_guest_cart_is_replaced(db: AsyncSession):
+    """Test a cached guest handle past its expiry resolves to a fresh cart."""
+    handle = await get_cart_handle(db, session_id="guest-session-3")
+    assert await get_cart_handle(db, session_id="guest-session-3") == handle
+
+    cart = await db.get(Cart, handle.id)
+    await db.delete(cart)
+    await db.commit()
+    cart_handle_cache.set(
+        ("session", "guest-session-3"), handle._replace(expires_at=datetime.utcnow())
+    )
+
+    fresh = await get_cart_handle(db, session_id="guest-session-3")
+    assert fresh.expires_at > datetime.utcnow()
+
+
+@pytest.mark.asyncio
+async def test_merge_guest_cart_is_set_based(db: AsyncSession, products):
+    """Test merging sums matching lines in a fixed number of statements."""
+    user = User(email="baker@example.com", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    user_cart = await get_cart_handle(db, user_id=user.id)
+    await add_item_to_cart(db, user_cart.id, CartItemCreate(product_id=products[0].id))
+
+    guest_cart = await get_cart_handle(db, session_id="guest-session-4")
+    for product in products:
+        await add_item_to_cart(
+            db, guest_cart.id, CartItemCreate(product_id=product.id, quantity=2)
+        )
+    await db.execute(
+        update(Cart).where(Cart.id == guest_cart.id).values(delivery_time_slot="evening")
+    )
+    await db.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        cart = await merge_guest_cart(db, user.id, "guest-session-4")
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert sorted((i.product_id, i.quantity) for i in cart.items) == [
+        (products[0].id, 3),
+        *((product.id, 2) for product in products[1:]),
+    ]
+    assert cart.delivery_time_slot == "evening"
+    # lock guest, upsert lines, copy delivery, 2 deletes, then load the cart
+    # (cart, items, products, categories)
+    assert len(statements) <= 9, statements
+    assert await db.get(Cart, guest_cart.id) is None
+
+    # The session is merged already; a second login changes nothing
+    again = await merge_guest_cart(db, user.id, "guest-session-4")
+    assert sum(item.quantity for item in again.items) == 11
+
+
+@pytest.mark.asyncio
+async def test_cart_summary(client: AsyncClient, products, db: AsyncSession):
+    """Test the badge summary aggregates in SQL and tracks cart changes."""
+    empty = await client.get("/cart/summary", headers=GUEST)
+    assert empty.json() == {"item_count": 0, "subtotal": "0.00"}
+    assert await db.scalar(select(func.count()).select_from(Cart)) == 0
+
+    first = await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 2}, headers=GUEST
+    )
+    await client.post("/cart/items", json={"product_id": products[1].id}, headers=GUEST)
+    summary = (await client.get("/cart/summary", headers=GUEST)).json()
+    assert summary == {"item_count": 3, "subtotal": "16.00"}
+
+    await client.put(
+        f"/cart/items/{first.json()['id']}", json={"quantity": 1}, headers=GUEST
+    )
+    summary = (await client.get("/cart/summary", headers=GUEST)).json()
+    assert summary == {"item_count": 2, "subtotal": "11.00"}
+
+    await client.delete("/cart", headers=GUEST)
+    summary = (await client.get("/cart/summary", headers=GUEST)).json()
+    assert summary["item_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cart_summary_is_cached(client: AsyncClient, products, db: AsyncSession):
+    """Test repeated badge requests are served without touching the database."""
+    await client.post("/cart/items", json={"product_id": products[0].id}, headers=GUEST)
+    await client.get("/cart/summary", headers=GUEST)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        response = await client.get("/cart/summary", headers=GUEST)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert response.json()["item_count"] == 1
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_batch_applies_operations_together(
+    client: AsyncClient, products, db: AsyncSession
+):
+    """Test one batch updates, removes and adds lines and returns the cart."""
+    first = await client.post(
+        "/cart/items", json={"product_id": products[0].id}, headers=GUEST
+    )
+    second = await client.post(
+        "/cart/items", json={"product_id": products[1].id}, headers=GUEST
+    )
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        response = await client.post(
+            "/cart/items:batch",
+            json={
+                "operations": [
+                    {"op": "update", "item_id": first.json()["id"], "quantity": 5},
+                    {"op": "remove", "item_id": second.json()["id"]},
+                    {"op": "add", "product_id": products[2].id, "quantity": 2},
+                    {"op": "add", "product_id": products[2].id},
+                    {"op": "add", "product_id": products[3].id},
+                    {"op": "add", "product_id": products[0].id},
+                ]
+            },
+            headers=GUEST,
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert response.status_code == 200
+    cart = response.json()
+    assert sorted((i["product_id"], i["quantity"]) for i in cart["items"]) == [
+        (products[0].id, 6),
+        (products[2].id, 3),
+        (products[3].id, 1),
+    ]
+    assert cart["items"][0]["product"]["category"]["slug"] == "cupcakes"
+    # One IN query validates every product; one more loads the returned cart
+    product_reads = [s for s in statements if s.lstrip().startswith("SELECT products.")]
+    assert len(product_reads) == 2, product_reads
+
+
+@pytest.mark.asyncio
+async def test_batch_is_all_or_nothing(client: AsyncClient, products, db: AsyncSession):
+    """Test a single invalid operation rejects the whole batch."""
+    products[4].is_active = False
+    await db.commit()
+    first = await client.post(
+        "/cart/items", json={"product_id": products[0].id}, headers=GUEST
+    )
+
+    for operations, detail in (
+        (
+            [
+                {"op": "update", "item_id": first.json()["id"], "quantity": 4},
+                {"op": "add", "product_id": products[4].id},
+            ],
+            "Product is not available",
+        ),
+        ([{"op": "remove", "item_id": 999}], "Cart item 999 not found"),
+        (
+            [
+                {"op": "remove", "item_id": first.json()["id"]},
+                {"op": "update", "item_id": first.json()["id"], "quantity": 2},
+            ],
+            f"Cart item {first.json()['id']} appears more than once",
+        ),
+    ):
+        response = await client.post(
+            "/cart/items:batch", json={"operations": operations}, headers=GUEST
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == detail
+
+    cart = (await client.get("/cart", headers=GUEST)).json()
+    assert [(i["product_id"], i["quantity"]) for i in cart["items"]] == [
+        (products[0].id, 1)
+    ]
+
+
+# ============ Key-value guest store ============
+
+
+@pytest.fixture
+def memory_guest_store(monkeypatch):
+    """Keep guest carts in the in-process fake Redis."""
+    monkeypatch.setattr(cart_stores.settings, "CART_GUEST_STORE", "memory")
+    memory_client.flushall()
+    yield memory_client
+    memory_client.flushall()
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def guest_store(request, monkeypatch):
+    """Keep guest carts in the fake Redis, in-process or through the redis client.
+
+    The "redis" case connects the real client to a Redis-protocol server.
+    Yields a client for inspecting what the store wrote.
+    """
+    if request.param == "memory":
+        yield request.getfixturevalue("memory_guest_store")
+        return
+
+    pytest.importorskip("redis")
+    async with FakeRedisServer() as server:
+        monkeypatch.setattr(cart_stores.settings, "CART_GUEST_STORE", "redis")
+        monkeypatch.setattr(cart_stores.settings, "CART_REDIS_URL", server.url)
+        cart_stores._redis_client.cache_clear()
+        client = cart_stores._redis_client()
+        yield client
+        await client.aclose()
+        cart_stores._redis_client.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_guest_cart_lives_in_key_value_store(
+    client: AsyncClient, products, db: AsyncSession, guest_store
+):
+    """Test guest carts never touch the carts tables and expire natively."""
+    add = {"product_id": products[0].id, "quantity": 2}
+    first = (await client.post("/cart/items", json=add, headers=GUEST)).json()
+    second = (await client.post("/cart/items", json=add, headers=GUEST)).json()
+    assert second["id"] == first["id"]
+    assert second["quantity"] == 4
+    other = await client.post(
+        "/cart/items",
+        json={"product_id": products[1].id, "special_instructions": "No nuts"},
+        headers=GUEST,
+    )
+    assert other.status_code == 201
+
+    update = await client.put(
+        f"/cart/items/{first['id']}", json={"quantity": 5}, headers=GUEST
+    )
+    assert update.json()["quantity"] == 5
+    delivery = await client.put(
+        "/cart/delivery", json={"delivery_time_slot": "morning"}, headers=GUEST
+    )
+    assert delivery.json()["delivery_time_slot"] == "morning"
+
+    cart = (await client.get("/cart", headers=GUEST)).json()
+    assert [item["quantity"] for item in cart["items"]] == [5, 1]
+    assert cart["items"][0]["product"]["slug"] == "product-1"
+    assert cart["item_count"] == 6
+    assert Decimal(cart["subtotal"]) == Decimal("5.00") * 5 + Decimal("6.00")
+
+    removed = await client.delete(f"/cart/items/{other.json()['id']}", headers=GUEST)
+    assert removed.status_code == 204
+    missing = await client.delete(f"/cart/items/{other.json()['id']}", headers=GUEST)
+    assert missing.status_code == 404
+
+    summary = (await client.get("/cart/summary", headers=GUEST)).json()
+    assert summary == {"item_count": 5, "subtotal": "25.00"}
+
+    assert await db.scalar(select(func.count()).select_from(Cart)) == 0
+    assert await guest_store.ttl("cart:guest-session-1") > 6 * 24 * 3600
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expires_keys(memory_guest_store, monkeypatch):
+    """Test the fake Redis drops keys once their TTL passes."""
+    await memory_guest_store.hset("cart:x", "seq", 1)
+    await memory_guest_store.expire("cart:x", 60)
+    assert await memory_guest_store.hget("cart:x", "seq") == "1"
+
+    now = cart_stores.time.monotonic()
+    monkeypatch.setattr(cart_stores.time, "monotonic", lambda: now + 61)
+    assert await memory_guest_store.hgetall("cart:x") == {}
+    assert await memory_guest_store.ttl("cart:x") == -2
+
+
+@pytest.mark.asyncio
+async def test_guest_cart_moves_to_user_cart(
+    client: AsyncClient, products, db: AsyncSession, guest_store
+):
+    """Test logging in merges the stored guest cart into the user's rows once."""
+    user = User(email="baker@example.com", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    user_cart = await get_cart_handle(db, user_id=user.id)
+    await add_item_to_cart(db, user_cart.id, CartItemCreate(product_id=products[0].id))
+
+    for body in (
+        {"product_id": products[0].id, "quantity": 2},
+        {"product_id": products[2].id, "special_instructions": "Gift wrap"},
+    ):
+        await client.post("/cart/items", json=body, headers=GUEST)
+
+    guest = cart_store(db, session_id=GUEST["X-Session-ID"])
+    cart = await guest.move_to(user.id)
+    assert cart.id == user_cart.id
+    assert sorted((i.product_id, i.quantity) for i in cart.items) == [
+        (products[0].id, 3),
+        (products[2].id, 1),
+    ]
+    assert await guest_store.hgetall("cart:guest-session-1") == {}
+
+    # A second login with the same session has nothing left to merge
+    await guest.move_to(user.id)
+    assert await db.scalar(select(func.sum(CartItem.quantity))) == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_move_leaves_guest_cart_for_retry(
+    client: AsyncClient, products, db: AsyncSession, guest_store, monkeypatch
+):
+    """Test a merge whose commit fails can be retried with nothing lost."""
+    user = User(email="baker@example.com", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 2}, headers=GUEST
+    )
+    guest = cart_store(db, session_id=GUEST["X-Session-ID"])
+    user_id = user.id
+    await get_cart_handle(db, user_id=user_id)
+
+    async def failing_commit():
+        raise ConnectionError("database went away")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db, "commit", failing_commit)
+        with pytest.raises(ConnectionError):
+            await guest.move_to(user_id)
+    await db.rollback()
+    fields = await guest_store.hgetall("cart:guest-session-1")
+    assert "merged_into" not in fields
+
+    cart = await guest.move_to(user_id)
+    assert [(i.product_id, i.quantity) for i in cart.items] == [(products[0].id, 2)]
+
+
+@pytest.mark.asyncio
+async def test_batch_on_key_value_guest_cart(
+    client: AsyncClient, products, guest_store
+):
+    """Test batches work the same way for guest carts in the key-value store."""
+    first = await client.post(
+        "/cart/items", json={"product_id": products[0].id}, headers=GUEST
+    )
+    response = await client.post(
+        "/cart/items:batch",
+        json={
+            "operations": [
+                {"op": "remove", "item_id": first.json()["id"]},
+                {"op": "add", "product_id": products[1].id, "quantity": 3},
+                {"op": "add", "product_id": products[0].id, "quantity": 2},
+            ]
+        },
+        headers=GUEST,
+    )
+    assert response.status_code == 200
+    assert sorted((i["product_id"], i["quantity"]) for i in response.json()["items"]) == [
+        (products[0].id, 2),
+        (products[1].id, 3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_leaves_key_value_guest_cart_unchanged(
+    client: AsyncClient, products, db: AsyncSession, guest_store
+):
+    """Test a batch whose later operation fails writes none of the earlier ones."""
+    products[1].is_seasonal = True
+    products[1].stock_quantity = 5
+    await db.commit()
+    plain = await client.post(
+        "/cart/items", json={"product_id": products[0].id}, headers=GUEST
+    )
+    await client.post(
+        "/cart/items",
+        json={"product_id": products[0].id, "special_instructions": "Gift wrap"},
+        headers=GUEST,
+    )
+    other = await client.post(
+        "/cart/items", json={"product_id": products[2].id}, headers=GUEST
+    )
+    before = await guest_store.hgetall("cart:guest-session-1")
+
+    for operations, detail in (
+        (
+            [
+                {"op": "update", "item_id": other.json()["id"], "quantity": 4},
+                {
+                    "op": "update",
+                    "item_id": plain.json()["id"],
+                    "special_instructions": "Gift wrap",
+                },
+            ],
+            "This item is already in the cart with the same instructions",
+        ),
+        (
+            [
+                {"op": "remove", "item_id": other.json()["id"]},
+                {"op": "add", "product_id": products[1].id, "quantity": 40},
+            ],
+            "Only 5 available",
+        ),
+    ):
+        response = await client.post(
+            "/cart/items:batch", json={"operations": operations}, headers=GUEST
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == detail
+        assert await guest_store.hgetall("cart:guest-session-1") == before
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cart.models import Cart, CartItem
+from src.products.models import Product
+from src.services.maintenance import CartReaper, MaintenanceScheduler
+from tests.conftest import async_session_maker
+
+
+@pytest.mark.asyncio
+async def test_reaper_deletes_expired_carts_in_batches(db: AsyncSession):
+    """Test expired carts and their items go in bounded batches; live ones stay."""
+    product = Product(
+        sku="SKU-001",
+        name="Product 1",
+        slug="product-1",
+        description="A tasty protein treat.",
+        price=Decimal("5.00"),
+    )
+    db.add(product)
+    expired = datetime.utcnow() - timedelta(hours=1)
+    carts = [Cart(session_id=f"expired-{i}", expires_at=expired) for i in range(5)]
+    carts.append(Cart(session_id="live"))
+    db.add_all(carts)
+    await db.flush()
+    db.add_all(
+        CartItem(cart_id=cart.id, product_id=product.id, unit_price=product.price)
+        for cart in carts
+    )
+    await db.commit()
+
+    result = await CartReaper(async_session_maker, batch_size=2).run()
+
+    assert (result.deleted, result.batches) == (5, 3)
+    assert await db.scalar(select(Cart.session_id)) == "live"
+    assert await db.scalar(select(func.count()).select_from(CartItem)) == 1
+
+
+@pytest.mark.asyncio
+async def test_reaper_stops_at_max_batches(db: AsyncSession):
+    """Test a run never exceeds its batch budget."""
+    expired = datetime.utcnow() - timedelta(hours=1)
+    db.add_all(Cart(session_id=f"expired-{i}", expires_at=expired) for i in range(5))
+    await db.commit()
+
+    result = await CartReaper(async_session_maker, batch_size=2, max_batches=1).run()
+
+    assert (result.deleted, result.batches) == (2, 1)
+    assert await db.scalar(select(func.count()).select_from(Cart)) == 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_runs_jobs_and_records_metrics():
+    """Test jobs run on their cadence and failures don't stop the loop."""
+    calls = []
+
+    async def job():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return len(calls)
+
+    scheduler = MaintenanceScheduler()
+    scheduler.add_job("job", job, interval_seconds=0.01)
+    scheduler.start()
+    try:
+        while len(calls) < 3:
+            await asyncio.sleep(0.01)
+    finally:
+        await scheduler.stop()
+
+    stats = scheduler.stats["job"]
+    assert stats.failures == 1
+    assert stats.runs >= 3
+    assert stats.last_result >= 2
+    assert stats.last_error is None
@@ -0,0 +1,90 @@
+"""Property tests for order number allocation and encoding.
+
+ORDER_NUMBER_PROPERTY_COUNT sets how many sequence values the bulk
+properties generate (default one million).
+"""
+
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.orders.numbers import (
+    ALPHABET,
+    MAX_SEQUENCE,
+    allocate_order_number,
+    format_order_number,
+    is_valid_order_number,
+)
+
+COUNT = int(os.environ.get("ORDER_NUMBER_PROPERTY_COUNT", 1_000_000))
+DAY = date(2025, 1, 12)
+
+
+def test_numbers_are_unique_valid_and_monotonic_within_a_day():
+    """Test consecutive allocations never collide and sort in allocation order."""
+    start = random.randrange(1, MAX_SEQUENCE - COUNT)
+    numbers = [format_order_number(DAY, value) for value in range(start, start + COUNT)]
+
+    assert len(set(numbers)) == COUNT
+    assert numbers == sorted(numbers)
+    assert {len(number) for number in numbers} == {17}
+    assert all(number.startswith("BB-250112-") for number in numbers)
+    assert all(is_valid_order_number(number) for number in numbers[:: COUNT // 1000])
+
+
+def test_numbers_sort_by_day_then_sequence():
+    """Test a later day always sorts after an earlier one."""
+    rng = random.Random(1)
+    allocations = sorted(
+        (DAY + timedelta(days=rng.randrange(3650)), rng.randrange(1, MAX_SEQUENCE))
+        for _ in range(COUNT // 10)
+    )
+    numbers = [format_order_number(day, value) for day, value in allocations]
+    assert numbers == sorted(numbers)
+
+
+def test_check_character_catches_single_character_errors():
+    """Test every one-character substitution fails validation."""
+    rng = random.Random(2)
+    for _ in range(2000):
+        number = format_order_number(DAY, rng.randrange(1, MAX_SEQUENCE))
+        for position in range(10, len(number)):
+            for char in ALPHABET:
+                if char != number[position]:
+                    typo = number[:position] + char + number[position + 1 :]
+                    assert not is_valid_order_number(typo), (number, typo)
+
+
+def test_check_character_catches_adjacent_transpositions():
+    """Test swapping neighbouring characters fails validation (bar 0 <-> Z)."""
+    rng = random.Random(3)
+    for _ in range(COUNT // 10):
+        number = format_order_number(DAY, rng.randrange(1, MAX_SEQUENCE))
+        position = rng.randrange(10, len(number) - 1)
+        a, b = number[position], number[position + 1]
+        if a == b or {a, b} == {"0", "Z"}:
+            continue
+        swapped = number[:position] + b + a + number[position + 2 :]
+        assert not is_valid_order_number(swapped), (number, swapped)
+
+
+def test_out_of_range_sequences_are_rejected():
+    """Test the encoder refuses values that would not fit."""
+    with pytest.raises(ValueError):
+        format_order_number(DAY, 0)
+    with pytest.raises(ValueError):
+        format_order_number(DAY, MAX_SEQUENCE + 1)
+
+
+@pytest.mark.asyncio
+async def test_allocation_never_repeats(db: AsyncSession):
+    """Test each allocation from the database yields a fresh number."""
+    numbers = [await allocate_order_number(db, DAY) for _ in range(50)]
+    await db.commit()
+
+    assert len(set(numbers)) == 50
+    assert numbers == sorted(numbers)
+    assert all(is_valid_order_number(number) for number in numbers)
@@ -0,0 +1,768 @@
+import asyncio
+import os
+from collections.abc import AsyncGenerator, Generator
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from src.auth.models import User
+from src.cart import store as cart_stores
+from src.cart.models import Cart, CartItem
+from src.cart.service import add_lines_to_cart, get_cart_by_id
+from src.cart.store import memory_client
+from src.config import get_settings
+from src.database import Base
+from src.orders.models import Order, OrderItem
+from src.orders.schemas import OrderCreate
+from src.orders.service import (
+    cancel_order,
+    confirm_payment,
+    create_order_from_cart,
+    get_order_by_number,
+)
+from src.products.models import Product
+from src.services.idempotency import (
+    IdempotencyClaim,
+    IdempotencyKey,
+    IdempotencyKeyLost,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    purge_expired_idempotency_keys,
+    release_idempotency_key,
+    request_fingerprint,
+)
+from src.services.inventory import (
+    InsufficientStockError,
+    InventoryService,
+    StockHold,
+    release_expired_holds,
+)
+
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+settings = get_settings()
+
+SHIPPING_ADDRESS = {
+    "first_name": "Test",
+    "last_name": "Customer",
+    "phone": None,
+    "address_line1": "1 Main St",
+    "address_line2": None,
+    "city": "Springfield",
+    "state": "IL",
+    "postal_code": "62701",
+    "country": "US",
+}
+
+
+def order_body(payment_method: str = "cash") -> dict:
+    return {
+        "shipping_address": SHIPPING_ADDRESS,
+        "requested_date": (date.today() + timedelta(days=2)).isoformat(),
+        "contact_email": "buyer@example.com",
+        "payment_method": payment_method,
+    }
+
+
+@pytest.fixture
+async def products(db: AsyncSession) -> list[Product]:
+    """Purchasable products with stock; the last one isn't inventory-tracked."""
+    items = [
+        Product(
+            sku=f"ORD-{i:03d}",
+            name=f"Order Product {i}",
+            slug=f"order-product-{i}",
+            description="A tasty protein treat.",
+            price=Decimal("3.00") + i,
+            stock_quantity=20,
+            track_inventory=i < 5,
+            display_order=i,
+        )
+        for i in range(1, 6)
+    ]
+    db.add_all(items)
+    await db.commit()
+    return items
+
+
+async def auth_headers(client: AsyncClient) -> dict[str, str]:
+    await client.post(
+        "/auth/register",
+        json={"email": "buyer@example.com", "password": "testpassword123"},
+    )
+    response = await client.post(
+        "/auth/login",
+        data={"username": "buyer@example.com", "password": "testpassword123"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def fill_cart(client: AsyncClient, headers: dict, product: Product, quantity: int):
+    response = await client.post(
+        "/cart/items",
+        json={"product_id": product.id, "quantity": quantity},
+        headers=headers,
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_checkout_creates_items_and_reserves_stock(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test checkout snapshots every line and decrements tracked stock."""
+    headers = await auth_headers(client)
+    for product, quantity, instructions in (
+        (products[0], 2, None),
+        (products[0], 1, "No nuts"),
+        (products[1], 3, None),
+        (products[4], 4, None),
+    ):
+        response = await client.post(
+            "/cart/items",
+            json={
+                "product_id": product.id,
+                "quantity": quantity,
+                "special_instructions": instructions,
+            },
+            headers=headers,
+        )
+        assert response.status_code == 201
+
+    response = await client.post("/orders", json=order_body(), headers=headers)
+    assert response.status_code == 201
+    order = response.json()
+    lines = sorted((item["product_sku"], item["quantity"]) for item in order["items"])
+    assert lines == [
+        ("ORD-001", 1),
+        ("ORD-001", 2),
+        ("ORD-002", 3),
+        ("ORD-005", 4),
+    ]
+    assert Decimal(order["subtotal"]) == Decimal("59.00")
+
+    stock = dict((await db.execute(select(Product.sku, Product.stock_quantity))).all())
+    assert stock["ORD-001"] == 17
+    assert stock["ORD-002"] == 17
+    assert stock["ORD-005"] == 20
+
+
+@pytest.mark.asyncio
+async def test_checkout_statement_count_is_independent_of_cart_size(
+    db: AsyncSession, products
+):
+    """Test a 1-line and a 5-line checkout run the same number of statements."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    counts = []
+    sync_engine = db.bind.sync_engine
+    for size in (1, 5):
+        cart = Cart(session_id=f"checkout-{size}")
+        db.add(cart)
+        await db.flush()
+        await add_lines_to_cart(
+            db,
+            cart.id,
+            [
+                {
+                    "product_id": product.id,
+                    "quantity": 1,
+                    "unit_price": product.price,
+                    "special_instructions": None,
+                }
+                for product in products[:size]
+            ],
+        )
+        await db.commit()
+        cart = await get_cart_by_id(db, cart.id)
+
+        statements.clear()
+        event.listen(sync_engine, "before_cursor_execute", capture)
+        try:
+            order = await create_order_from_cart(
+                db, cart, OrderCreate.model_validate(order_body())
+            )
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", capture)
+
+        assert len(order.items) == size
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.asyncio
+async def test_checkout_rejects_shortfall_without_reserving(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test a short line fails the whole checkout with 409 and per-line detail."""
+    products[1].stock_quantity = 2
+    products[2].stock_quantity = 0
+    products[2].allow_backorder = True
+    await db.commit()
+
+    headers = await auth_headers(client)
+    for product, quantity in ((products[0], 5), (products[1], 3), (products[2], 4)):
+        response = await client.post(
+            "/cart/items",
+            json={"product_id": product.id, "quantity": quantity},
+            headers=headers,
+        )
+        assert response.status_code == 201
+
+    response = await client.post("/orders", json=order_body(), headers=headers)
+    assert response.status_code == 409
+    assert response.json()["detail"]["shortfalls"] == [
+        {"product_id": products[1].id, "requested": 3, "available": 2}
+    ]
+
+    stock = dict((await db.execute(select(Product.sku, Product.stock_quantity))).all())
+    assert stock["ORD-001"] == 20
+    assert stock["ORD-002"] == 2
+    assert stock["ORD-003"] == 0
+    assert (await db.scalar(select(func.count(Order.id)))) == 0
+    cart = (await client.get("/cart", headers=headers)).json()
+    assert len(cart["items"]) == 3
+
+
+# ============ Stock holds ============
+
+
+async def stock_and_available(db: AsyncSession, product: Product) -> tuple[int, int]:
+    stock = await db.scalar(
+        select(Product.stock_quantity).where(Product.id == product.id)
+    )
+    available = await InventoryService(db).available_to_sell({product.id})
+    return stock, available[product.id]
+
+
+@pytest.mark.asyncio
+async def test_online_checkout_holds_stock_until_paid(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test a Stripe order holds stock, and paying converts it to a decrement."""
+    headers = await auth_headers(client)
+    await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 3}, headers=headers
+    )
+    response = await client.post("/orders", json=order_body("stripe"), headers=headers)
+    assert response.status_code == 201
+    assert await stock_and_available(db, products[0]) == (20, 17)
+
+    order = await get_order_by_number(db, response.json()["order_number"])
+    await confirm_payment(db, order, "pi_test")
+    assert await stock_and_available(db, products[0]) == (17, 17)
+    assert await db.scalar(select(func.count(StockHold.id))) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_unpaid_order_releases_holds(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test cancelling before payment gives held units back without touching stock."""
+    headers = await auth_headers(client)
+    await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 3}, headers=headers
+    )
+    response = await client.post("/orders", json=order_body("stripe"), headers=headers)
+
+    order = await get_order_by_number(db, response.json()["order_number"])
+    await cancel_order(db, order)
+    assert await stock_and_available(db, products[0]) == (20, 20)
+
+
+@pytest.mark.asyncio
+async def test_expired_holds_stop_counting_and_are_swept(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test expired holds free their units at once and the sweeper deletes them."""
+    headers = await auth_headers(client)
+    await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 3}, headers=headers
+    )
+    response = await client.post("/orders", json=order_body("stripe"), headers=headers)
+    order = await get_order_by_number(db, response.json()["order_number"])
+
+    await db.execute(
+        update(StockHold).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await db.commit()
+    assert await stock_and_available(db, products[0]) == (20, 20)
+    assert await release_expired_holds(db) == 1
+
+    # Paying late still takes the stock while it is there
+    await confirm_payment(db, order, "pi_test")
+    assert await stock_and_available(db, products[0]) == (17, 17)
+
+
+@pytest.mark.asyncio
+async def test_paying_on_unswept_expired_hold_never_oversells(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test an expired hold isn't converted once its units were sold elsewhere."""
+    products[0].stock_quantity = 3
+    await db.commit()
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 3)
+    response = await client.post("/orders", json=order_body("stripe"), headers=headers)
+    order = await get_order_by_number(db, response.json()["order_number"])
+    await db.execute(
+        update(StockHold).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await db.commit()
+
+    # The freed units sell before the sweeper runs
+    await fill_cart(client, headers, products[0], 3)
+    response = await client.post("/orders", json=order_body(), headers=headers)
+    assert response.status_code == 201
+    assert await stock_and_available(db, products[0]) == (0, 0)
+
+    with pytest.raises(InsufficientStockError):
+        await confirm_payment(db, order, "pi_test")
+    await db.refresh(products[0])
+    assert await stock_and_available(db, products[0]) == (0, 0)
+    assert await db.scalar(select(func.count(StockHold.id))) == 1
+
+
+@pytest.mark.asyncio
+async def test_paying_takes_backorder_lines_from_stock(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test lines that were never held are still decremented on payment."""
+    products[0].stock_quantity = 5
+    products[0].allow_backorder = True
+    await db.commit()
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 2)
+    await fill_cart(client, headers, products[1], 1)
+    await fill_cart(client, headers, products[4], 1)
+    response = await client.post("/orders", json=order_body("stripe"), headers=headers)
+    order = await get_order_by_number(db, response.json()["order_number"])
+
+    await confirm_payment(db, order, "pi_test")
+    assert await stock_and_available(db, products[0]) == (3, 3)
+    assert await stock_and_available(db, products[1]) == (19, 19)
+    assert await stock_and_available(db, products[4]) == (20, 20)
+
+
+@pytest.mark.asyncio
+async def test_seasonal_add_to_cart_counts_held_stock(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test a limited drop refuses cart lines that held stock can't cover."""
+    products[0].is_seasonal = True
+    products[0].stock_quantity = 5
+    await db.commit()
+
+    headers = await auth_headers(client)
+    await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 4}, headers=headers
+    )
+    await client.post("/orders", json=order_body("stripe"), headers=headers)
+
+    guest = {"X-Session-ID": "drop-day-guest"}
+    response = await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 2}, headers=guest
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Only 1 available"
+    response = await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 1}, headers=guest
+    )
+    assert response.status_code == 201
+
+
+@pytest.fixture(params=["sql", "memory"])
+def guest_store(request, monkeypatch) -> Generator[str, None, None]:
+    """Run a guest-cart test against the database and the key-value store."""
+    monkeypatch.setattr(cart_stores.settings, "CART_GUEST_STORE", request.param)
+    memory_client.flushall()
+    yield request.param
+    memory_client.flushall()
+
+
+@pytest.mark.asyncio
+async def test_seasonal_cart_limit_counts_whole_cart(
+    client: AsyncClient, db: AsyncSession, products, guest_store
+):
+    """Test adds and updates are checked against the cart's resulting quantity."""
+    products[0].is_seasonal = True
+    products[0].stock_quantity = 5
+    await db.commit()
+    guest = {"X-Session-ID": "drop-day-guest"}
+
+    line = await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 3}, headers=guest
+    )
+    assert line.status_code == 201
+    again = await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 3}, headers=guest
+    )
+    assert again.status_code == 400
+    assert again.json()["detail"] == "Only 5 available"
+    other_line = await client.post(
+        "/cart/items",
+        json={
+            "product_id": products[0].id,
+            "quantity": 2,
+            "special_instructions": "Gift wrap",
+        },
+        headers=guest,
+    )
+    assert other_line.status_code == 201
+
+    item_url = f"/cart/items/{line.json()['id']}"
+    too_many = await client.put(item_url, json={"quantity": 30}, headers=guest)
+    assert too_many.status_code == 400
+    assert too_many.json()["detail"] == "Only 5 available"
+    fewer = await client.put(item_url, json={"quantity": 1}, headers=guest)
+    assert fewer.status_code == 200
+
+    cart = (await client.get("/cart", headers=guest)).json()
+    assert sorted(item["quantity"] for item in cart["items"]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_seasonal_cart_limit_applies_to_batches(
+    client: AsyncClient, db: AsyncSession, products, guest_store
+):
+    """Test a batch is checked against the cart it would leave behind."""
+    products[0].is_seasonal = True
+    products[0].stock_quantity = 5
+    await db.commit()
+    guest = {"X-Session-ID": "drop-day-guest"}
+    line = await client.post(
+        "/cart/items", json={"product_id": products[0].id, "quantity": 4}, headers=guest
+    )
+    item_id = line.json()["id"]
+
+    for operations in (
+        [{"op": "add", "product_id": products[0].id, "quantity": 40}],
+        [{"op": "add", "product_id": products[0].id, "quantity": 2}],
+        [{"op": "update", "item_id": item_id, "quantity": 30}],
+    ):
+        response = await client.post(
+            "/cart/items:batch", json={"operations": operations}, headers=guest
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Only 5 available"
+
+    # Taking the line away first makes room for the add
+    response = await client.post(
+        "/cart/items:batch",
+        json={
+            "operations": [
+                {"op": "remove", "item_id": item_id},
+                {"op": "add", "product_id": products[0].id, "quantity": 5},
+            ]
+        },
+        headers=guest,
+    )
+    assert response.status_code == 200
+    assert [item["quantity"] for item in response.json()["items"]] == [5]
+
+
+# ============ Idempotency ============
+
+
+@pytest.mark.asyncio
+async def test_idempotent_retry_replays_first_order(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test a retried checkout returns the first order without placing another."""
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 2)
+    keyed = {**headers, "Idempotency-Key": "checkout-1"}
+
+    first = await client.post("/orders", json=order_body(), headers=keyed)
+    retry = await client.post("/orders", json=order_body(), headers=keyed)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert await db.scalar(select(func.count(Order.id))) == 1
+    assert await db.scalar(
+        select(Product.stock_quantity).where(Product.id == products[0].id)
+    ) == 18
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_reused_for_different_request(
+    client: AsyncClient, products
+):
+    """Test a key can't be replayed against a different request body."""
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 1)
+    keyed = {**headers, "Idempotency-Key": "checkout-2"}
+    await client.post("/orders", json=order_body(), headers=keyed)
+
+    changed = {**order_body(), "customer_notes": "Leave at the door"}
+    response = await client.post("/orders", json=changed, headers=keyed)
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_failed_checkout_releases_idempotency_key(
+    client: AsyncClient, db: AsyncSession, products
+):
+    """Test a failed attempt isn't replayed; retrying the same key runs checkout."""
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 25)
+    keyed = {**headers, "Idempotency-Key": "checkout-3"}
+
+    assert (await client.post("/orders", json=order_body(), headers=keyed)).status_code == 409
+    products[0].stock_quantity = 30
+    await db.commit()
+    response = await client.post("/orders", json=order_body(), headers=keyed)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_in_progress_key_conflicts_until_lock_times_out(
+    client: AsyncClient, db: AsyncSession, products, monkeypatch
+):
+    """Test a duplicate of a running request gets 409, and a dead one is taken over."""
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 1)
+    user_id = await db.scalar(select(User.id))
+    claim = IdempotencyKey(
+        user_id=user_id,
+        key="checkout-4",
+        request_hash=request_fingerprint(
+            "POST /orders", OrderCreate.model_validate(order_body()).model_dump(mode="json")
+        ),
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    )
+    db.add(claim)
+    await db.commit()
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0)
+    keyed = {**headers, "Idempotency-Key": "checkout-4"}
+
+    response = await client.post("/orders", json=order_body(), headers=keyed)
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+
+    claim.locked_at = datetime.utcnow() - timedelta(minutes=5)
+    await db.commit()
+    response = await client.post("/orders", json=order_body(), headers=keyed)
+    assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_order_and_its_replay_commit_together(
+    client: AsyncClient, db: AsyncSession, products, monkeypatch
+):
+    """Test a worker dying right after checkout never leads to a second order."""
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 2)
+    user_id = await db.scalar(select(User.id))
+    order_data = OrderCreate.model_validate(order_body())
+    fingerprint = request_fingerprint("POST /orders", order_data.model_dump(mode="json"))
+    claim = await claim_idempotency_key(db, user_id, "checkout-5", fingerprint)
+    cart = await get_cart_by_id(db, await db.scalar(select(Cart.id)))
+
+    # The request commits its order, then dies before answering
+    held = IdempotencyClaim.of(claim)
+    await create_order_from_cart(db, cart, order_data, user_id, held)
+    await release_idempotency_key(db, held)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", 0)
+
+    keyed = {**headers, "Idempotency-Key": "checkout-5"}
+    response = await client.post("/orders", json=order_body(), headers=keyed)
+    assert response.status_code == 201
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert await db.scalar(select(func.count(Order.id))) == 1
+    assert await db.scalar(select(func.count(CartItem.id))) == 0
+
+
+@pytest.mark.asyncio
+async def test_request_whose_key_was_taken_over_places_no_order(
+    client: AsyncClient, db: AsyncSession, products, monkeypatch
+):
+    """Test a slow first request can't complete a key a retry took over."""
+    headers = await auth_headers(client)
+    await fill_cart(client, headers, products[0], 2)
+    user_id = await db.scalar(select(User.id))
+    order_data = OrderCreate.model_validate(order_body())
+    fingerprint = request_fingerprint("POST /orders", order_data.model_dump(mode="json"))
+    claim = await claim_idempotency_key(db, user_id, "checkout-6", fingerprint)
+    held = IdempotencyClaim.of(claim)
+    cart = await get_cart_by_id(db, await db.scalar(select(Cart.id)))
+
+    # The first request stalls past the lock timeout; a retry takes over
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", 0)
+    keyed = {**headers, "Idempotency-Key": "checkout-6"}
+    retry = await client.post("/orders", json=order_body(), headers=keyed)
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
+
+    # Then the first request finishes its checkout
+    with pytest.raises(IdempotencyKeyLost):
+        await create_order_from_cart(db, cart, order_data, user_id, held)
+    await release_idempotency_key(db, held)
+
+    assert await db.scalar(select(func.count(Order.id))) == 1
+    replay = await client.post("/orders", json=order_body(), headers=keyed)
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == retry.json()
+
+
+@pytest.mark.asyncio
+async def test_expired_idempotency_keys_are_purged(db: AsyncSession):
+    """Test the purge job removes only expired keys."""
+    now = datetime.utcnow()
+    db.add_all(
+        IdempotencyKey(
+            user_id=1,
+            key=f"key-{i}",
+            request_hash="0" * 64,
+            expires_at=now + timedelta(hours=1 if i == 0 else -1),
+        )
+        for i in range(3)
+    )
+    await db.commit()
+
+    assert await purge_expired_idempotency_keys(db) == 2
+    assert await db.scalar(select(IdempotencyKey.key)) == "key-0"
+
+
+# ============ Concurrency ============
+
+
+@pytest.fixture(
+    params=[
+        "sqlite",
+        pytest.param(
+            "postgres",
+            marks=pytest.mark.skipif(
+                not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL not set"
+            ),
+        ),
+    ]
+)
+async def concurrent_engine(request, tmp_path) -> AsyncGenerator[AsyncEngine, None]:
+    """Engine with a real connection pool, so checkouts run side by side."""
+    if request.param == "sqlite":
+        url = f"sqlite+aiosqlite:///{tmp_path / 'stress.db'}"
+        engine = create_async_engine(url, connect_args={"timeout": 30})
+    else:
+        engine = create_async_engine(TEST_POSTGRES_URL, pool_size=20, max_overflow=0)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("payment_method", ["cash", "stripe"])
+async def test_concurrent_checkouts_never_oversell(
+    concurrent_engine: AsyncEngine, payment_method: str
+):
+    """Test hundreds of simultaneous checkouts of one SKU sell exactly its stock."""
+    stock, checkouts = 50, 200
+    sessionmaker = async_sessionmaker(concurrent_engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        product = Product(
+            sku="LIMITED-1",
+            name="Limited Treat",
+            slug="limited-treat",
+            description="Only a few of these.",
+            price=Decimal("6.00"),
+            stock_quantity=stock,
+        )
+        session.add(product)
+        await session.flush()
+        carts = [Cart(session_id=f"stress-{i}") for i in range(checkouts)]
+        session.add_all(carts)
+        await session.flush()
+        for cart in carts:
+            await add_lines_to_cart(
+                session,
+                cart.id,
+                [
+                    {
+                        "product_id": product.id,
+                        "quantity": 1,
+                        "unit_price": product.price,
+                        "special_instructions": None,
+                    }
+                ],
+            )
+        await session.commit()
+        cart_ids = [cart.id for cart in carts]
+
+    order_data = OrderCreate.model_validate(order_body(payment_method))
+
+    async def checkout(cart_id: int) -> bool:
+        # SQLite allows one writer at a time; retry like a client would
+        while True:
+            async with sessionmaker() as session:
+                cart = await get_cart_by_id(session, cart_id)
+                try:
+                    await create_order_from_cart(session, cart, order_data)
+                    return True
+                except InsufficientStockError:
+                    return False
+                except OperationalError:
+                    await session.rollback()
+                    await asyncio.sleep(0.01)
+
+    results = await asyncio.gather(*(checkout(cart_id) for cart_id in cart_ids))
+
+    async with sessionmaker() as session:
+        available = await InventoryService(session).available_to_sell({product.id})
+        sold = await session.scalar(select(func.sum(OrderItem.quantity)))
+        orders = await session.scalar(select(func.count(Order.id)))
+    assert sum(results) == stock
+    assert orders == stock
+    assert sold == stock
+    assert available == {product.id: 0}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_first_result(concurrent_engine: AsyncEngine):
+    """Test a duplicate arriving mid-request gets the first response, not a rerun."""
+    sessionmaker = async_sessionmaker(concurrent_engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        user = User(email="retry@example.com", hashed_password="x")
+        session.add(user)
+        await session.commit()
+    fingerprint = request_fingerprint("POST /orders", {"n": 1})
+    runs = []
+
+    async def request() -> dict:
+        async with sessionmaker() as session:
+            claim = await claim_idempotency_key(session, user.id, "dup", fingerprint)
+            if claim.response_body is not None:
+                return claim.response_body
+            runs.append(claim.id)
+            # The checkout itself
+            await asyncio.sleep(0.3)
+            await complete_idempotency_key(
+                session, IdempotencyClaim.of(claim), 201, {"order": len(runs)}
+            )
+            await session.commit()
+            return {"order": len(runs)}
+
+    results = await asyncio.gather(request(), request(), request())
+
+    assert len(runs) == 1
+    assert results == [{"order": 1}] * 3
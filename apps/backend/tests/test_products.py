@@ -0,0 +1,447 @@
+import time
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import get_settings
+from src.pagination import _Explain, count_rows
+from src.products.cache import catalog_cache, listing_key
+from src.products.models import Category, Product
+from src.products.schemas import ProductFilters, ProductImageCreate, ProductUpdate
+from src.products.service import (
+    _build_product_query,
+    _sort_products,
+    add_product_image,
+    delete_product,
+    delete_product_image,
+    get_product_by_id,
+    set_primary_image,
+    update_product,
+    update_stock,
+)
+
+
+async def create_product(db: AsyncSession, **overrides) -> Product:
+    """Insert a product with sensible defaults."""
+    index = overrides.pop("index", 1)
+    data = {
+        "sku": f"SKU-{index:03d}",
+        "name": f"Product {index}",
+        "slug": f"product-{index}",
+        "description": "A tasty protein treat.",
+        "price": Decimal("5.00"),
+        "stock_quantity": 10,
+        "display_order": index,
+    }
+    data.update(overrides)
+    product = Product(**data)
+    db.add(product)
+    await db.commit()
+    await db.refresh(product)
+    return product
+
+
+@pytest.fixture
+async def catalog(db: AsyncSession) -> list[Product]:
+    """A small catalog in a single category."""
+    category = Category(name="Cookies", slug="cookies")
+    db.add(category)
+    await db.commit()
+    return [
+        await create_product(
+            db,
+            index=1,
+            name="Blueberry Lemon Cupcake",
+            description="Zesty lemon with fresh blueberries.",
+            category_id=category.id,
+        ),
+        await create_product(
+            db,
+            index=2,
+            name="Chocolate Chip Cookie",
+            description="Classic cookie, now with blueberry jam.",
+            price=Decimal("3.50"),
+            is_vegan=True,
+            category_id=category.id,
+        ),
+        await create_product(
+            db,
+            index=3,
+            name="Mint Brownie",
+            description="Cool mint and dark chocolate.",
+            price=Decimal("4.25"),
+        ),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_products(client: AsyncClient, catalog: list[Product]):
+    """Test searching matches name and description."""
+    response = await client.get("/products", params={"search": "blueberr"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert {item["slug"] for item in data["items"]} == {"product-1", "product-2"}
+
+
+@pytest.mark.asyncio
+async def test_search_products_relevance_sort(
+    client: AsyncClient, catalog: list[Product]
+):
+    """Test relevance sort is accepted and keeps all matches."""
+    response = await client.get(
+        "/products", params={"search": "chocolate", "sort_by": "relevance"}
+    )
+    assert response.status_code == 200
+    assert {item["slug"] for item in response.json()["items"]} == {
+        "product-2",
+        "product-3",
+    }
+
+
+def test_relevance_ranked_listings_page_without_cursors():
+    """Test ranked search can't hand out a cursor it would later reject."""
+    filters = ProductFilters(search="chocolate")
+    query = _build_product_query(filters, fulltext=True)
+
+    _, _, ranked = _sort_products(query, filters, True, "relevance", "asc", None)
+    assert ranked
+    with pytest.raises(ValueError):
+        _sort_products(query, filters, True, "relevance", "asc", "cursor")
+
+    _, _, ranked = _sort_products(query, None, True, "relevance", "asc", None)
+    assert not ranked
+    _, _, ranked = _sort_products(query, filters, True, "price", "asc", None)
+    assert not ranked
+
+
+def test_fulltext_query_uses_search_vector():
+    """Test the PostgreSQL query matches the tsvector with prefix terms."""
+    query = _build_product_query(ProductFilters(search="Blue lemon"), fulltext=True)
+    compiled = query.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "products.search_vector @@ to_tsquery" in sql
+    assert "ILIKE" not in sql.upper()
+    assert "blue:* & lemon:*" in compiled.params.values()
+
+
+@pytest.mark.asyncio
+async def test_list_products_projected_fields(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test list rows carry the denormalized image and stock fields."""
+    cupcake = await get_product_by_id(db, catalog[0].id)
+    await add_product_image(db, cupcake, ProductImageCreate(url="/a.jpg"))
+    await add_product_image(
+        db, cupcake, ProductImageCreate(url="/b.jpg", display_order=1, is_primary=True)
+    )
+    await update_product(db, cupcake, ProductUpdate(compare_at_price=Decimal("6.00")))
+    await update_stock(db, cupcake, -10)
+    await db.commit()
+
+    items = (await client.get("/products")).json()["items"]
+    assert items[0]["primary_image_url"] == "/b.jpg"
+    assert items[0]["is_on_sale"] is True
+    assert items[0]["is_in_stock"] is False
+    assert items[0]["price"] == "5.00"
+    assert items[0]["category"]["slug"] == "cookies"
+    assert items[2]["primary_image_url"] is None
+    assert items[2]["category"] is None
+
+
+@pytest.mark.asyncio
+async def test_primary_image_url_follows_image_changes(
+    db: AsyncSession, catalog: list[Product]
+):
+    """Test the denormalized primary image tracks add/set primary/delete."""
+    product = await get_product_by_id(db, catalog[0].id)
+    first = await add_product_image(db, product, ProductImageCreate(url="/a.jpg"))
+    second = await add_product_image(
+        db, product, ProductImageCreate(url="/b.jpg", display_order=1)
+    )
+    assert product.primary_image_url == "/a.jpg"
+
+    await db.refresh(product, ["images"])
+    await set_primary_image(db, product, second.id)
+    assert product.primary_image_url == "/b.jpg"
+
+    await delete_product_image(db, second)
+    assert product.primary_image_url == "/a.jpg"
+    await delete_product_image(db, first)
+    assert product.primary_image_url is None
+
+
+@pytest.mark.asyncio
+async def test_list_products_in_stock_only(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test in_stock_only filters on the stored stock flag."""
+    await update_stock(db, catalog[1], -10)
+    await db.commit()
+
+    response = await client.get("/products", params={"in_stock_only": True})
+    assert [item["slug"] for item in response.json()["items"]] == [
+        "product-1",
+        "product-3",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_product_listing_cache_invalidated_on_update(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test cached listings and details are dropped when a product changes."""
+    first = await client.get("/products")
+    detail = await client.get("/products/product-3")
+    assert first.json()["items"][2]["name"] == "Mint Brownie"
+    assert detail.json()["name"] == "Mint Brownie"
+
+    await update_product(db, catalog[2], ProductUpdate(name="Mint Fudge Brownie"))
+    await db.commit()
+
+    second = await client.get("/products")
+    detail = await client.get("/products/product-3")
+    assert second.json()["items"][2]["name"] == "Mint Fudge Brownie"
+    assert detail.json()["name"] == "Mint Fudge Brownie"
+
+
+@pytest.mark.asyncio
+async def test_catalog_cache_invalidated_after_commit(
+    db: AsyncSession, catalog: list[Product]
+):
+    """Test listings cached while a write is uncommitted are dropped at commit."""
+    racing_read = listing_key("products", "racing-read")
+
+    await update_product(db, catalog[2], ProductUpdate(name="Mint Fudge Brownie"))
+    catalog_cache.set(racing_read, (None, b"old listing"))
+    await db.commit()
+    assert catalog_cache.get(racing_read) is None
+
+    await update_product(db, catalog[2], ProductUpdate(name="Mint Brownie"))
+    await db.rollback()
+    catalog_cache.set(racing_read, (None, b"current listing"))
+    await db.commit()
+    assert catalog_cache.get(racing_read) is not None
+
+
+@pytest.mark.asyncio
+async def test_list_products_cursor_pagination(
+    client: AsyncClient, catalog: list[Product]
+):
+    """Test walking the catalog with next_cursor matches page order."""
+    params = {"page_size": 2, "sort_by": "price", "sort_order": "desc"}
+    first = (await client.get("/products", params=params)).json()
+    assert [item["slug"] for item in first["items"]] == ["product-1", "product-3"]
+    assert first["next_cursor"]
+
+    second = (
+        await client.get("/products", params={**params, "cursor": first["next_cursor"]})
+    ).json()
+    assert [item["slug"] for item in second["items"]] == ["product-2"]
+    assert second["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_list_products_invalid_cursor(client: AsyncClient):
+    """Test a malformed cursor is rejected."""
+    response = await client.get("/products", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_products_without_count(client: AsyncClient, catalog: list[Product]):
+    """Test count=none skips the total but still reports more pages."""
+    response = await client.get("/products", params={"page_size": 2, "count": "none"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] is None
+    assert data["total_pages"] is None
+    assert data["has_more"] is True
+    assert len(data["items"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_listing_version_follows_count_strategy(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test a cold count=none listing runs no COUNT, even for its ETag."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        response = await client.get("/products", params={"count": "none"})
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert response.status_code == 200
+    assert "etag" in response.headers
+    assert not [statement for statement in statements if "count(" in statement.lower()]
+
+
+@pytest.mark.asyncio
+async def test_estimated_count_falls_back_to_exact(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test count=estimated counts exactly where there is no planner estimate."""
+    response = await client.get("/products", params={"page_size": 2, "count": "estimated"})
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+
+    query = _build_product_query(ProductFilters(search="blueberr"), projected=True)
+    assert await count_rows(db, query, "estimated") == 2
+
+
+def test_estimate_explains_with_bound_parameters():
+    """Test search input reaches EXPLAIN as a parameter, not inlined SQL."""
+    search = "x'; DROP TABLE products; --"
+    query = _build_product_query(ProductFilters(search=search))
+    compiled = _Explain(query).compile(dialect=postgresql.asyncpg.dialect())
+    assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "DROP TABLE" not in str(compiled)
+    assert any("DROP TABLE" in str(value) for value in compiled.params.values())
+
+
+@pytest.mark.asyncio
+async def test_cached_count_is_stale_only_until_ttl(
+    db: AsyncSession, catalog: list[Product], monkeypatch: pytest.MonkeyPatch
+):
+    """Test count=cached reuses a total until COUNT_CACHE_TTL_SECONDS pass."""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    query = _build_product_query(projected=True)
+    assert await count_rows(db, query, "cached") == 3
+
+    await create_product(db, index=4)
+    assert await count_rows(db, query, "cached") == 3
+    assert await count_rows(db, query, "exact") == 4
+
+    now += get_settings().COUNT_CACHE_TTL_SECONDS
+    assert await count_rows(db, query, "cached") == 4
+
+
+@pytest.mark.asyncio
+async def test_product_facets(client: AsyncClient, catalog: list[Product]):
+    """Test facet counts for the whole catalog and within a filter set."""
+    response = await client.get("/products/facets")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 3
+    assert data["categories"] == {"cookies": 2}
+    assert data["dietary"]["is_vegan"] == 1
+    assert data["dietary"]["is_gluten_free"] == 3
+    assert [bucket["count"] for bucket in data["price_ranges"]] == [2, 1, 0, 0]
+
+    filtered = (await client.get("/products/facets", params={"category": "cookies"})).json()
+    assert filtered["total"] == 2
+    assert [bucket["count"] for bucket in filtered["price_ranges"]] == [1, 1, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_product_listing_conditional_get(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test listings answer 304 for a current ETag and change after writes."""
+    first = await client.get("/products", params={"page_size": 2})
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public")
+    assert "last-modified" in first.headers
+
+    repeat = await client.get(
+        "/products", params={"page_size": 2}, headers={"If-None-Match": etag}
+    )
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+
+    other_page = await client.get(
+        "/products", params={"page_size": 3}, headers={"If-None-Match": etag}
+    )
+    assert other_page.status_code == 200
+
+    await update_product(db, catalog[0], ProductUpdate(name="Lemon Cupcake"))
+    await db.commit()
+    changed = await client.get(
+        "/products", params={"page_size": 2}, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", ["cached", "none"])
+async def test_listing_etag_changes_when_product_leaves_listing(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product], count: str
+):
+    """Test soft-deleting a listed product changes the listing's ETag and total."""
+    params = {"count": count}
+    first = await client.get("/products", params=params)
+    etag = first.headers["etag"]
+
+    await delete_product(db, catalog[0])
+    await db.commit()
+    changed = await client.get("/products", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()["items"]) == 2
+    assert changed.json()["total"] == (2 if count == "cached" else None)
+
+
+@pytest.mark.asyncio
+async def test_product_detail_conditional_get(
+    client: AsyncClient, catalog: list[Product]
+):
+    """Test product detail honors If-None-Match and If-Modified-Since."""
+    first = await client.get("/products/product-1")
+    assert first.status_code == 200
+
+    by_etag = await client.get(
+        "/products/product-1", headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert by_etag.status_code == 304
+    by_date = await client.get(
+        "/products/product-1",
+        headers={"If-Modified-Since": first.headers["last-modified"]},
+    )
+    assert by_date.status_code == 304
+
+    missing = await client.get("/products/nope", headers={"If-None-Match": "*"})
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_products_batch(
+    client: AsyncClient, db: AsyncSession, catalog: list[Product]
+):
+    """Test batch lookup by IDs and slugs keeps request order and skips unknowns."""
+    ids = f"{catalog[2].id},{catalog[0].id},999"
+    response = await client.get(
+        "/products/batch", params={"ids": ids, "slugs": ["product-1", "product-2"]}
+    )
+    assert response.status_code == 200
+    assert [item["slug"] for item in response.json()] == [
+        "product-3",
+        "product-1",
+        "product-2",
+    ]
+
+    # Warm entries are dropped when the catalog changes
+    await update_product(db, catalog[2], ProductUpdate(is_active=False))
+    await db.commit()
+    response = await client.get("/products/batch", params={"ids": ids})
+    assert [item["slug"] for item in response.json()] == ["product-1"]
+
+
+@pytest.mark.asyncio
+async def test_products_batch_limits(client: AsyncClient):
+    """Test batch lookup rejects empty, malformed and oversized requests."""
+    assert (await client.get("/products/batch")).status_code == 400
+    assert (await client.get("/products/batch", params={"ids": "a"})).status_code == 400
+    too_many = ",".join(str(i) for i in range(101))
+    assert (await client.get("/products/batch", params={"ids": too_many})).status_code == 400
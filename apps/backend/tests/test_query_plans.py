@@ -0,0 +1,154 @@
+"""Query-plan regression tests for catalog listings.
+
+The statements the product service actually runs are captured and
+EXPLAINed. A listing that falls back to scanning the products table (or
+sorting it) instead of walking one of the partial listing indexes fails.
+SQLite plans are always checked; set TEST_POSTGRES_URL to an empty
+PostgreSQL database to check the same queries there as well.
+
+The test tables are empty, so each database is told what a real catalog
+looks like before planning: SQLite gets ANALYZE statistics in which
+is_active splits products in half, PostgreSQL gets enable_seqscan = off.
+"""
+
+import os
+from collections.abc import AsyncGenerator
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database import Base
+from src.products import service
+from src.products.schemas import ProductFilters
+
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+# (get_product_list kwargs, index the plan must use)
+LISTING_CASES = [
+    ({}, "ix_products_active_display_order"),
+    ({"sort_by": "price"}, "ix_products_active_price"),
+    ({"sort_by": "price", "sort_order": "desc"}, "ix_products_active_price"),
+    ({"sort_by": "created_at", "sort_order": "desc"}, "ix_products_active_created_at"),
+    (
+        {"filters": ProductFilters(category_slug="cookies")},
+        "ix_products_active_category_display_order",
+    ),
+    ({"filters": ProductFilters(is_vegan=True)}, "ix_products_active_display_order"),
+]
+
+
+async def captured_listing(db: AsyncSession, **kwargs) -> list[tuple[str, tuple]]:
+    """Run a listing and return the SQL statements it executed."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        await service.get_product_list(db, **kwargs)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+    return statements
+
+
+async def sqlite_plan(db: AsyncSession, statement: str, parameters: tuple) -> list[str]:
+    """EXPLAIN QUERY PLAN detail lines for a statement."""
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    return [row[-1] for row in result.all()]
+
+
+# sqlite_stat1 rows (table, index, stat) for a catalog of mostly active products
+CATALOG_STATS = [
+    ("products", None, "10000"),
+    ("products", "ix_products_is_active", "10000 5000"),
+]
+
+
+@pytest.fixture
+async def catalog_stats(db: AsyncSession) -> AsyncGenerator[None, None]:
+    """Give SQLite's planner the statistics of a realistic products table."""
+    connection = await db.connection()
+    await connection.exec_driver_sql("ANALYZE")
+    await connection.exec_driver_sql("DELETE FROM sqlite_stat1")
+    for row in CATALOG_STATS:
+        await connection.exec_driver_sql("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)", row)
+    # Reload statistics into the planner
+    await connection.exec_driver_sql("ANALYZE sqlite_master")
+    yield
+    await connection.exec_driver_sql("DELETE FROM sqlite_stat1")
+    await connection.exec_driver_sql("ANALYZE sqlite_master")
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("catalog_stats")
+@pytest.mark.parametrize(("kwargs", "index"), LISTING_CASES)
+async def test_listing_uses_partial_index_sqlite(db: AsyncSession, kwargs, index):
+    """Test the listing page walks a partial index in sort order."""
+    statements = await captured_listing(db, count="none", **kwargs)
+    plan = await sqlite_plan(db, *statements[-1])
+
+    assert not [line for line in plan if line == "SCAN products"], plan
+    assert any(index in line for line in plan), plan
+    assert not any("TEMP B-TREE FOR ORDER BY" in line for line in plan), plan
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("catalog_stats")
+async def test_listing_count_avoids_table_scan_sqlite(db: AsyncSession):
+    """Test the exact count reads the active-rows index, not the table."""
+    statements = await captured_listing(db, count="exact")
+    count_statement = next(s for s in statements if "count(" in s[0])
+    plan = await sqlite_plan(db, *count_statement)
+
+    assert not [line for line in plan if line == "SCAN products"], plan
+
+
+# ============ PostgreSQL ============
+
+
+@pytest.fixture
+async def pg_db() -> AsyncGenerator[AsyncSession, None]:
+    """Session on TEST_POSTGRES_URL with sequential scans discouraged."""
+    pg_engine = create_async_engine(TEST_POSTGRES_URL)
+    async with pg_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(pg_engine)() as session:
+            # Tables are empty, so make the planner show its index choice
+            await (await session.connection()).exec_driver_sql("SET enable_seqscan = off")
+            yield session
+    finally:
+        async with pg_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await pg_engine.dispose()
+
+
+def _seq_scans(node: dict) -> list[str]:
+    """Relations read by Seq Scan anywhere in an EXPLAIN JSON plan tree."""
+    found = [node["Relation Name"]] if node["Node Type"] == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        found += _seq_scans(child)
+    return found
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+@pytest.mark.parametrize(("kwargs", "index"), LISTING_CASES)
+async def test_listing_uses_partial_index_postgres(pg_db: AsyncSession, kwargs, index):
+    """Test the listing page never sequentially scans products on PostgreSQL."""
+    statements = await captured_listing(pg_db, count="none", **kwargs)
+    statement, parameters = statements[-1]
+    connection = await pg_db.connection()
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {statement}", parameters
+    )
+    plan = result.scalar()[0]["Plan"]
+
+    assert "products" not in _seq_scans(plan), plan
+    assert index in str(plan), plan